@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+TaskFlow - Benchmark Suite
+Times the core operations on synthetic boards and guards against regressions.
+
+Usage:
+  python benchmark_taskflow.py                              # 1k, 100k and 1M task boards
+  python benchmark_taskflow.py --sizes 1k,10k --output bench.json
+  python benchmark_taskflow.py --compare baseline.json --threshold 15
+  python benchmark_taskflow.py --sizes 1k --import-budget 50   # Guard CLI startup
+"""
+
+import os
+import sys
+import io
+import json
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+# Fix Unicode output on Windows
+if sys.stdout.encoding != 'utf-8':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from taskflow import TaskFlow
+
+TASKFLOW_SCRIPT = str(Path(__file__).resolve().parent / "taskflow.py")
+DEFAULT_SIZES = "1k,100k,1m"
+IMPORT_BUDGET_MS = 100  # `import taskflow` in a fresh interpreter, median
+
+# Rough shape of a real board: most work is medium priority, a long tail of done tasks,
+# a few very common tags and many rare ones, and due dates on a minority of tasks
+PRIORITY_WEIGHTS = {"high": 20, "medium": 50, "low": 30}
+STATUS_WEIGHTS = {"todo": 45, "in_progress": 10, "blocked": 5, "done": 40}
+COMMON_TAGS = ["bug", "feature", "docs", "refactor", "test", "ui", "backend", "perf", "security", "ops"]
+DUE_DATE_SHARE = 0.4
+WORDS = ("fix update add remove refactor login cache parser export report api database query "
+         "button layout crash timeout memory config deploy build release search index sync").split()
+
+
+def parse_size(text: str) -> int:
+    """Parse 1k / 100k / 1m style sizes"""
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def generate_board(path: Path, size: int, seed: int = 42):
+    """Write a board of `size` synthetic tasks straight to a task file"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    priorities = rng.choices(list(PRIORITY_WEIGHTS), list(PRIORITY_WEIGHTS.values()), k=size)
+    statuses = rng.choices(list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values()), k=size)
+    tasks = []
+    for i in range(size):
+        created = now - timedelta(days=rng.uniform(0, 730))
+        # Zipf-like tags: common tags often, one of ~500 sprint tags sometimes
+        tags = sorted({COMMON_TAGS[min(int(rng.paretovariate(1.2)) - 1, len(COMMON_TAGS) - 1)]
+                       for _ in range(rng.randint(0, 3))})
+        if rng.random() < 0.3:
+            tags.append(f"sprint-{rng.randint(1, 500)}")
+        due = None
+        if rng.random() < DUE_DATE_SHARE:
+            due = (now + timedelta(days=rng.uniform(-60, 90))).strftime('%Y-%m-%d')
+        tasks.append({
+            "id": i + 1,
+            "title": " ".join(rng.choices(WORDS, k=rng.randint(3, 8))).capitalize(),
+            "priority": priorities[i],
+            "status": statuses[i],
+            "tags": tags,
+            "due_date": due,
+            "created": created.isoformat(),
+            "updated": (created + timedelta(days=rng.uniform(0, 30))).isoformat(),
+        })
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"tasks": tasks, "next_id": size + 1, "last_updated": now.isoformat()}, f,
+                  indent=2, ensure_ascii=False)
+
+
+def timed(fn, repeat: int) -> Dict[str, float]:
+    """Run fn `repeat` times and summarize wall time in seconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"min": min(samples), "median": statistics.median(samples), "runs": repeat}
+
+
+def run_cli(*args) -> None:
+    env = dict(os.environ, TASKFLOW_NO_DAEMON="1")
+    subprocess.run([sys.executable, TASKFLOW_SCRIPT, *args], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def measure_import(repeat: int) -> Dict[str, float]:
+    """Time `import taskflow` in fresh interpreters, as reported by -X importtime"""
+    command = [sys.executable, "-X", "importtime", "-c", "import taskflow"]
+    cwd = str(Path(TASKFLOW_SCRIPT).parent)
+    subprocess.run(command, cwd=cwd, check=True, capture_output=True)  # Write the bytecode cache
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run(command, cwd=cwd, check=True, capture_output=True, text=True)
+        for line in result.stderr.splitlines():
+            # "import time: self [us] | cumulative | imported package"
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == "taskflow":
+                samples.append(int(fields[1]) / 1e6)
+    return {"min": min(samples), "median": statistics.median(samples), "runs": repeat}
+
+
+def bench_board(size: int, workdir: Path, repeat: int, seed: int) -> Dict[str, Dict[str, float]]:
+    """Time every operation against one board size"""
+    board = workdir / f"board_{size}.json"
+    generate_board(board, size, seed)
+    rng = random.Random(seed)
+    results = {}
+
+    results["cli_cold_start"] = timed(lambda: run_cli("--file", str(board), "--no-cache", "stats"), repeat)
+    os.environ['TASKFLOW_CACHE_DIR'] = str(workdir / "cache")
+    for _ in range(2):
+        run_cli("--file", str(board), "stats")  # A file version is cached on its second read
+    results["cli_cold_start_cached"] = timed(lambda: run_cli("--file", str(board), "stats"), repeat)
+
+    tf = TaskFlow(str(board))
+    results["load_tasks"] = timed(tf.load_tasks, repeat)
+    results["save_tasks"] = timed(tf.save_tasks, repeat)
+    results["add_task"] = timed(lambda: tf.add_task("Benchmark task", "high", ["bench"]), repeat)
+
+    journaled = TaskFlow(str(board), journal=True)
+    results["add_task_journal"] = timed(lambda: journaled.add_task("Benchmark task", "high", ["bench"]), repeat)
+    journaled.save_tasks()
+    tf.load_tasks()
+
+    ids = [rng.randint(1, size) for _ in range(10000)]
+    results["get_task_x10000"] = timed(lambda: [tf.get_task(task_id) for task_id in ids], repeat)
+    results["list_tasks"] = timed(tf.list_tasks, repeat)
+    results["list_tasks_status"] = timed(lambda: tf.list_tasks(status="in_progress"), repeat)
+    results["list_tasks_priority"] = timed(lambda: tf.list_tasks(priority="high"), repeat)
+    results["list_tasks_tag"] = timed(lambda: tf.list_tasks(tag="security"), repeat)
+    results["list_tasks_combined"] = timed(lambda: tf.list_tasks("todo", "high", "bug"), repeat)
+    results["list_tasks_top20"] = timed(lambda: tf.list_tasks(limit=20), repeat)
+    results["list_tasks_top20_due"] = timed(lambda: tf.list_tasks(sort="due", limit=20), repeat)
+    results["list_tasks_where"] = timed(
+        lambda: tf.list_tasks(where="priority=high and (tag:bug or tag:perf) and status!=done"), repeat)
+    results["stats"] = timed(tf.stats, repeat)
+    results["ready_tasks_top10"] = timed(lambda: tf.ready_tasks(10), repeat)
+    tf.report()  # Seed the history log and build its rollup once
+    results["report_30d"] = timed(tf.report, repeat)
+    tf.search_index()  # Build and persist the search index once
+    results["search"] = timed(lambda: tf.search("fix cache", 20), repeat)
+    results["search_prefix"] = timed(lambda: tf.search("re", 20), repeat)
+    results["export_markdown"] = timed(lambda: tf.export_markdown(str(workdir / "TASKS.md")), repeat)
+    incremental = str(workdir / "TASKS_incremental.md")
+    tf.export_markdown(incremental, incremental=True)  # Record the run digests once
+    results["export_incremental"] = timed(lambda: tf.export_markdown(incremental, incremental=True), repeat)
+    tf.autoflush = False  # Keep the edits below in memory
+    results["export_incremental_edit"] = timed(
+        lambda: (tf.update_task(rng.randint(1, size), title="Edited"), tf.export_markdown(incremental, incremental=True)),
+        repeat)
+    return results
+
+
+def run_benchmarks(sizes: List[int], repeat: int = 3, seed: int = 42) -> Dict:
+    """Benchmark every size and return the machine-readable report"""
+    workdir = Path(tempfile.mkdtemp(prefix="taskflow-bench-"))
+    saved_cache_dir = os.environ.get('TASKFLOW_CACHE_DIR')
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now().isoformat(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": {},
+    }
+    try:
+        report["results"]["startup"] = {"import_taskflow": measure_import(max(repeat, 5))}
+        for size in sizes:
+            print(f"[BENCH] {size} tasks...")
+            report["results"][str(size)] = bench_board(size, workdir, repeat, seed)
+    finally:
+        if saved_cache_dir is None:
+            os.environ.pop('TASKFLOW_CACHE_DIR', None)
+        else:
+            os.environ['TASKFLOW_CACHE_DIR'] = saved_cache_dir
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def size_label(size: str) -> str:
+    return size if size == "startup" else f"{size} tasks"
+
+
+def compare(report: Dict, baseline: Dict, threshold: float, min_delta: float = 0.001) -> List[str]:
+    """Regressions of more than `threshold` percent against a baseline report
+
+    Medians are compared; differences under `min_delta` seconds are treated as noise.
+    """
+    regressions = []
+    for size, operations in report["results"].items():
+        for name, result in operations.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            current, previous = result["median"], base["median"]
+            if current - previous > min_delta and current > previous * (1 + threshold / 100):
+                regressions.append(f"{size_label(size)} / {name}: {previous * 1000:.2f}ms -> "
+                                   f"{current * 1000:.2f}ms (+{(current / previous - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_report(report: Dict):
+    for size, operations in report["results"].items():
+        print(f"\n[STATS] {size_label(size)}")
+        for name, result in operations.items():
+            print(f"   {name:<24} median {result['median'] * 1000:>10.2f} ms   min {result['min'] * 1000:>10.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TaskFlow benchmark suite")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Board sizes (default: {DEFAULT_SIZES})')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per operation (default: 3)')
+    parser.add_argument('--seed', type=int, default=42, help='Board generator seed')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', metavar='BASELINE', help='Fail if slower than this JSON report')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Allowed slowdown in percent for --compare (default: 10)')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS, metavar='MS',
+                        help=f'Fail if importing taskflow takes longer (default: {IMPORT_BUDGET_MS} ms)')
+    args = parser.parse_args()
+
+    report = run_benchmarks([parse_size(size) for size in args.sizes.split(',')], args.repeat, args.seed)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[OK] Report written to: {args.output}")
+
+    import_ms = report["results"]["startup"]["import_taskflow"]["median"] * 1000
+    if import_ms > args.import_budget:
+        print(f"\n[X] Startup over budget: import taskflow took {import_ms:.1f}ms "
+              f"(budget {args.import_budget:g}ms)")
+        sys.exit(1)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n[X] {len(regressions)} regression(s) over {args.threshold:g}%:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n[OK] No regressions over {args.threshold:g}% against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
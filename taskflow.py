@@ -7,23 +7,48 @@ A lightweight, git-friendly task management system for developers.
 import os
 import sys
 import io
-import json
-import argparse
+import re
+import heapq
+from contextlib import contextmanager
+from itertools import islice
+from bisect import bisect_left, bisect_right, insort
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 
-# Fix Unicode output on Windows
-if sys.stdout.encoding != 'utf-8':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+# Optional: several times faster JSON encoding/decoding. Imported on first use (see
+# _orjson) so that commands answered from the load cache never pay for it; None if missing.
+orjson = False
 
 # --- Config ---
 TASKFILE = ".taskflow.json"
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_COMPACT_BYTES = 1024 * 1024  # Fold the journal into the snapshot past 1 MiB
+CACHE_VERSION = 1
+SEARCH_SUFFIX = ".search"  # Persisted search index, next to the task file
+SEARCH_VERSION = 1
+SEARCH_LOG_SUFFIX = ".log"  # Changes appended to the search index since it was last written
+SEARCH_LOG_COMPACT_BYTES = 1024 * 1024  # Fold the log into the index past 1 MiB
+ARCHIVE_SUFFIX = ".archive"  # Directory of archived done tasks, next to the task file
+ARCHIVE_LOCK_TIMEOUT = 10.0  # Seconds to wait for another process to finish archiving
+HISTORY_SUFFIX = ".history"  # Append-only log of status transitions, next to the task file
+ROLLUP_SUFFIX = ".rollup"  # Day-level counts materialized from the history log
+ROLLUP_VERSION = 1
+ROLLUP_SERIES = ("created", "completed", "reopened", "deleted")
+# On-disk formats of the JSON backend; a file's format is detected from its first bytes
+FILE_FORMATS = ["pretty", "compact", "jsonl", "binary"]
+JSONL_HEADER = b'{"format":"jsonl"'
+BINARY_MAGIC = b"TFLOWB1\n"
+SHARDED_SUFFIX = ".d"  # e.g. .taskflow.d/ - a directory of shards (see ShardedStorage)
+SHARD_SIZE = 1000  # Task IDs per shard
 PRIORITY_COLORS = {
     "high": "[!]",
     "medium": "[~]",
     "low": "[-]"
 }
+PRIORITIES = ["high", "medium", "low"]
+STATUSES = ["todo", "in_progress", "done", "blocked"]
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
 STATUS_ICONS = {
     "todo": "[ ]",
     "in_progress": "[>]",
@@ -31,200 +56,3739 @@ STATUS_ICONS = {
     "blocked": "[#]"
 }
 
+# --- Profiling ---
+
+class Profiler:
+    """Collects per-phase wall time, counters (tasks, bytes read/written) and peak memory
+    
+    Pass one to TaskFlow(profiler=...) to instrument the library; on_phase(name, seconds)
+    is called as each phase finishes, for services that forward metrics elsewhere.
+    """
+    
+    enabled = True
+    
+    def __init__(self, on_phase=None, trace_memory: bool = False, started: float = None):
+        import time
+        self._clock = time.perf_counter
+        self._started = self._clock() if started is None else started
+        self.on_phase = on_phase
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        if trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+    
+    @contextmanager
+    def phase(self, name: str):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, self._clock() - start)
+    
+    def record(self, name: str, seconds: float):
+        """Add a phase measured elsewhere"""
+        phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+        phase["seconds"] += seconds
+        phase["calls"] += 1
+        if self.on_phase:
+            self.on_phase(name, seconds)
+    
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def report(self) -> Dict:
+        return {
+            "total_seconds": self._clock() - self._started,
+            "phases": {name: dict(phase) for name, phase in self.phases.items()},
+            "counters": dict(self.counters),
+            "peak_memory_bytes": peak_memory(),
+        }
+    
+    def emit(self, destination: str = "-", **extra):
+        """Write the report as one JSON line to stderr ("-") or append it to a file"""
+        import json
+        line = json.dumps({**extra, **self.report()})
+        if destination in ("-", "1", "stderr"):
+            print(line, file=sys.stderr)
+        else:
+            with open(destination, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+
+
+class _NullProfiler(Profiler):
+    """Profiler that records nothing - the default, so instrumentation costs ~nothing"""
+    
+    enabled = False
+    
+    def __init__(self):
+        self.phases, self.counters = {}, {}
+    
+    def phase(self, name: str):
+        return _NULL_CONTEXT
+    
+    def record(self, name: str, seconds: float):
+        pass
+    
+    def count(self, name: str, amount: int = 1):
+        pass
+
+
+class _NullContext:
+    def __enter__(self):
+        return None
+    
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+NULL_PROFILER = _NullProfiler()
+
+
+def peak_memory() -> Optional[int]:
+    """Peak memory in bytes: traced peak if tracemalloc runs, else the process max RSS"""
+    import tracemalloc
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[1]
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+# --- Task model ---
+
+def parse_due(value) -> Optional[datetime]:
+    """Parse a due date once; unparseable dates count as no due date (never overdue)"""
+    if not value:
+        return None
+    try:
+        due = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if due.tzinfo is not None:
+        # Compare everything as local naive time
+        due = due.astimezone().replace(tzinfo=None)
+    return due
+
+
+def parse_duration(text: str) -> timedelta:
+    """Parse a span like 7d, 2w, 12h or 90m (a bare number means days)"""
+    units = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+    text = text.strip().lower()
+    unit = text[-1:] if text[-1:] in units else "d"
+    number = text[:-1] if text[-1:] in units else text
+    try:
+        value = float(number)
+    except ValueError:
+        raise ValueError(f"invalid duration '{text}' (use e.g. 7d, 2w, 12h)")
+    if value < 0:
+        raise ValueError(f"invalid duration '{text}' (must not be negative)")
+    return timedelta(**{units[unit]: value})
+
+
+def parse_id_ranges(values: Iterable[str]) -> List[Tuple[int, int]]:
+    """Parse IDs and ranges (3 5 10-250, or 3,5,10-250) into (first, last) pairs, in the order given"""
+    ranges = []
+    for value in values:
+        for part in filter(None, (part.strip() for part in value.split(','))):
+            start, dash, end = part.partition('-')
+            try:
+                first = int(start)
+                last = int(end) if dash else first
+            except ValueError:
+                raise ValueError(f"invalid task ID or range '{part}' (use e.g. 7 or 10-250)")
+            if last < first:
+                raise ValueError(f"invalid range '{part}' (end before start)")
+            ranges.append((first, last))
+    return ranges
+
+
+def clip_id_ranges(ranges: Iterable[Tuple[int, int]], known) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """Resolve ID ranges against the IDs in `known` without expanding them
+    
+    Returns (the known IDs, in the order given and without repeats; the rest as merged
+    (first, last) ranges). Work is bounded by the number of known IDs, not by the ranges.
+    """
+    found, seen, missing = [], set(), []
+    ordered = None
+    for first, last in ranges:
+        if last - first < len(known):
+            hits = [task_id for task_id in range(first, last + 1) if task_id in known]
+        else:
+            if ordered is None:
+                ordered = sorted(known)
+            hits = ordered[bisect_left(ordered, first):bisect_right(ordered, last)]
+        previous = first - 1
+        for task_id in hits:
+            if task_id > previous + 1:
+                missing.append((previous + 1, task_id - 1))
+            previous = task_id
+            if task_id not in seen:
+                seen.add(task_id)
+                found.append(task_id)
+        if last > previous:
+            missing.append((previous + 1, last))
+    merged = []
+    for first, last in sorted(missing):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return found, merged
+
+
+def format_id_ranges(ranges: List[Tuple[int, int]], limit: int = 10) -> str:
+    """3, 7-9, 12-20000000 (at most `limit` ranges, then ...)"""
+    parts = [str(first) if first == last else f"{first}-{last}" for first, last in ranges[:limit]]
+    return ", ".join(parts) + (", ..." if len(ranges) > limit else "")
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Task:
+    """One task - compact attribute storage, plus mapping access matching the JSON schema
+    
+    ``task['title']``, ``task.get('tags')`` and ``'due_date' in task`` work as they did
+    when tasks were plain dicts. Fields outside the schema are kept in ``extra`` so a
+    load/save round trip is lossless.
+    """
+    
+    FIELDS = ("id", "title", "priority", "status", "tags", "due_date", "created", "updated")
+    __slots__ = ("id", "title", "priority", "status", "tags", "_due_date", "due", "created",
+                 "updated", "extra")
+    
+    def __init__(self, id: int, title: str, priority: str = "medium", status: str = "todo",
+                 tags: List[str] = None, due_date: str = None, created: str = None,
+                 updated: str = None, extra: Dict = None):
+        self.id = id
+        self.title = title
+        self.priority = _intern(priority)
+        self.status = _intern(status)
+        self.tags = tags if tags is not None else []
+        self.due_date = due_date
+        self.created = created
+        self.updated = updated
+        self.extra = extra or None
+    
+    @property
+    def due_date(self) -> Optional[str]:
+        return self._due_date
+    
+    @due_date.setter
+    def due_date(self, value: Optional[str]):
+        self._due_date = value
+        self.due = parse_due(value)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Task":
+        extra = {key: value for key, value in data.items() if key not in _TASK_FIELDS}
+        return cls(data['id'], data.get('title', ''), data.get('priority', "medium"),
+                   data.get('status', "todo"), data.get('tags'), data.get('due_date'),
+                   data.get('created'), data.get('updated'), extra)
+    
+    def to_dict(self) -> Dict:
+        data = {
+            "id": self.id,
+            "title": self.title,
+            "priority": self.priority,
+            "status": self.status,
+            "tags": self.tags,
+            "due_date": self._due_date,
+            "created": self.created,
+            "updated": self.updated,
+        }
+        if self.extra:
+            data.update(self.extra)
+        return data
+    
+    def copy(self) -> "Task":
+        """Copy deep enough that in-place edits don't leak (tags is the only nested value)"""
+        return Task(self.id, self.title, self.priority, self.status, list(self.tags),
+                    self._due_date, self.created, self.updated,
+                    dict(self.extra) if self.extra else None)
+    
+    def is_overdue(self, now: datetime = None) -> bool:
+        if self.due is None or self.status == 'done':
+            return False
+        return (now or datetime.now()) > self.due
+    
+    # Mapping interface
+    
+    def __getitem__(self, key: str):
+        if key in _TASK_FIELDS:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key: str, value):
+        if key in _TASK_FIELDS:
+            setattr(self, key, _intern(value) if key in ('status', 'priority') else value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+    
+    def __contains__(self, key) -> bool:
+        return key in _TASK_FIELDS or bool(self.extra and key in self.extra)
+    
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def keys(self) -> List[str]:
+        return list(self.FIELDS) + list(self.extra or ())
+    
+    def items(self):
+        return self.to_dict().items()
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self) -> int:
+        return len(self.FIELDS) + len(self.extra or ())
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Task):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+    
+    __hash__ = None  # Mutable
+    
+    def __repr__(self) -> str:
+        return f"Task({self.to_dict()!r})"
+
+
+_TASK_FIELDS = frozenset(Task.FIELDS)
+
+
+# --- Load cache ---
+
+def cache_dir() -> Path:
+    """Where decoded snapshots are cached: $TASKFLOW_CACHE_DIR, else the user cache dir"""
+    if os.environ.get('TASKFLOW_CACHE_DIR'):
+        return Path(os.environ['TASKFLOW_CACHE_DIR'])
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / "taskflow"
+
+
+def _cache_key(path: Path, raw: bytes) -> Tuple:
+    import hashlib
+    st = os.stat(path)
+    return (str(path.resolve()), st.st_mtime_ns, st.st_size, hashlib.blake2b(raw, digest_size=16).hexdigest())
+
+
+def _cache_file(key: Tuple) -> Path:
+    import hashlib
+    return cache_dir() / (hashlib.blake2b(key[0].encode('utf-8'), digest_size=12).hexdigest() + ".cache")
+
+
+def load_cached(key: Tuple) -> Optional[Dict]:
+    """Decoded snapshot for this exact file version, or None (missing, stale or corrupt)"""
+    import marshal
+    try:
+        # marshal.load() on a file object reads in tiny chunks; loads() on the bytes is ~7x faster
+        with open(_cache_file(key), 'rb') as f:
+            version, cached_key, data = marshal.loads(f.read())
+        if version == CACHE_VERSION and tuple(cached_key) == key:
+            return data
+    except Exception:
+        pass
+    return None
+
+
+def store_cached(key: Tuple, data: Dict):
+    """Write a cache entry atomically; failures are ignored - the cache is only an accelerator"""
+    import marshal
+    cache_file = _cache_file(key)
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            f.write(marshal.dumps((CACHE_VERSION, key, data)))
+        os.replace(tmp_file, cache_file)
+    except Exception:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+
+
+# --- Storage ---
+
+def _orjson():
+    """The orjson module, or None when it is not installed"""
+    global orjson
+    if orjson is False:
+        try:
+            import orjson as module
+        except ImportError:
+            module = None
+        orjson = module
+    return orjson
+
+
+def json_loads(raw: bytes):
+    fast = _orjson()
+    if fast:
+        return fast.loads(raw)
+    import json
+    return json.loads(raw)
+
+
+def json_dumps(data, indent: bool = False) -> bytes:
+    """UTF-8 JSON, pretty-printed with indent=True, else without any whitespace"""
+    fast = _orjson()
+    if fast:
+        return fast.dumps(data, option=fast.OPT_INDENT_2 if indent else 0)
+    import json
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def detect_file_format(raw: bytes) -> str:
+    """Format of a task file from its magic bytes / header line
+    
+    Compact files start with `{"` exactly; anything else (CRLF line endings, a BOM, leading
+    whitespace, hand-written JSON) is saved back as pretty JSON.
+    """
+    if raw.startswith(BINARY_MAGIC):
+        return "binary"
+    if raw.startswith(JSONL_HEADER):
+        return "jsonl"
+    return "compact" if raw.startswith(b'{"') else "pretty"
+
+
+def decode_snapshot(raw: bytes) -> Dict:
+    """Decode a task file in any FILE_FORMATS into {"tasks": [...], <header fields>}"""
+    fmt = detect_file_format(raw)
+    if fmt == "binary":
+        import marshal
+        return marshal.loads(raw[len(BINARY_MAGIC):])
+    if fmt == "jsonl":
+        header, _, body = raw.partition(b"\n")
+        data = json_loads(header)
+        del data['format']
+        # One decode call for all task lines is much faster than one per line
+        lines = [line for line in body.split(b"\n") if line.strip()]
+        data['tasks'] = json_loads(b"[" + b",".join(lines) + b"]")
+        return data
+    # Editors on Windows may add a BOM, which not every JSON library accepts
+    return json_loads(raw[3:] if raw.startswith(b"\xef\xbb\xbf") else raw)
+
+
+def encode_snapshot(data: Dict, fmt: str) -> bytes:
+    """Encode {"tasks": [...], <header fields>} in one of FILE_FORMATS"""
+    if fmt == "binary":
+        import marshal
+        return BINARY_MAGIC + marshal.dumps(data, 4)
+    if fmt == "jsonl":
+        header = {"format": "jsonl", **{key: value for key, value in data.items() if key != 'tasks'}}
+        return b"\n".join([json_dumps(header), *(json_dumps(task) for task in data['tasks'])]) + b"\n"
+    return json_dumps(data, indent=fmt == "pretty")
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class Storage:
+    """Where a TaskFlow keeps its tasks - subclass and register in STORAGE_BACKENDS"""
+    
+    name = ""
+    profiler: Profiler = NULL_PROFILER
+    save_errors = 0  # Saves that failed (and were reported) so far
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+    
+    def exists(self) -> bool:
+        return self.path.exists()
+    
+    def files(self) -> List[Path]:
+        """Every file this backend writes"""
+        return [self.path]
+    
+    def fingerprint(self) -> Tuple:
+        """Cheap change detector: (mtime_ns, size) of every backing file"""
+        return tuple(_stat_key(path) for path in self.files())
+    
+    def load(self) -> Tuple[Dict[int, Dict], Dict]:
+        """Return (id -> task dict in the JSON schema, insertion ordered; meta such as next_id)"""
+        raise NotImplementedError
+    
+    def load_matching(self, status: str = None, priority: str = None, tag: str = None,
+                      limit: int = None) -> Optional[Tuple[Dict[int, Dict], Dict]]:
+        """Like load(), but only (up to limit of) the tasks matching every given filter
+        
+        Returns None when the backend can only read the whole board.
+        """
+        return None
+    
+    def stats(self, now: datetime) -> Optional[Dict]:
+        """Board totals in TaskFlow.stats() form without loading the tasks (None if unsupported)"""
+        return None
+    
+    def save(self, tasks: Dict[int, "Task"], meta: Dict):
+        """Write every task, replacing whatever is stored"""
+        raise NotImplementedError
+    
+    def save_changes(self, tasks: Dict[int, Dict], changed: List[Dict], deleted: List[int], meta: Dict):
+        """Persist only the given upserts and deletes (backends override when they can)"""
+        self.save(tasks, meta)
+    
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """Single JSON snapshot, optionally with an append-only journal next to it"""
+    
+    name = "json"
+    
+    def __init__(self, path: Path, journal: bool = False,
+                 compact_threshold: int = JOURNAL_COMPACT_BYTES, cache: bool = False,
+                 file_format: str = None):
+        super().__init__(path)
+        self.journal_file = self.path.with_name(self.path.name + JOURNAL_SUFFIX)
+        self.journal = journal
+        self.compact_threshold = compact_threshold
+        self.cache = cache
+        if file_format is not None and file_format not in FILE_FORMATS:
+            raise ValueError(f"Unknown file format: {file_format}")
+        # Saves keep the format the file already has unless one is asked for
+        self.file_format = file_format
+        self.detected_format = "jsonl" if self.path.suffix.lower() == ".jsonl" else "pretty"
+    
+    def files(self) -> List[Path]:
+        return [self.path, self.journal_file]
+    
+    def load(self) -> Tuple[Dict[int, Dict], Dict]:
+        """Load the JSON snapshot, then replay any pending journal records"""
+        tasks, meta = {}, {}
+        if self.path.exists():
+            try:
+                data = self._read_snapshot()
+                tasks = {task['id']: task for task in data.get('tasks', [])}
+                # Header fields (next_id, counts, ...) pass through as meta
+                meta = {key: value for key, value in data.items() if key not in ('tasks', 'last_updated')}
+            except Exception as e:
+                print(f"[!] Warning: Could not load tasks: {e}")
+                tasks, meta = {}, {}
+        
+        if self.journal_file.exists() and self._replay_journal(tasks, meta):
+            # Header counters describe the snapshot, not the journal on top of it
+            meta.pop('counts', None)
+        return tasks, meta
+    
+    def _read_snapshot(self) -> Dict:
+        """Decode the snapshot, from the load cache when this exact file version is in it"""
+        raw = self.path.read_bytes()
+        self.profiler.count("bytes_read", len(raw))
+        if raw:
+            self.detected_format = detect_file_format(raw)
+        if not self.cache:
+            return decode_snapshot(raw)
+        key = _cache_key(self.path, raw)
+        data = load_cached(key)
+        if data is None:
+            data = decode_snapshot(raw)
+            # Cache a file version only when it is read a second time: a board that changes
+            # with every command would otherwise pay a full cache write per save and never hit
+            seen_key = (key[0] + "#seen",) + key[1:]
+            if load_cached(seen_key):
+                store_cached(key, data)
+            else:
+                store_cached(seen_key, True)
+        return data
+    
+    def _replay_journal(self, tasks: Dict[int, Dict], meta: Dict) -> int:
+        """Apply journal records on top of the loaded snapshot; returns the number applied"""
+        import json
+        applied = skipped = 0
+        try:
+            raw = self.journal_file.read_bytes()
+            self.profiler.count("bytes_read", len(raw))
+            # A last line without its newline is an append still in progress (or cut short)
+            for line in raw[:raw.rfind(b"\n") + 1].splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write from an interrupted append - the records after it are still good
+                    skipped += line.strip() != b""
+                    continue
+                if record.get('op') == 'put':
+                    task = record['task']
+                    tasks[task['id']] = task
+                    meta['next_id'] = max(meta.get('next_id', 1), task['id'] + 1)
+                elif record.get('op') == 'del':
+                    tasks.pop(record['id'], None)
+                applied += 1
+        except Exception as e:
+            print(f"[!] Warning: Could not replay journal: {e}")
+        if skipped:
+            print(f"[!] Warning: Skipped {skipped} unreadable journal line(s)")
+        return applied
+    
+    def save(self, tasks: Dict[int, Dict], meta: Dict):
+        """Save tasks to the task file in its format (also compacts the journal into the snapshot)"""
+        data = {
+            "tasks": [task.to_dict() for task in tasks.values()],
+            **meta,
+            "last_updated": datetime.now().isoformat()
+        }
+        tmp_file = self.path.with_name(self.path.name + ".tmp")
+        try:
+            raw = encode_snapshot(data, self.file_format or self.detected_format)
+            with open(tmp_file, 'wb') as f:
+                f.write(raw)
+            os.replace(tmp_file, self.path)
+            self.profiler.count("bytes_written", len(raw))
+            # Everything in the journal is now part of the snapshot
+            if self.journal_file.exists():
+                self.journal_file.unlink()
+        except Exception as e:
+            self.save_errors += 1
+            print(f"[X] Error saving tasks: {e}")
+    
+    def save_changes(self, tasks: Dict[int, Dict], changed: List[Dict], deleted: List[int], meta: Dict):
+        """Append the changes to the journal, or do a full save when journaling is off"""
+        import json
+        if not self.journal:
+            self.save(tasks, meta)
+            return
+        
+        lines = [{"op": "put", "task": task.to_dict()} for task in changed]
+        lines += [{"op": "del", "id": task_id} for task_id in deleted]
+        raw = ''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+                      for record in lines).encode('utf-8')
+        try:
+            with open(self.journal_file, 'a+b') as f:
+                # Never glue onto the tail of an append that was cut short
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        raw = b"\n" + raw
+                f.write(raw)
+                size = f.tell()
+            self.profiler.count("bytes_written", len(raw))
+        except Exception as e:
+            self.save_errors += 1
+            print(f"[X] Error saving tasks: {e}")
+            return
+        
+        if size > self.compact_threshold:
+            self.save(tasks, meta)
+
+
+class SqliteStorage(Storage):
+    """SQLite database - single-task changes only touch that task's rows"""
+    
+    name = "sqlite"
+    COLUMNS = ("id", "title", "priority", "status", "due_date", "created", "updated")
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            due_date TEXT,
+            created TEXT,
+            updated TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+        CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
+        CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+        CREATE TABLE IF NOT EXISTS task_tags (
+            task_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (task_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags(tag);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+    
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._conn = None
+    
+    def files(self) -> List[Path]:
+        return [self.path, self.path.with_name(self.path.name + "-wal")]
+    
+    def _connect(self):
+        if self._conn is None:
+            import sqlite3
+            # The daemon runs each request on its own thread; its lock serializes access
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+    
+    def load(self) -> Tuple[Dict[int, Dict], Dict]:
+        """Load all task rows and their tags"""
+        return self._select("", ())
+    
+    def load_matching(self, status: str = None, priority: str = None, tag: str = None,
+                      limit: int = None) -> Tuple[Dict[int, Dict], Dict]:
+        """Load only the matching rows, found through the status/priority/tag indexes"""
+        clauses, params = [], []
+        for column, value in (("status", status), ("priority", priority)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if tag:
+            clauses.append("id IN (SELECT task_id FROM task_tags WHERE tag = ?)")
+            params.append(tag)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(where, tuple(params), limit)
+    
+    def _select(self, where: str, params: Tuple, limit: int = None) -> Tuple[Dict[int, Dict], Dict]:
+        """Task rows matching a WHERE clause (plus their tags) in ID order, and the meta table"""
+        import json
+        tasks, meta = {}, {}
+        if not self.path.exists():
+            return tasks, meta
+        try:
+            conn = self._connect()
+            selected = f"FROM tasks{where} ORDER BY id" + ("" if limit is None else f" LIMIT {int(limit)}")
+            rows = conn.execute(f"SELECT {', '.join(self.COLUMNS)}, extra {selected}", params)
+            for row in rows:
+                task_id, title, priority, status, due_date, created, updated = row[:-1]
+                # Same key order as the JSON schema
+                task = {"id": task_id, "title": title, "priority": priority, "status": status,
+                        "tags": [], "due_date": due_date, "created": created, "updated": updated}
+                if row[-1]:
+                    task.update(json.loads(row[-1]))
+                tasks[task['id']] = task
+            if where or limit is not None:
+                tag_rows = conn.execute(f"SELECT task_id, tag FROM task_tags WHERE task_id IN "
+                                        f"(SELECT id {selected}) ORDER BY task_id, position", params)
+            else:
+                tag_rows = conn.execute("SELECT task_id, tag FROM task_tags ORDER BY task_id, position")
+            for task_id, tag in tag_rows:
+                if task_id in tasks:
+                    tasks[task_id]['tags'].append(tag)
+            for key, value in conn.execute("SELECT key, value FROM meta"):
+                meta[key] = json.loads(value)
+        except Exception as e:
+            print(f"[!] Warning: Could not load tasks: {e}")
+            tasks, meta = {}, {}
+        return tasks, meta
+    
+    def stats(self, now: datetime) -> Dict:
+        """Totals from GROUP BY queries; only open tasks' due dates are read to count overdue"""
+        stats = {"total": 0, "by_status": {}, "by_priority": {}, "overdue": 0}
+        if not self.path.exists():
+            return stats
+        conn = self._connect()
+        for column in ("status", "priority"):
+            stats[f"by_{column}"] = dict(conn.execute(f"SELECT {column}, COUNT(*) FROM tasks GROUP BY {column}"))
+        stats["total"] = sum(stats["by_status"].values())
+        for (due_date,) in conn.execute("SELECT due_date FROM tasks WHERE status != 'done' AND due_date IS NOT NULL"):
+            due = parse_due(due_date)
+            if due is not None and due < now:
+                stats["overdue"] += 1
+        return stats
+    
+    def _write_task(self, conn, task: "Task"):
+        import json
+        task = task.to_dict()
+        extra = {k: v for k, v in task.items() if k not in self.COLUMNS and k != 'tags'}
+        conn.execute(
+            f"INSERT OR REPLACE INTO tasks ({', '.join(self.COLUMNS)}, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            tuple(task.get(column) for column in self.COLUMNS) + (json.dumps(extra) if extra else None,))
+        conn.execute("DELETE FROM task_tags WHERE task_id = ?", (task['id'],))
+        conn.executemany("INSERT INTO task_tags (task_id, position, tag) VALUES (?, ?, ?)",
+                         [(task['id'], pos, tag) for pos, tag in enumerate(task.get('tags') or [])])
+    
+    def _write_meta(self, conn, meta: Dict):
+        import json
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         [(key, json.dumps(value)) for key, value in meta.items()])
+    
+    def save(self, tasks: Dict[int, Dict], meta: Dict):
+        """Replace the whole database contents in one transaction"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM tasks")
+                conn.execute("DELETE FROM task_tags")
+                for task in tasks.values():
+                    self._write_task(conn, task)
+                self._write_meta(conn, meta)
+        except Exception as e:
+            self.save_errors += 1
+            print(f"[X] Error saving tasks: {e}")
+    
+    def save_changes(self, tasks: Dict[int, Dict], changed: List[Dict], deleted: List[int], meta: Dict):
+        """Upsert/delete just the affected rows in one transaction"""
+        try:
+            conn = self._connect()
+            with conn:
+                for task in changed:
+                    self._write_task(conn, task)
+                self.profiler.count("rows_written", len(changed) + len(deleted))
+                for task_id in deleted:
+                    conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+                    conn.execute("DELETE FROM task_tags WHERE task_id = ?", (task_id,))
+                self._write_meta(conn, meta)
+        except Exception as e:
+            self.save_errors += 1
+            print(f"[X] Error saving tasks: {e}")
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class ShardedStorage(Storage):
+    """Directory of small JSON Lines shards, bucketed by ID range, plus a manifest
+    
+    A change rewrites only the shards holding the changed tasks. New tasks land in the newest
+    shard, so old shards stay untouched and parallel edits rarely touch the same file. The
+    manifest only holds settings (format, shard size, archive policy), so adding a task never
+    rewrites it: the next ID comes from the highest ID across the shards. It records next_id
+    only after the highest task was deleted or archived, so that ID is not handed out again.
+    """
+    
+    name = "sharded"
+    MANIFEST = "manifest.json"
+    
+    def __init__(self, path: Path, shard_size: int = SHARD_SIZE):
+        super().__init__(path)
+        self.manifest_file = self.path / self.MANIFEST
+        self.shard_size = shard_size
+    
+    def exists(self) -> bool:
+        return self.manifest_file.exists()
+    
+    def files(self) -> List[Path]:
+        try:
+            shards = sorted(self.path.glob("tasks-*.jsonl"))
+        except OSError:
+            shards = []
+        return [self.manifest_file, *shards]
+    
+    def _shard_file(self, shard: int) -> Path:
+        return self.path / f"tasks-{shard:06d}.jsonl"
+    
+    def _read_shard(self, path: Path) -> List[Dict]:
+        raw = path.read_bytes()
+        self.profiler.count("bytes_read", len(raw))
+        lines = [line for line in raw.split(b"\n") if line.strip()]
+        return json_loads(b"[" + b",".join(lines) + b"]")
+    
+    def load(self) -> Tuple[Dict[int, Dict], Dict]:
+        """Read the manifest, then every shard on disk (in parallel threads when there are many)"""
+        if not self.exists():
+            return {}, {}
+        try:
+            manifest = json_loads(self.manifest_file.read_bytes())
+            self.shard_size = manifest.get('shard_size', self.shard_size)
+            meta = {key: value for key, value in manifest.items() if key not in ('format', 'shard_size', 'shards')}
+            shards = self.files()[1:]
+            if len(shards) > 4:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=min(8, len(shards))) as pool:
+                    contents = list(pool.map(self._read_shard, shards))
+            else:
+                contents = [self._read_shard(shard) for shard in shards]
+        except Exception as e:
+            print(f"[!] Warning: Could not load tasks: {e}")
+            return {}, {}
+        tasks = {task['id']: task for content in contents for task in content}
+        meta['next_id'] = max(meta.get('next_id', 1), max(tasks, default=0) + 1)
+        return tasks, meta
+    
+    def _write_shard(self, shard: int, tasks: Dict[int, "Task"]):
+        """Rewrite one shard from the tasks in its ID range (removing it once it is empty)"""
+        low = shard * self.shard_size
+        members = [tasks[task_id] for task_id in range(low, low + self.shard_size) if task_id in tasks]
+        shard_file = self._shard_file(shard)
+        if not members:
+            if shard_file.exists():
+                shard_file.unlink()
+            return
+        raw = b"".join(json_dumps(task.to_dict()) + b"\n" for task in members)
+        tmp_file = shard_file.with_name(shard_file.name + ".tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_file, shard_file)
+        self.profiler.count("bytes_written", len(raw))
+    
+    def _write_manifest(self, tasks: Dict[int, "Task"], meta: Dict):
+        # Counters and next_id change with every edit; leaving them out keeps the manifest merge-friendly
+        manifest = {"format": "taskflow-shards", "shard_size": self.shard_size,
+                    **{key: value for key, value in meta.items() if key not in ('counts', 'next_id')}}
+        if meta.get('next_id', 1) > max(tasks, default=0) + 1:
+            manifest['next_id'] = meta['next_id']
+        raw = json_dumps(manifest, indent=True)
+        try:
+            if self.manifest_file.read_bytes() == raw:
+                return
+        except FileNotFoundError:
+            pass
+        tmp_file = self.manifest_file.with_name(self.MANIFEST + ".tmp")
+        with open(tmp_file, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_file, self.manifest_file)
+    
+    def _shards_on_disk(self) -> set:
+        return {int(path.stem.split("-")[1]) for path in self.files()[1:]}
+    
+    def save(self, tasks: Dict[int, "Task"], meta: Dict):
+        """Rewrite every shard (and drop shards that are now empty)"""
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            shards = {task_id // self.shard_size for task_id in tasks} | self._shards_on_disk()
+            for shard in shards:
+                self._write_shard(shard, tasks)
+            self._write_manifest(tasks, meta)
+        except Exception as e:
+            self.save_errors += 1
+            print(f"[X] Error saving tasks: {e}")
+    
+    def save_changes(self, tasks: Dict[int, "Task"], changed: List["Task"], deleted: List[int], meta: Dict):
+        """Rewrite only the shards that hold a changed or deleted task"""
+        if not self.exists():
+            self.save(tasks, meta)
+            return
+        try:
+            dirty = {task.id // self.shard_size for task in changed}
+            dirty.update(task_id // self.shard_size for task_id in deleted)
+            for shard in dirty:
+                self._write_shard(shard, tasks)
+            self._write_manifest(tasks, meta)
+        except Exception as e:
+            self.save_errors += 1
+            print(f"[X] Error saving tasks: {e}")
+
+
+STORAGE_BACKENDS = {
+    "json": JsonStorage,
+    "sqlite": SqliteStorage,
+    "sharded": ShardedStorage,
+}
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def detect_backend(task_file: str) -> str:
+    """Pick a storage backend from the task file's extension (directories are sharded)"""
+    path = Path(task_file)
+    if path.suffix.lower() in SQLITE_EXTENSIONS:
+        return "sqlite"
+    if path.suffix.lower() == SHARDED_SUFFIX or path.is_dir():
+        return "sharded"
+    return "json"
+
+
+def open_storage(task_file: str, backend: str = None, journal: bool = False,
+                 compact_threshold: int = JOURNAL_COMPACT_BYTES, cache: bool = False,
+                 file_format: str = None) -> Storage:
+    """Create the storage for a task file (journal, cache and format options only apply to JSON)"""
+    backend = backend or detect_backend(task_file)
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if backend == "json":
+        return JsonStorage(Path(task_file), journal, compact_threshold, cache, file_format)
+    return STORAGE_BACKENDS[backend](Path(task_file))
+
+
+# --- Export ---
+
+EXPORT_ORDER = ["in_progress", "todo", "blocked", "done"]
+EXPORT_CHUNK = 1000  # Incremental export digests runs of tasks from the same 1000-ID range
+
+
+class Renderer:
+    """Streaming export format: header, then one section per status, then footer
+    
+    task() must depend only on the task itself so incremental exports can reuse its output
+    while 'updated' is unchanged. Bump version when the output of task() changes.
+    """
+    
+    name = ""
+    extensions: Tuple[str, ...] = ()
+    version = 1
+    
+    def header(self, total: int) -> str:
+        return ""
+    
+    def section(self, status: str, count: int) -> str:
+        return ""
+    
+    def section_end(self, status: str) -> str:
+        return ""
+    
+    def task(self, task: Task) -> str:
+        raise NotImplementedError
+    
+    def footer(self) -> str:
+        return ""
+
+
+class MarkdownRenderer(Renderer):
+    name = "markdown"
+    extensions = (".md", ".markdown")
+    
+    def header(self, total: int) -> str:
+        return (f"# 📋 TaskFlow - Project Tasks\n"
+                f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n"
+                f"**Total Tasks:** {total}\n\n"
+                "---\n\n")
+    
+    def section(self, status: str, count: int) -> str:
+        status_name = status.replace('_', ' ').title()
+        return f"## {STATUS_ICONS[status]} {status_name} ({count})\n\n"
+    
+    def task(self, task: Task) -> str:
+        lines = [
+            f"### {PRIORITY_COLORS[task.priority]} [{task.id}] {task.title}\n\n",
+            f"- **Priority:** {task.priority}\n",
+            f"- **Status:** {task.status}\n",
+        ]
+        if task.tags:
+            lines.append(f"- **Tags:** {', '.join(task.tags)}\n")
+        if task.due_date:
+            lines.append(f"- **Due:** {task.due_date}\n")
+        lines.append(f"- **Created:** {(task.created or '')[:10]}\n")
+        lines.append("\n")
+        return ''.join(lines)
+
+
+class CsvRenderer(Renderer):
+    name = "csv"
+    extensions = (".csv",)
+    COLUMNS = ("id", "title", "priority", "status", "tags", "due_date", "created", "updated")
+    
+    def _row(self, values) -> str:
+        import csv
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(values)
+        return buffer.getvalue()
+    
+    def header(self, total: int) -> str:
+        return self._row(self.COLUMNS)
+    
+    def task(self, task: Task) -> str:
+        # Same layout 'taskflow import' reads back
+        return self._row([task.id, task.title, task.priority, task.status, ','.join(task.tags),
+                          task.due_date or '', task.created or '', task.updated or ''])
+
+
+class JsonLinesRenderer(Renderer):
+    name = "jsonl"
+    extensions = (".jsonl", ".ndjson")
+    
+    def task(self, task: Task) -> str:
+        import json
+        return json.dumps(task.to_dict(), ensure_ascii=False) + "\n"
+
+
+class HtmlRenderer(Renderer):
+    name = "html"
+    extensions = (".html", ".htm")
+    
+    def header(self, total: int) -> str:
+        return ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+                "<title>TaskFlow - Project Tasks</title>\n</head>\n<body>\n"
+                "<h1>TaskFlow - Project Tasks</h1>\n"
+                f"<p><strong>Generated:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M')}<br>\n"
+                f"<strong>Total Tasks:</strong> {total}</p>\n")
+    
+    def section(self, status: str, count: int) -> str:
+        from html import escape
+        return f"<h2>{escape(status.replace('_', ' ').title())} ({count})</h2>\n<ul>\n"
+    
+    def section_end(self, status: str) -> str:
+        return "</ul>\n"
+    
+    def task(self, task: Task) -> str:
+        from html import escape
+        details = [f"priority: {task.priority}"]
+        if task.tags:
+            details.append(f"tags: {', '.join(task.tags)}")
+        if task.due_date:
+            details.append(f"due: {task.due_date}")
+        return (f"<li class=\"{escape(task.priority)}\">[{task.id}] {escape(task.title)} "
+                f"<small>({escape(' | '.join(details))})</small></li>\n")
+    
+    def footer(self) -> str:
+        return "</body>\n</html>\n"
+
+
+EXPORT_FORMATS = {renderer.name: renderer for renderer in
+                  (MarkdownRenderer, CsvRenderer, JsonLinesRenderer, HtmlRenderer)}
+
+
+def detect_export_format(output_file: str) -> str:
+    """Pick an export format from the output file's extension (Markdown by default)"""
+    suffix = Path(output_file).suffix.lower()
+    for name, renderer in EXPORT_FORMATS.items():
+        if suffix in renderer.extensions:
+            return name
+    return "markdown"
+
+
+def _export_groups(tasks: List[Task]) -> Dict[str, List[Task]]:
+    """Tasks of each EXPORT_ORDER section, in board order"""
+    groups = {status: [] for status in EXPORT_ORDER}
+    for task in tasks:
+        group = groups.get(task.status)
+        if group is not None:
+            group.append(task)
+    return groups
+
+
+def write_export(tasks: List[Task], output_file: str, renderer: Renderer) -> bool:
+    """Stream tasks to output_file grouped by status, in one pass; replaces the file atomically"""
+    groups = _export_groups(tasks)
+    tmp_file = f"{output_file}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+            f.write(renderer.header(len(tasks)))
+            for status in EXPORT_ORDER:
+                if not groups[status]:
+                    continue
+                f.write(renderer.section(status, len(groups[status])))
+                for task in groups[status]:
+                    f.write(renderer.task(task))
+                f.write(renderer.section_end(status))
+            f.write(renderer.footer())
+        os.replace(tmp_file, output_file)
+    except Exception as e:
+        print(f"[X] Error exporting: {e}")
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+        return False
+    return True
+
+
+def write_export_incremental(tasks: List[Task], output_file: str, renderer: Renderer,
+                             board: Tuple = None) -> bool:
+    """write_export() that reuses what the last incremental export of output_file wrote
+    
+    Each section is cut into runs of tasks from the same EXPORT_CHUNK ID range and every run
+    is digested by its IDs and 'updated' stamps. Runs the last export wrote are copied from
+    the old file instead of rendered, and when no digest changed the file is left as it is
+    (header included). The cache entry holds only the digests and their byte ranges.
+    board is the storage fingerprint of the tasks (None with unsaved changes): while it
+    matches the last export's, the file is left alone without digesting anything.
+    """
+    import hashlib
+    import marshal
+    key = (f"export:{Path(output_file).resolve()}:{renderer.name}", renderer.version)
+    cached = load_cached(key) or {}
+    ranges = cached.get("ranges", {}) if cached.get("file") == _stat_key(Path(output_file)) else {}
+    if ranges and board is not None and cached.get("board") == board:
+        return True  # The board is the one last exported
+    
+    # One pass: status -> runs of (ID range, tasks, their IDs and stamps)
+    grouped = {status: [] for status in EXPORT_ORDER}
+    stamped = True
+    for task in tasks:
+        runs = grouped.get(task.status)
+        if runs is None:
+            continue
+        chunk = task.id // EXPORT_CHUNK
+        if not runs or runs[-1][0] != chunk:
+            runs.append((chunk, [], []))
+        run = runs[-1]
+        run[1].append(task)
+        run[2].append((task.id, task.updated))
+        stamped = stamped and bool(task.updated)
+    
+    def digest(stamps: List[Tuple[int, str]]) -> Optional[str]:
+        # A change without a new 'updated' stamp can't be seen: such runs are always rendered
+        if not stamped and not all(updated for _, updated in stamps):
+            return None
+        return hashlib.blake2b(marshal.dumps(stamps), digest_size=16).hexdigest()
+    
+    sections = [(status, [(digest(stamps), run) for _, run, stamps in grouped[status]])
+                for status in EXPORT_ORDER if grouped[status]]
+    layout = [len(tasks)] + [[status, [digest for digest, _ in runs]] for status, runs in sections]
+    if ranges and stamped and cached.get("layout") == layout:
+        if board is not None and cached.get("board") != board:
+            cached["board"] = board
+            store_cached(key, cached)
+        return True  # Nothing changed since the last export
+    
+    written = {}
+    tmp_file = f"{output_file}.tmp"
+    try:
+        with open(tmp_file, 'wb') as f, (open(output_file, 'rb') if ranges else io.BytesIO()) as previous:
+            f.write(renderer.header(len(tasks)).encode('utf-8'))
+            for status, runs in sections:
+                f.write(renderer.section(status, sum(len(run) for _, run in runs)).encode('utf-8'))
+                for digest, run in runs:
+                    span = ranges.get(digest)
+                    if span is not None:
+                        previous.seek(span[0])
+                        data = previous.read(span[1])
+                    else:
+                        data = "".join(renderer.task(task) for task in run).encode('utf-8')
+                    if digest is not None:
+                        written[digest] = (f.tell(), len(data))
+                    f.write(data)
+                f.write(renderer.section_end(status).encode('utf-8'))
+            f.write(renderer.footer().encode('utf-8'))
+        os.replace(tmp_file, output_file)
+    except Exception as e:
+        print(f"[X] Error exporting: {e}")
+        if os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+        return False
+    store_cached(key, {"file": _stat_key(Path(output_file)), "board": board, "layout": layout, "ranges": written})
+    return True
+
+
+# --- Search ---
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a title, tag or query"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex:
+    """Inverted index (token -> task IDs) over titles and tags
+    
+    Each document remembers the task's 'updated' stamp, so a persisted index can be brought up
+    to date by re-tokenizing only the tasks that changed since it was written. Saves append
+    the changed documents to a log next to the index file (see append()); load() replays it.
+    """
+    
+    def __init__(self):
+        self.postings: Dict[str, set] = {}
+        self.docs: Dict[int, Tuple[str, Tuple[str, ...]]] = {}
+        self._vocabulary: Optional[List[str]] = None
+        # True when the file on disk needs a rewrite: add() and remove() only change memory
+        # (saves log those changes), sync() and a long log set it
+        self.dirty = False
+    
+    @staticmethod
+    def document(task: Task) -> Tuple[str, Tuple[str, ...]]:
+        """(updated stamp, distinct tokens of the title and tags) of a task"""
+        text = " ".join([task.title or "", *task.tags]) if task.tags else task.title
+        return task.updated, tuple(dict.fromkeys(tokenize(text)))
+    
+    def add(self, task: Task):
+        self._add(task.id, self.document(task))
+    
+    def _add(self, task_id: int, doc: Tuple[str, Tuple[str, ...]]):
+        self.docs[task_id] = doc
+        tokens, postings = doc[1], self.postings
+        vocabulary_size = len(postings)
+        for token in tokens:
+            if token in postings:
+                postings[token].add(task_id)
+            else:
+                postings[token] = {task_id}
+        if len(postings) != vocabulary_size:
+            self._vocabulary = None
+    
+    def remove(self, task_id: int):
+        doc = self.docs.pop(task_id, None)
+        if doc is None:
+            return
+        for token in doc[1]:
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del self.postings[token]
+                    self._vocabulary = None
+    
+    def sync(self, tasks: Dict[int, Task]) -> int:
+        """Re-index tasks added, changed or deleted since the index was built; returns how many"""
+        changed = 0
+        for task_id in [task_id for task_id in self.docs if task_id not in tasks]:
+            self.remove(task_id)
+            changed += 1
+        for task in tasks.values():
+            doc = self.docs.get(task.id)
+            if doc is None or doc[0] != task.updated:
+                self.remove(task.id)
+                self.add(task)
+                changed += 1
+        if changed:
+            self.dirty = True
+        return changed
+    
+    def _expand(self, term: str) -> List[str]:
+        """Indexed tokens that start with term"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, term)
+        end = start
+        while end < len(vocabulary) and vocabulary[end].startswith(term):
+            end += 1
+        return vocabulary[start:end]
+    
+    def search(self, query: str) -> List[Tuple[float, int]]:
+        """(score, task ID) for tasks matching every query term, best first
+        
+        Each term matches whole tokens and token prefixes; rarer tokens and exact matches
+        score higher.
+        """
+        import math
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        total = len(self.docs) or 1
+        scores = None
+        # Narrow with the most selective term first
+        expanded = sorted(((term, self._expand(term)) for term in terms),
+                          key=lambda item: sum(len(self.postings[token]) for token in item[1]))
+        for term, tokens in expanded:
+            term_scores = {}
+            for token in tokens:
+                ids = self.postings[token]
+                weight = math.log(1 + total / len(ids)) * (1.0 if token == term else 0.5)
+                for task_id in (ids if scores is None else ids.intersection(scores)):
+                    if weight > term_scores.get(task_id, 0.0):
+                        term_scores[task_id] = weight
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {task_id: scores[task_id] + weight for task_id, weight in term_scores.items()}
+            if not scores:
+                return []
+        return sorted(((score, task_id) for task_id, score in scores.items()),
+                      key=lambda item: (-item[0], item[1]))
+    
+    @staticmethod
+    def log_file(path: Path) -> Path:
+        return path.with_name(path.name + SEARCH_LOG_SUFFIX)
+    
+    @classmethod
+    def append(cls, path: Path, changed: Iterable[Task], deleted: Iterable[int]) -> int:
+        """Log changed and deleted tasks for the index saved at path, without loading it
+        
+        Costs O(changes), not O(board). Returns the log's size afterwards, or 0 (having
+        written nothing) when no index has been saved yet - there is nothing to bring up to date.
+        """
+        import marshal
+        if not path.exists():
+            return 0
+        records = [(task.id, cls.document(task)) for task in changed]
+        records.extend((task_id, None) for task_id in deleted)
+        try:
+            with open(cls.log_file(path), 'ab') as f:
+                f.write(marshal.dumps(records))
+                return f.tell()
+        except OSError:
+            return 0
+    
+    def load(self, path: Path) -> bool:
+        """Read a persisted index and replay its log; False when missing, from another version
+        or corrupt. A log past SEARCH_LOG_COMPACT_BYTES leaves the index dirty, so the next
+        save folds it in."""
+        import marshal
+        try:
+            with open(path, 'rb') as f:
+                version, docs, postings = marshal.loads(f.read())
+        except Exception:
+            return False
+        if version != SEARCH_VERSION:
+            return False
+        self.docs = docs
+        self.postings = {token: set(ids) for token, ids in postings.items()}
+        self._vocabulary = None
+        log_size = 0
+        try:
+            with open(self.log_file(path), 'rb') as f:
+                while True:
+                    try:
+                        records = marshal.load(f)
+                    except (EOFError, ValueError, TypeError):
+                        break  # End of the log, or an append still in progress
+                    for task_id, doc in records:
+                        self.remove(task_id)
+                        if doc is not None:
+                            self._add(task_id, tuple(doc))
+                log_size = f.tell()
+        except OSError:
+            pass
+        self.dirty = log_size > SEARCH_LOG_COMPACT_BYTES
+        return True
+    
+    def save(self, path: Path):
+        """Persist atomically and drop the log; failures are ignored - the index can always be
+        rebuilt (and sync() catches changes another process logged in the meantime)"""
+        import marshal
+        tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(marshal.dumps((SEARCH_VERSION, self.docs,
+                                       {token: list(ids) for token, ids in self.postings.items()})))
+            os.replace(tmp_file, path)
+            self.dirty = False
+        except Exception:
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+            return
+        try:
+            self.log_file(path).unlink()
+        except FileNotFoundError:
+            pass
+
+
+# --- Archive ---
+
+class Archive:
+    """Cold storage for finished tasks: append-only JSON Lines segments, one per month of
+    completion, plus a small index (ID -> segment and byte offset) so single tasks can be
+    fetched without reading any segment in full
+    """
+    
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.index_file = self.directory / "index.json"
+        self.lock_file = self.directory / "index.lock"
+        self._index: Optional[Dict] = None
+        self._index_key: Optional[Tuple[int, int]] = None
+        self._locations: Optional[Dict[int, Tuple[str, int]]] = None
+    
+    def exists(self) -> bool:
+        return self.index_file.exists()
+    
+    @property
+    def index(self) -> Dict:
+        """The index as on disk - re-read whenever another process has replaced it"""
+        import json
+        key = _stat_key(self.index_file)
+        if self._index is None or key != self._index_key:
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except FileNotFoundError:
+                self._index = {"max_id": 0, "segments": {}, "counts": {"priority": {}}}
+            self._index_key = key
+            self._locations = None
+        return self._index
+    
+    @property
+    def locations(self) -> Dict[int, Tuple[str, int]]:
+        self.index
+        if self._locations is None:
+            self._locations = {task_id: (segment, offset)
+                               for segment, entries in self.index["segments"].items()
+                               for task_id, offset in entries}
+        return self._locations
+    
+    def __contains__(self, task_id: int) -> bool:
+        return self.exists() and task_id in self.locations
+    
+    def __len__(self) -> int:
+        return len(self.locations) if self.exists() else 0
+    
+    def _segment_file(self, segment: str) -> Path:
+        return self.directory / f"{segment}.jsonl"
+    
+    def append(self, tasks: Iterable[Task]) -> int:
+        """Archive tasks (already archived IDs are skipped); returns how many were written
+        
+        Segment lines are fsynced before the index is replaced, so a crash in between only
+        leaves unindexed lines behind - never an index entry without its task.
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            return self._append(tasks)
+    
+    def _append(self, tasks: List[Task]) -> int:
+        import json
+        # Start from the index on disk, not a copy that may predate another process's append
+        self._index = None
+        index, locations = self.index, self.locations
+        segments: Dict[str, List[Task]] = {}
+        for task in tasks:
+            if task.id not in locations:
+                segment = (task.updated or datetime.now().isoformat())[:7]
+                segments.setdefault(segment, []).append(task)
+        if not segments:
+            return 0
+        
+        written = 0
+        for segment, batch in segments.items():
+            entries = index["segments"].setdefault(segment, [])
+            with open(self._segment_file(segment), 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                for task in batch:
+                    line = json.dumps(task.to_dict(), ensure_ascii=False, separators=(',', ':')) + "\n"
+                    f.write(line.encode('utf-8'))
+                    entries.append([task.id, offset])
+                    locations[task.id] = (segment, offset)
+                    offset = f.tell()
+                    counts = index["counts"]["priority"]
+                    counts[task.priority] = counts.get(task.priority, 0) + 1
+                    index["max_id"] = max(index["max_id"], task.id)
+                    written += 1
+                f.flush()
+                os.fsync(f.fileno())
+        
+        tmp_file = self.index_file.with_name(f"{self.index_file.name}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(tmp_file, self.index_file)
+        self._index_key = _stat_key(self.index_file)
+        return written
+    
+    @contextmanager
+    def _locked(self):
+        """Hold the archive's lock file; one that outlives the timeout is taken to be stale"""
+        import time
+        deadline = time.monotonic() + ARCHIVE_LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    self._unlock()  # Left behind by a crashed process
+                    deadline = time.monotonic() + ARCHIVE_LOCK_TIMEOUT
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            self._unlock()
+    
+    def _unlock(self):
+        try:
+            self.lock_file.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def get(self, task_id: int) -> Optional[Task]:
+        """One archived task, read by seeking straight to its line"""
+        import json
+        if task_id not in self:
+            return None
+        segment, offset = self.locations[task_id]
+        with open(self._segment_file(segment), 'rb') as f:
+            f.seek(offset)
+            return Task.from_dict(json.loads(f.readline()))
+    
+    def tasks(self) -> Iterator[Task]:
+        """Every archived task, oldest segment first"""
+        import json
+        if not self.exists():
+            return
+        for segment in sorted(self.index["segments"]):
+            wanted = {offset for _, offset in self.index["segments"][segment]}
+            with open(self._segment_file(segment), 'rb') as f:
+                offset = 0
+                for line in f:
+                    if offset in wanted:
+                        yield Task.from_dict(json.loads(line))
+                    offset += len(line)
+    
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Archived tasks per status / priority (only done tasks are archived)"""
+        if not self.exists():
+            return {"status": {}, "priority": {}}
+        return {"status": {"done": len(self.locations)}, "priority": dict(self.index["counts"]["priority"])}
+
+
+# --- History ---
+
+class History:
+    """Append-only log of status transitions, plus day-level rollups materialized from it
+    
+    Log lines are tab-separated: ``<epoch seconds> <task id> <from> <to>`` ("-" when the
+    task is created or deleted), or ``seed <YYYY-MM-DD> <created> <completed>`` for tasks
+    that predate the log. The rollup keeps one array of per-day counts for each of
+    ROLLUP_SERIES and the log offset it covers, so a report only replays events logged
+    since the rollup was last written - and none at all once it is loaded in memory.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.rollup_file = self.path.with_name(self.path.name + ROLLUP_SUFFIX)
+        self._rollup: Optional[Dict] = None
+    
+    def exists(self) -> bool:
+        return self.path.exists()
+    
+    def seed(self, tasks: Iterable[Task]):
+        """Start the log from a board: each task counts as created on its created date and,
+        once done, as completed on its last update"""
+        created, completed = {}, {}
+        for task in tasks:
+            day = (task.created or "")[:10]
+            if parse_due(day):
+                created[day] = created.get(day, 0) + 1
+            day = (task.updated or "")[:10]
+            if task.status == 'done' and parse_due(day):
+                completed[day] = completed.get(day, 0) + 1
+        lines = "".join(f"seed\t{day}\t{created.get(day, 0)}\t{completed.get(day, 0)}\n"
+                        for day in sorted(created.keys() | completed.keys()))
+        tmp_file = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(lines)
+        os.replace(tmp_file, self.path)
+        self._rollup = None
+    
+    def append(self, events: List[Tuple[float, int, Optional[str], Optional[str]]]):
+        """Log (timestamp, task id, old status, new status) transitions"""
+        data = "".join(f"{int(timestamp)}\t{task_id}\t{old or '-'}\t{new or '-'}\n"
+                       for timestamp, task_id, old, new in events).encode('utf-8')
+        with open(self.path, 'ab') as f:
+            start = f.tell()
+            f.write(data)
+        rollup = self._rollup
+        if rollup is not None and rollup["offset"] == start:
+            # Nobody else wrote in between: count the events straight into the loaded rollup
+            for timestamp, task_id, old, new in events:
+                for name in self._series_of(old, new):
+                    self._add(rollup, name, datetime.fromtimestamp(timestamp).toordinal())
+            rollup["offset"] = start + len(data)
+    
+    def rollup(self) -> Dict:
+        """The rollup, caught up with the log (written back when it had fallen behind)"""
+        from array import array
+        rollup = self._rollup or self._load_rollup()
+        size = self.path.stat().st_size if self.exists() else 0
+        if rollup is None or rollup["offset"] > size:
+            # Missing, corrupt or ahead of a replaced log: rebuild from the start
+            rollup = {"origin": None, "offset": 0, "series": {name: array('i') for name in ROLLUP_SERIES}}
+        if rollup["offset"] < size:
+            with open(self.path, 'rb') as f:
+                f.seek(rollup["offset"])
+                tail = f.read(size - rollup["offset"])
+            # Whole lines only - another process may be in the middle of an append
+            end = tail.rfind(b"\n") + 1
+            for (name, day), count in self._tally(tail[:end].decode('utf-8')).items():
+                self._add(rollup, name, day, count)
+            rollup["offset"] += end
+            self._save_rollup(rollup)
+        self._rollup = rollup
+        return rollup
+    
+    def daily(self, first: int, last: int) -> Dict[str, List[int]]:
+        """Per-day counts for the day ordinals first..last, plus "open": open tasks at the
+        end of each day"""
+        rollup = self.rollup()
+        series = rollup["series"]
+        origin = rollup["origin"] if rollup["origin"] is not None else first
+        start, stop = first - origin, last - origin + 1
+        
+        def window(values) -> List[int]:
+            return [values[i] if 0 <= i < len(values) else 0 for i in range(start, stop)]
+        
+        def total(values, end: int) -> int:
+            return sum(values[:max(end, 0)])
+        
+        result = {name: window(series[name]) for name in ROLLUP_SERIES}
+        running = (total(series["created"], start) + total(series["reopened"], start)
+                   - total(series["completed"], start) - total(series["deleted"], start))
+        result["open"] = []
+        for created, reopened, completed, deleted in zip(result["created"], result["reopened"],
+                                                         result["completed"], result["deleted"]):
+            running += created + reopened - completed - deleted
+            result["open"].append(running)
+        return result
+    
+    @staticmethod
+    def _tally(text: str) -> Dict[Tuple[str, int], int]:
+        """Count log lines into {(series, day ordinal): count}"""
+        transitions: Dict[Tuple[int, str, str], int] = {}  # (quarter hour, from, to) -> count
+        counts: Dict[Tuple[str, int], int] = {}
+        for line in text.splitlines():
+            try:
+                first, second, old, new = line.split("\t")
+                if first == "seed":
+                    day = datetime.fromisoformat(second).toordinal()
+                    for name, count in (("created", int(old)), ("completed", int(new))):
+                        counts[name, day] = counts.get((name, day), 0) + count
+                    continue
+                key = (int(first) // 900, old, new)
+            except ValueError:
+                continue  # A torn or hand-edited line: skip it
+            transitions[key] = transitions.get(key, 0) + 1
+        # Every UTC offset is a whole number of quarter hours: a quarter never spans two days
+        for (quarter, old, new), count in transitions.items():
+            day = datetime.fromtimestamp(quarter * 900).toordinal()
+            for name in History._series_of(None if old == "-" else old, None if new == "-" else new):
+                counts[name, day] = counts.get((name, day), 0) + count
+        return counts
+    
+    @staticmethod
+    def _series_of(old: Optional[str], new: Optional[str]) -> Tuple[str, ...]:
+        """Series a transition counts towards (None: created / deleted)"""
+        series = ("created",) if old is None else ()
+        if new == 'done' and old != 'done':
+            return series + ("completed",)
+        if old == 'done' and new is not None and new != 'done':
+            return series + ("reopened",)
+        if new is None and old is not None and old != 'done':
+            return series + ("deleted",)
+        return series
+    
+    @staticmethod
+    def _add(rollup: Dict, name: str, day: int, count: int = 1):
+        """Add to one day of a series, growing every series to cover that day"""
+        from array import array
+        series = rollup["series"]
+        if rollup["origin"] is None:
+            rollup["origin"] = day
+        if day < rollup["origin"]:
+            padding = array('i', [0]) * (rollup["origin"] - day)
+            for key in series:
+                series[key] = padding + series[key]
+            rollup["origin"] = day
+        index = day - rollup["origin"]
+        values = series[name]
+        if index >= len(values):
+            padding = array('i', [0]) * (index + 1 - len(values))
+            for key in series:
+                series[key].extend(padding)
+        values[index] += count
+    
+    def _load_rollup(self) -> Optional[Dict]:
+        import marshal
+        from array import array
+        try:
+            with open(self.rollup_file, 'rb') as f:
+                data = marshal.loads(f.read())
+            if data["version"] != ROLLUP_VERSION:
+                return None
+            series = {}
+            for name in ROLLUP_SERIES:
+                series[name] = array('i')
+                series[name].frombytes(data["series"][name])
+            return {"origin": data["origin"], "offset": data["offset"], "series": series}
+        except Exception:
+            return None
+    
+    def _save_rollup(self, rollup: Dict):
+        """Write the rollup atomically; failures are ignored - it is rebuilt from the log"""
+        import marshal
+        data = {"version": ROLLUP_VERSION, "origin": rollup["origin"], "offset": rollup["offset"],
+                "series": {name: values.tobytes() for name, values in rollup["series"].items()}}
+        tmp_file = self.rollup_file.with_name(f"{self.rollup_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(marshal.dumps(data))
+            os.replace(tmp_file, self.rollup_file)
+        except OSError:
+            pass
+
+
+def _sort_key(task: Task):
+    """Listing order: priority (high > medium > low), then ID"""
+    return (PRIORITY_ORDER.get(task.priority, 3), task.id)
+
+
+def _ready_key(task: Task):
+    """Ready-queue order: priority, then due date (undated last), then ID"""
+    return (PRIORITY_ORDER.get(task.priority, 3), task.due is None, task.due or datetime.min, task.id)
+
+
+def _dependencies(task: Task) -> List[int]:
+    """IDs a task depends on (kept in the task's extra fields as depends_on)"""
+    return task.extra.get("depends_on") or [] if task.extra else []
+
+
+# Orders list_tasks(sort=...) accepts; prefix with "-" to reverse. Ties keep priority order.
+SORT_KEYS = {
+    "priority": _sort_key,
+    "id": lambda task: task.id,
+    "title": lambda task: (task.title or "").lower(),
+    "created": lambda task: task.created or "",
+    "updated": lambda task: task.updated or "",
+    "due": lambda task: (task.due is None, task.due or datetime.min),
+}
+
+
+# --- Query language ---
+#
+#   priority=high and (tag:bug or tag:urgent) and due<2026-11-01 and status!=done
+#
+# Fields: status, priority, tag (tag:x is short for tag=x), due, created, updated, id, title.
+# Operators: = != < <= > >= and ~ (title contains); combine with and / or / not and parentheses.
+# "due=none" matches tasks without a due date.
+
+_QUERY_TOKEN_RE = re.compile(r"""\s*(?:(\(|\))|("[^"]*"|'[^']*')|(!=|<=|>=|=|<|>|~|:)|([^\s()=<>!~:"']+))""")
+QUERY_FIELDS = ("status", "priority", "tag", "due", "created", "updated", "id", "title")
+_ORDERED_OPS = ("<", "<=", ">", ">=")
+
+
+def _query_tokens(text: str) -> List[Tuple[str, str]]:
+    """(kind, value) tokens: paren, string, op, word"""
+    tokens, pos = [], 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _QUERY_TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"unexpected character at position {pos}: {text[pos:]!r}")
+        paren, string, op, word = match.groups()
+        if paren:
+            tokens.append(("paren", paren))
+        elif string:
+            tokens.append(("string", string[1:-1]))
+        elif op:
+            tokens.append(("op", op))
+        else:
+            tokens.append(("word", word))
+        pos = match.end()
+    return tokens
+
+
+class _QueryParser:
+    """Recursive descent: or > and > not > comparison / parentheses"""
+    
+    def __init__(self, text: str):
+        self.tokens = _query_tokens(text)
+        self.pos = 0
+    
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+    
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None:
+            raise ValueError("unexpected end of query")
+        self.pos += 1
+        return token
+    
+    def keyword(self, word: str) -> bool:
+        token = self.peek()
+        if token and token[0] == "word" and token[1].lower() == word:
+            self.pos += 1
+            return True
+        return False
+    
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"unexpected {self.peek()[1]!r}")
+        return node
+    
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.keyword("or"):
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+    
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.keyword("and"):
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+    
+    def parse_not(self):
+        if self.keyword("not"):
+            return ("not", self.parse_not())
+        if self.peek() == ("paren", "("):
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ("paren", ")"):
+                raise ValueError("missing closing parenthesis")
+            self.take()
+            return node
+        return self.parse_comparison()
+    
+    def parse_comparison(self):
+        kind, field = self.take()
+        field = field.lower()
+        if kind != "word" or field not in QUERY_FIELDS:
+            raise ValueError(f"unknown field {field!r} (use {', '.join(QUERY_FIELDS)})")
+        kind, op = self.take()
+        if kind != "op":
+            raise ValueError(f"expected an operator after {field!r}")
+        if op == ":":
+            op = "="
+        kind, value = self.take()
+        if kind not in ("word", "string"):
+            raise ValueError(f"expected a value after {field}{op}")
+        return ("cmp", field, op, _query_value(field, op, value))
+
+
+def _query_value(field: str, op: str, value: str):
+    """Validate and convert a comparison's value once, at compile time"""
+    if field in ("status", "priority"):
+        choices = STATUSES if field == "status" else PRIORITIES
+        if value not in choices or op not in ("=", "!="):
+            raise ValueError(f"{field} supports = and != with one of {', '.join(choices)}")
+        return value
+    if field == "tag":
+        if op not in ("=", "!="):
+            raise ValueError("tag supports = and != (or tag:name)")
+        return value
+    if field == "id":
+        if op == "~" or not value.isdigit():
+            raise ValueError("id compares against a number")
+        return int(value)
+    if field == "title":
+        if op in _ORDERED_OPS:
+            raise ValueError("title supports =, != and ~")
+        return value.lower()
+    # due / created / updated
+    if op == "~":
+        raise ValueError(f"{field} does not support ~")
+    if value.lower() == "none" and op in ("=", "!="):
+        return None
+    moment = parse_due(value)
+    if moment is None:
+        raise ValueError(f"invalid date for {field}: {value!r}")
+    return moment
+
+
+def _compare(op: str, left, right) -> bool:
+    # Missing values (no due date) never satisfy an ordering
+    if op == "=":
+        return left == right
+    if op == "!=":
+        return left != right
+    if left is None or right is None:
+        return False
+    if op == "<":
+        return left < right
+    if op == "<=":
+        return left <= right
+    if op == ">":
+        return left > right
+    return left >= right
+
+
+def _both(left, right):
+    return lambda task: left(task) and right(task)
+
+
+def _either(left, right):
+    return lambda task: left(task) or right(task)
+
+
+def _compile_node(node):
+    """Turn an AST node into a predicate(task) -> bool"""
+    kind = node[0]
+    if kind in ("and", "or"):
+        # Chain closures pairwise: cheaper per task than all()/any() over a generator
+        parts = [_compile_node(child) for child in node[1]]
+        predicate = parts[-1]
+        for part in reversed(parts[:-1]):
+            predicate = _both(part, predicate) if kind == "and" else _either(part, predicate)
+        return predicate
+    if kind == "not":
+        inner = _compile_node(node[1])
+        return lambda task: not inner(task)
+    
+    _, field, op, value = node
+    if field == "tag":
+        if op == "=":
+            return lambda task: value in (task.tags or [])
+        return lambda task: value not in (task.tags or [])
+    if field == "title":
+        if op == "~":
+            return lambda task: value in (task.title or "").lower()
+        return lambda task: _compare(op, (task.title or "").lower(), value)
+    if field == "status":
+        return (lambda task: task.status == value) if op == "=" else (lambda task: task.status != value)
+    if field == "priority":
+        return (lambda task: task.priority == value) if op == "=" else (lambda task: task.priority != value)
+    if field in ("created", "updated"):
+        return lambda task: _compare(op, parse_due(getattr(task, field)), value)
+    return lambda task: _compare(op, getattr(task, field), value)
+
+
+def _format_node(node) -> str:
+    """Canonical text of an AST node (what --explain shows)"""
+    kind = node[0]
+    if kind in ("and", "or"):
+        return f" {kind} ".join(f"({_format_node(child)})" if child[0] in ("and", "or") else _format_node(child)
+                                for child in node[1])
+    if kind == "not":
+        child = _format_node(node[1])
+        return f"not ({child})" if node[1][0] in ("and", "or") else f"not {child}"
+    _, field, op, value = node
+    if isinstance(value, datetime):
+        value = value.isoformat().replace("T00:00:00", "")
+    return f"{field}{op}{'none' if value is None else _quote_value(str(value))}"
+
+
+def _quote_value(value: str) -> str:
+    return value if re.fullmatch(r"[^\s()=<>!~:\"']+", value) else f'"{value}"'
+
+
+def _excludes_done(node) -> bool:
+    """True when no done task can match - the due index only holds open tasks"""
+    kind = node[0]
+    if kind == "and":
+        return any(_excludes_done(child) for child in node[1])
+    if kind == "or":
+        return all(_excludes_done(child) for child in node[1])
+    if kind == "cmp" and node[1] == "status":
+        return (node[2] == "!=") == (node[3] == "done")
+    return False
+
+
+class QueryPlan:
+    """How candidates are fetched: an index lookup (or a union of them), or a full scan"""
+    
+    def __init__(self, description: str, cost: int, fetch, ordered: bool = False):
+        self.description = description
+        self.cost = cost  # Number of candidates the lookup yields
+        self.fetch = fetch  # () -> task IDs (in listing order when ordered)
+        self.ordered = ordered
+
+
+class Query:
+    """A --where expression, parsed and compiled once"""
+    
+    def __init__(self, text: str):
+        self.text = text
+        self.ast = _QueryParser(text).parse()
+        self.predicate = _compile_node(self.ast)
+    
+    def __str__(self) -> str:
+        return _format_node(self.ast)
+    
+    def plan(self, tf: 'TaskFlow') -> Optional[QueryPlan]:
+        """The cheapest index-driven plan for this query, or None to scan every task"""
+        return self._plan(self.ast, tf, _excludes_done(self.ast))
+    
+    def _plan(self, node, tf: 'TaskFlow', excludes_done: bool) -> Optional[QueryPlan]:
+        kind = node[0]
+        if kind == "and":
+            excludes_done = excludes_done or _excludes_done(node)
+            plans = [plan for plan in (self._plan(child, tf, excludes_done) for child in node[1]) if plan]
+            # Drive from the most selective index; the other conditions are checked per candidate
+            return min(plans, key=lambda plan: plan.cost) if plans else None
+        if kind == "or":
+            plans = [self._plan(child, tf, excludes_done) for child in node[1]]
+            if not all(plans):
+                return None
+            
+            def union():
+                seen = set()
+                for plan in plans:
+                    seen.update(plan.fetch())
+                return seen
+            return QueryPlan(" + ".join(plan.description for plan in plans),
+                             sum(plan.cost for plan in plans), union)
+        
+        if kind == "not":
+            return None
+        
+        _, field, op, value = node
+        indexes = {"status": tf._by_status, "priority": tf._by_priority, "tag": tf._by_tag}
+        if field in indexes and op == "=":
+            bucket = indexes[field].get(value, [])
+            return QueryPlan(f"index {field}={value}", len(bucket),
+                             lambda: (task_id for _, task_id in bucket), ordered=True)
+        if field == "status" and op == "!=":
+            buckets = [bucket for status, bucket in tf._by_status.items() if status != value]
+            return QueryPlan(f"index status!={value}", sum(map(len, buckets)),
+                             lambda: (task_id for _, task_id in heapq.merge(*buckets)), ordered=True)
+        if field == "due" and value is not None and op != "!=" and excludes_done:
+            # The due index holds open tasks only, so it can drive a query that excludes done ones
+            due = tf._by_due
+            low, high = 0, len(due)
+            if op in ("<", "<=", "="):
+                high = bisect_left(due, (value,)) if op == "<" else bisect_right(due, (value, sys.maxsize))
+            if op in (">", ">=", "="):
+                low = bisect_right(due, (value, sys.maxsize)) if op == ">" else bisect_left(due, (value,))
+            return QueryPlan(f"index {_format_node(node)}", max(0, high - low),
+                             lambda: (task_id for _, task_id in due[low:high]))
+        return None
+    
+    def explain(self, tf: 'TaskFlow') -> str:
+        plan = self.plan(tf)
+        total = len(tf._tasks)
+        lines = [f"Query: {self}"]
+        if plan is None:
+            lines.append(f"Plan:  full scan of {total} task(s)")
+        else:
+            lines.append(f"Plan:  {plan.description} -> {plan.cost} candidate(s) of {total}")
+        lines.append("Then:  check the full predicate on each candidate")
+        return "\n".join(lines)
+
+
+_QUERY_CACHE: Dict[str, Query] = {}
+
+
+def compile_query(text: str) -> Query:
+    """Parse and compile a query; compiled queries are reused (the daemon sees the same ones often)"""
+    query = _QUERY_CACHE.get(text)
+    if query is None:
+        if len(_QUERY_CACHE) > 256:
+            _QUERY_CACHE.clear()
+        query = _QUERY_CACHE[text] = Query(text)
+    return query
+
+
 class TaskFlow:
     """CLI task manager"""
     
-    def __init__(self, task_file: str = TASKFILE):
-        self.task_file = Path(task_file)
-        self.tasks: List[Dict] = []
-        self.load_tasks()
+    def __init__(self, task_file: str = TASKFILE, journal: bool = False,
+                 compact_threshold: int = JOURNAL_COMPACT_BYTES, backend: str = None,
+                 storage: Storage = None, cache: bool = False, profiler: Profiler = None,
+                 file_format: str = None, view: Dict = None):
+        self.task_file = Path(task_file)
+        if storage is None:
+            storage = open_storage(task_file, backend, journal, compact_threshold, cache, file_format)
+        self.storage = storage
+        self.profiler = profiler
+        # id -> task, kept in insertion order so deletes are O(1) and ordering is stable
+        self._tasks: Dict[int, Task] = {}
+        self._next_id = 1
+        # Secondary indexes: field value -> sort keys of matching tasks, each bucket kept sorted
+        self._by_status: Dict[str, List] = {}
+        self._by_priority: Dict[str, List] = {}
+        self._by_tag: Dict[str, List] = {}
+        # (due, id) of every open task with a due date, kept sorted
+        self._by_due: List[Tuple[datetime, int]] = []
+        # Running totals per status / priority, persisted in the file header as "counts"
+        self._status_counts: Dict[str, int] = {}
+        self._priority_counts: Dict[str, int] = {}
+        # Full-text index, loaded on the first search and kept up to date from then on
+        self._search: Optional[SearchIndex] = None
+        # Dependency graph: task -> tasks depending on it, and task -> number of its
+        # prerequisites still open. The ready queue (_ready_key of every todo task waiting
+        # on nothing) is built on first use and kept sorted from then on.
+        self._dependents: Dict[int, set] = {}
+        self._waiting: Dict[int, int] = {}
+        self._ready: Optional[List[Tuple]] = None
+        # Cold storage for done tasks, opened on first use; the policy is persisted in the header
+        self._archive: Optional[Archive] = None
+        self.archive_after: Optional[str] = None
+        self._archived_on: Optional[str] = None
+        # Batch state: IDs touched since the batch began, and their pre-batch copies for rollback
+        self._batch_depth = 0
+        self._dirty: set = set()
+        self._undo: Dict[int, Optional[Task]] = {}
+        self._undo_next_id = 1
+        self._undo_dirty: set = set()
+        self._undo_order: Optional[List[int]] = None  # Task order, kept once a batch deletes
+        # Status transitions not yet written to the history log (and the count before the batch)
+        self._history: Optional[History] = None
+        self._events: List[Tuple[float, int, Optional[str], Optional[str]]] = []
+        self._undo_events = 0
+        # Persist every mutation (or batch) right away; off when the caller flushes on its own
+        self.autoflush = True
+        # Read-only view: load_matching() filters for backends that can query (see open_taskflow);
+        # partial is set once only those tasks were loaded, and stats() then asks the storage
+        self.view = view
+        self.partial = False
+        self.load_tasks()
+    
+    @property
+    def profiler(self) -> Profiler:
+        """Instrumentation hooks (a no-op profiler unless one was given)"""
+        return self._profiler
+    
+    @profiler.setter
+    def profiler(self, profiler: Optional[Profiler]):
+        self._profiler = profiler or NULL_PROFILER
+        self.storage.profiler = self._profiler
+    
+    @property
+    def tasks(self) -> List[Task]:
+        """All tasks in insertion order (a fresh list - mutate through the API)"""
+        return list(self._tasks.values())
+    
+    def load_tasks(self):
+        """Load tasks from storage"""
+        # Lets an incremental export tell that the board on disk is still the one in memory
+        self._loaded_fingerprint = self.storage.fingerprint()
+        with self._profiler.phase("load"):
+            loaded = self.storage.load_matching(**self.view) if self.view is not None else None
+            self.partial = loaded is not None
+            tasks, meta = loaded if self.partial else self.storage.load()
+            self._tasks = {task_id: Task.from_dict(task) for task_id, task in tasks.items()}
+        self._profiler.count("tasks_loaded", len(self._tasks))
+        self._events = []
+        self._archive = None  # Another process may have archived since the last load
+        # Older files have no counter; never hand out an ID that is still in use
+        self._next_id = max(meta.get('next_id', 1), max(self._tasks, default=0) + 1)
+        self.archive_after = meta.get('archive_after')
+        self._archived_on = meta.get('archived_on')
+        if 'next_id' not in meta and self.archive.exists():
+            # No counter to trust: archived IDs must not be handed out again either
+            self._next_id = max(self._next_id, self.archive.index['max_id'] + 1)
+        with self._profiler.phase("index"):
+            self._rebuild_indexes()
+        # The rebuild counted the index buckets; a header that disagrees (hand edits, merges)
+        # is rewritten by the next flush
+        self.counters_drifted = not self.partial and meta.get('counts', self._counts()) != self._counts()
+    
+    def _meta(self) -> Dict:
+        meta = {"next_id": self._next_id, "counts": self._counts()}
+        if self.archive_after:
+            meta.update(archive_after=self.archive_after, archived_on=self._archived_on)
+        return meta
+    
+    def _counts(self) -> Dict[str, Dict[str, int]]:
+        return {"status": dict(self._status_counts), "priority": dict(self._priority_counts)}
+    
+    def _count(self, task: Task, delta: int):
+        """Adjust the running counters for one task"""
+        for counts, key in ((self._status_counts, task.status), (self._priority_counts, task.priority)):
+            value = counts.get(key, 0) + delta
+            if value:
+                counts[key] = value
+            else:
+                del counts[key]
+    
+    def verify_counters(self) -> bool:
+        """Recount from the tasks and repair the running counters; False if they had drifted"""
+        status_counts, priority_counts = {}, {}
+        for task in self._tasks.values():
+            status_counts[task.status] = status_counts.get(task.status, 0) + 1
+            priority_counts[task.priority] = priority_counts.get(task.priority, 0) + 1
+        consistent = (status_counts, priority_counts) == (self._status_counts, self._priority_counts)
+        self._status_counts, self._priority_counts = status_counts, priority_counts
+        return consistent
+    
+    def stats(self, now: datetime = None, include_archived: bool = False) -> Dict:
+        """Board totals from the running counters - O(1) in the number of tasks
+        
+        include_archived adds the archive's totals, kept in its index.
+        """
+        if self.partial:
+            stats = self.storage.stats(now or datetime.now())
+        else:
+            stats = {
+                "total": len(self._tasks),
+                "by_status": dict(self._status_counts),
+                "by_priority": dict(self._priority_counts),
+                "overdue": self.count_overdue(now),
+            }
+        if include_archived:
+            archived = self.archive.counts()
+            stats["total"] += len(self.archive)
+            for key, counts in (("by_status", archived["status"]), ("by_priority", archived["priority"])):
+                for value, count in counts.items():
+                    stats[key][value] = stats[key].get(value, 0) + count
+        return stats
+    
+    def save_tasks(self):
+        """Save all tasks to storage"""
+        self._check_writable()
+        self._loaded_fingerprint = None
+        with self._profiler.phase("save"):
+            self.storage.save(self._tasks, self._meta())
+        self.counters_drifted = False
+        self._save_search()
+        self._save_history()
+    
+    def _remember(self, task_id: int):
+        """Keep the pre-batch state of a task so the batch can be rolled back"""
+        if self._batch_depth and task_id not in self._undo:
+            task = self._tasks.get(task_id)
+            self._undo[task_id] = task.copy() if task is not None else None
+    
+    def _remember_order(self):
+        """Keep the task order before the batch's first deletion (rollback restores it)"""
+        if self._batch_depth and self._undo_order is None:
+            self._undo_order = list(self._tasks)
+    
+    def _persist(self, task_id: int):
+        """Persist a mutation of one task now, or at the end of the current batch"""
+        self._dirty.add(task_id)
+        if not self._batch_depth and self.autoflush:
+            self.flush()
+    
+    def _check_writable(self):
+        """Saving a partial board would drop every task it did not load"""
+        if self.partial:
+            raise RuntimeError("a filtered view of the board is read-only")
+    
+    def flush(self):
+        """Write every pending change to storage in one go"""
+        if not self._dirty:
+            return
+        self._check_writable()
+        self._loaded_fingerprint = None
+        self._apply_archive_policy()
+        changed = [self._tasks[task_id] for task_id in self._dirty if task_id in self._tasks]
+        deleted = [task_id for task_id in self._dirty if task_id not in self._tasks]
+        self._dirty = set()
+        with self._profiler.phase("save"):
+            if self.counters_drifted:
+                # A full save replaces the stale header (a journal append would keep it)
+                self.storage.save(self._tasks, self._meta())
+                self.counters_drifted = False
+            else:
+                self.storage.save_changes(self._tasks, changed, deleted, self._meta())
+        self._save_search(changed, deleted)
+        self._save_history()
+    
+    @contextmanager
+    def batch(self):
+        """Group mutations: persist once on exit, or roll back in memory if an exception escapes
+        
+        Nested batches join the outermost one.
+        """
+        self._batch_depth += 1
+        if self._batch_depth == 1:
+            self._undo = {}
+            self._undo_order = None
+            self._undo_next_id = self._next_id
+            self._undo_dirty = set(self._dirty)
+            self._undo_events = len(self._events)
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._rollback()
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self._undo = {}
+            self._undo_order = None
+            if self.autoflush:
+                self.flush()
+    
+    def _rollback(self):
+        """Restore every task touched by the current batch, in its original place"""
+        for task_id, original in self._undo.items():
+            current = self._tasks.get(task_id)
+            if current is not None:
+                self._index_remove(current)
+                if original is None:
+                    del self._tasks[task_id]
+            if original is not None:
+                self._tasks[task_id] = original  # Replacing a value keeps its position
+                self._index_add(original)
+        if self._undo_order is not None:
+            # Deleted tasks were re-added at the end; put every task back where it was
+            self._tasks = {task_id: self._tasks[task_id] for task_id in self._undo_order
+                           if task_id in self._tasks}
+        self._next_id = self._undo_next_id
+        self._undo = {}
+        self._undo_order = None
+        # Changes made before the batch (not yet flushed without autoflush) stay pending
+        self._dirty = self._undo_dirty
+        del self._events[self._undo_events:]
+    
+    def close(self):
+        """Release storage resources (database connections)"""
+        self.storage.close()
+    
+    def add_task(self, title: str, priority: str = "medium", tags: List[str] = None,
+                 due_date: str = None) -> Task:
+        """Add new task"""
+        now = datetime.now().isoformat()
+        task = Task(self._generate_id(), title, priority, "todo", tags or [], due_date, now, now)
+        self._remember(task.id)
+        self._tasks[task.id] = task
+        self._index_add(task)
+        self._record(task.id, None, task.status)
+        self._persist(task.id)
+        return task
+    
+    def _generate_id(self) -> int:
+        """Generate unique task ID (IDs of deleted tasks are never reused)"""
+        task_id = self._next_id
+        self._next_id += 1
+        return task_id
+    
+    def get_task(self, task_id: int, include_archived: bool = True) -> Optional[Task]:
+        """Get task by ID (archived tasks are read from the archive, as a detached copy)"""
+        task = self._tasks.get(task_id)
+        if task is None and include_archived:
+            return self.archive.get(task_id)
+        return task
+    
+    def is_archived(self, task_id: int) -> bool:
+        return task_id not in self._tasks and task_id in self.archive
+    
+    def _index_buckets(self, task: Task):
+        """Index buckets a task belongs to"""
+        buckets = [
+            self._by_status.setdefault(task.status, []),
+            self._by_priority.setdefault(task.priority, []),
+        ]
+        for tag in set(task.tags or []):
+            buckets.append(self._by_tag.setdefault(tag, []))
+        return buckets
+    
+    def _index_add(self, task: Task):
+        """Add a task to the secondary indexes"""
+        key = _sort_key(task)
+        for bucket in self._index_buckets(task):
+            insort(bucket, key)
+        self._count(task, 1)
+        if task.due is not None and task.status != 'done':
+            insort(self._by_due, (task.due, task.id))
+        if self._search is not None:
+            self._search.add(task)
+        
+        dependencies = _dependencies(task)
+        if dependencies:
+            for dependency in dependencies:
+                self._dependents.setdefault(dependency, set()).add(task.id)
+            waiting = sum(1 for dependency in dependencies if self._is_open(dependency))
+            if waiting:
+                self._waiting[task.id] = waiting
+        if self._ready is not None and task.status == 'todo' and task.id not in self._waiting:
+            insort(self._ready, _ready_key(task))
+        if task.status != 'done':
+            # An open task holds back everything that depends on it
+            for dependent in self._dependents.get(task.id, ()):
+                self._adjust_waiting(self._tasks[dependent], 1)
+    
+    def _index_remove(self, task: Task):
+        """Remove a task from the secondary indexes (call before changing its fields)"""
+        key = _sort_key(task)
+        for bucket in self._index_buckets(task):
+            pos = bisect_left(bucket, key)
+            if pos < len(bucket) and bucket[pos] == key:
+                del bucket[pos]
+        self._count(task, -1)
+        if task.due is not None and task.status != 'done':
+            key = (task.due, task.id)
+            pos = bisect_left(self._by_due, key)
+            if pos < len(self._by_due) and self._by_due[pos] == key:
+                del self._by_due[pos]
+        if self._search is not None:
+            self._search.remove(task.id)
+        
+        if task.status != 'done':
+            for dependent in self._dependents.get(task.id, ()):
+                self._adjust_waiting(self._tasks[dependent], -1)
+        for dependency in _dependencies(task):
+            dependents = self._dependents.get(dependency)
+            if dependents:
+                dependents.discard(task.id)
+                if not dependents:
+                    del self._dependents[dependency]
+        if not self._waiting.pop(task.id, 0) and task.status == 'todo':
+            self._ready_remove(task)
+    
+    def _is_open(self, task_id: int) -> bool:
+        """Whether a prerequisite still holds its dependents back (missing/archived ones don't)"""
+        task = self._tasks.get(task_id)
+        return task is not None and task.status != 'done'
+    
+    def _adjust_waiting(self, task: Task, delta: int):
+        """Change a task's count of open prerequisites, moving it in or out of the ready queue"""
+        before = self._waiting.get(task.id, 0)
+        after = before + delta
+        if after:
+            self._waiting[task.id] = after
+        else:
+            self._waiting.pop(task.id, None)
+        if task.status == 'todo' and self._ready is not None and (before == 0) != (after == 0):
+            if after:
+                self._ready_remove(task)
+            else:
+                insort(self._ready, _ready_key(task))
+    
+    def _ready_remove(self, task: Task):
+        if self._ready is not None:
+            key = _ready_key(task)
+            pos = bisect_left(self._ready, key)
+            if pos < len(self._ready) and self._ready[pos] == key:
+                del self._ready[pos]
+    
+    def _rebuild_indexes(self):
+        """Build the secondary indexes from scratch (one sort per bucket)"""
+        self._by_status, self._by_priority, self._by_tag = {}, {}, {}
+        self._by_due = []
+        self._search = None
+        self._dependents, self._waiting, self._ready = {}, {}, None
+        for task in self._tasks.values():
+            if task.extra and task.extra.get("depends_on"):
+                dependencies = task.extra["depends_on"]
+                for dependency in dependencies:
+                    self._dependents.setdefault(dependency, set()).add(task.id)
+                waiting = sum(1 for dependency in dependencies if self._is_open(dependency))
+                if waiting:
+                    self._waiting[task.id] = waiting
+            key = _sort_key(task)
+            for bucket in self._index_buckets(task):
+                bucket.append(key)
+            if task.due is not None and task.status != 'done':
+                self._by_due.append((task.due, task.id))
+        for index in (self._by_status, self._by_priority, self._by_tag):
+            for bucket in index.values():
+                bucket.sort()
+        self._by_due.sort()
+        # The buckets already hold every task once: counting them is O(statuses), not O(tasks)
+        self._status_counts = {status: len(bucket) for status, bucket in self._by_status.items() if bucket}
+        self._priority_counts = {priority: len(bucket) for priority, bucket in self._by_priority.items() if bucket}
+    
+    def update_task(self, task_id: int, **kwargs):
+        """Update task fields"""
+        task = self._tasks.get(task_id)
+        if not task:
+            return False
+        
+        self._remember(task_id)
+        self._index_remove(task)
+        status = task.status
+        for key, value in kwargs.items():
+            # The ID is the index key - it cannot be changed in place
+            if key in task and key != 'id':
+                task[key] = value
+        
+        task.updated = datetime.now().isoformat()
+        self._index_add(task)
+        if task.status != status:
+            self._record(task_id, status, task.status)
+        self._persist(task_id)
+        return True
+    
+    def delete_task(self, task_id: int) -> bool:
+        """Delete task (and drop it from the dependencies of tasks that depended on it)"""
+        if task_id in self._dependents and task_id in self._tasks:
+            with self.batch():
+                for dependent in sorted(self._dependents[task_id]):
+                    self.remove_dependency(dependent, task_id)
+                return self.delete_task(task_id)
+        
+        self._remember(task_id)
+        if task_id in self._tasks:
+            self._remember_order()
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return False
+        
+        self._index_remove(task)
+        self._record(task_id, task.status, None)
+        self._persist(task_id)
+        return True
+    
+    def add_dependency(self, task_id: int, depends_on: int):
+        """Make task_id wait for depends_on to be done; raises ValueError on a missing task or a cycle"""
+        task = self._tasks.get(task_id)
+        for missing in (task_id, depends_on):
+            if missing not in self._tasks:
+                raise ValueError(f"task {missing} not found")
+        if depends_on in _dependencies(task):
+            return
+        # Walk the prerequisites of depends_on: reaching task_id means the new edge closes a cycle
+        stack, seen = [depends_on], set()
+        while stack:
+            current = stack.pop()
+            if current == task_id:
+                raise ValueError(f"task {depends_on} already depends on task {task_id} (cycle)")
+            if current not in seen and current in self._tasks:
+                seen.add(current)
+                stack.extend(_dependencies(self._tasks[current]))
+        self._set_dependencies(task, _dependencies(task) + [depends_on])
+    
+    def remove_dependency(self, task_id: int, depends_on: int) -> bool:
+        """Drop one dependency edge; returns False if there was none"""
+        task = self._tasks.get(task_id)
+        if task is None or depends_on not in _dependencies(task):
+            return False
+        self._set_dependencies(task, [dependency for dependency in _dependencies(task)
+                                      if dependency != depends_on])
+        return True
+    
+    def _set_dependencies(self, task: Task, dependencies: List[int]):
+        self._remember(task.id)
+        self._index_remove(task)
+        # A new list: the batch undo copy shares the old one
+        task['depends_on'] = dependencies
+        if not dependencies:
+            del task.extra['depends_on']
+        task.updated = datetime.now().isoformat()
+        self._index_add(task)
+        self._persist(task.id)
+    
+    def dependents(self, task_id: int) -> List[int]:
+        """IDs of the tasks that depend on task_id"""
+        return sorted(self._dependents.get(task_id, ()))
+    
+    def waiting_on(self, task_id: int) -> List[int]:
+        """Prerequisites of task_id that are not done yet"""
+        task = self._tasks.get(task_id)
+        return [dependency for dependency in _dependencies(task) if self._is_open(dependency)] if task else []
+    
+    def ready_tasks(self, limit: int = None) -> List[Task]:
+        """Todo tasks with every prerequisite done, by priority, then due date, then ID"""
+        if self._ready is None:
+            todo = (self._tasks[task_id] for _, task_id in self._by_status.get('todo', []))
+            self._ready = sorted(_ready_key(task) for task in todo if task.id not in self._waiting)
+        return [self._tasks[key[-1]] for key in islice(self._ready, limit)]
+    
+    def count_waiting(self) -> int:
+        """Number of open tasks still waiting on a prerequisite"""
+        return sum(1 for task_id in self._waiting if self._tasks[task_id].status != 'done')
+    
+    def _record(self, task_id: int, old: Optional[str], new: Optional[str]):
+        """Note a status transition (None: created / deleted) for the history log"""
+        self._events.append((datetime.now().timestamp(), task_id, old, new))
+    
+    @property
+    def history(self) -> History:
+        if self._history is None:
+            self._history = History(self.storage.path.with_name(self.storage.path.name + HISTORY_SUFFIX))
+        return self._history
+    
+    def _save_history(self):
+        """Append pending status transitions to the history log (started from the board if new)"""
+        if not self._events or not self.storage.exists():
+            return
+        events, self._events = self._events, []
+        if self.history.exists():
+            self.history.append(events)
+        else:
+            # The seed is taken from the tasks as they are now, so it already covers these events
+            self.history.seed(self._tasks.values())
+    
+    def report(self, since: timedelta = timedelta(days=30), now: datetime = None) -> Dict:
+        """Burndown and velocity per day over the last `since`, from the history rollups
+        
+        Returns {"days": [YYYY-MM-DD, ...], "open": [...], "created": [...], "completed": [...],
+        "reopened": [...], "deleted": [...]}, one value per day, oldest first.
+        """
+        now = now or datetime.now()
+        with self._profiler.phase("report"):
+            if not self.history.exists() and self.storage.exists():
+                self.history.seed(self._tasks.values())
+                self._events = []
+            last = now.toordinal()
+            first = min((now - since).toordinal() + 1, last)
+            report = self.history.daily(first, last)
+        report["days"] = [datetime.fromordinal(day).date().isoformat() for day in range(first, last + 1)]
+        return report
+    
+    @property
+    def archive(self) -> Archive:
+        if self._archive is None:
+            self._archive = Archive(self.storage.path.with_name(self.storage.path.name + ARCHIVE_SUFFIX))
+        return self._archive
+    
+    def archive_tasks(self, older_than: timedelta = None, now: datetime = None) -> int:
+        """Move done tasks (finished more than older_than ago) to the archive; returns how many"""
+        moved = self._archive_done(older_than, now)
+        if moved and not self._batch_depth and self.autoflush:
+            self.flush()
+        return moved
+    
+    def _archive_done(self, older_than: Optional[timedelta], now: Optional[datetime]) -> int:
+        candidates = self._write_archive(older_than, now)
+        self._drop_archived(candidates)
+        return len(candidates)
+    
+    def _write_archive(self, older_than: Optional[timedelta], now: Optional[datetime] = None) -> List[Task]:
+        """Append the done tasks due for archiving to the archive; the board is not changed"""
+        cutoff = ((now or datetime.now()) - (older_than or timedelta(0))).isoformat()
+        finished = [self._tasks[task_id] for _, task_id in self._by_status.get('done', [])]
+        candidates = [task for task in finished if (task.updated or "") <= cutoff]
+        if candidates:
+            # Archive first: a crash in between leaves a task in both places, never in neither
+            self.archive.append(candidates)
+        return candidates
+    
+    def _drop_archived(self, candidates: List[Task]):
+        """Remove tasks written by _write_archive from the board"""
+        if candidates:
+            self._remember_order()
+        for task in candidates:
+            self._remember(task.id)
+            del self._tasks[task.id]
+            self._index_remove(task)
+            self._dirty.add(task.id)
+    
+    def set_archive_policy(self, after: Optional[str]):
+        """Archive done tasks automatically once they have been done for `after` (e.g. "30d")"""
+        if after:
+            parse_duration(after)
+        self.archive_after = after or None
+        self._archived_on = None
+        self.save_tasks()
+    
+    def _apply_archive_policy(self):
+        """Run the auto-archive policy, at most once a day, as part of a save"""
+        older_than = self._archive_policy_due()
+        if older_than is not None:
+            self._archive_done(older_than, None)
+    
+    def _archive_policy_due(self) -> Optional[timedelta]:
+        """The policy's age cutoff when today's auto-archive has yet to run (marks it as run)"""
+        today = datetime.now().date().isoformat()
+        if not self.archive_after or self._archived_on == today:
+            return None
+        self._archived_on = today
+        return parse_duration(self.archive_after)
+    
+    @property
+    def search_file(self) -> Path:
+        return self.storage.path.with_name(self.storage.path.name + SEARCH_SUFFIX)
+    
+    def search_index(self) -> SearchIndex:
+        """The full-text index: read from disk and synced with the board on first use"""
+        if self._search is None:
+            index = SearchIndex()
+            with self._profiler.phase("search_index"):
+                index.load(self.search_file)
+                index.sync(self._tasks)
+            self._search = index
+            if not self._batch_depth:
+                self._save_search()
+        return self._search
+    
+    def _save_search(self, changed: List[Task] = None, deleted: List[int] = None):
+        """Persist the search index
+        
+        A flush passes its changes, which are appended to the index's log whether or not this
+        process loaded the index. The whole index is only rewritten when it is dirty: just
+        built, or loaded with a log past SEARCH_LOG_COMPACT_BYTES.
+        """
+        index = self._search
+        if changed is not None and (index is None or not index.dirty):
+            log_size = SearchIndex.append(self.search_file, changed, deleted or [])
+            if index is None or 0 < log_size <= SEARCH_LOG_COMPACT_BYTES:
+                return
+            # No index file to log against yet, or a log long enough to fold in
+            index.dirty = True
+        if index is not None and index.dirty and self.storage.exists():
+            index.save(self.search_file)
+    
+    def search(self, query: str, limit: int = None) -> List[Task]:
+        """Tasks whose title or tags contain every word of query (prefixes match), best first"""
+        with self._profiler.phase("search"):
+            hits = self.search_index().search(query)
+        return [self._tasks[task_id] for _, task_id in hits[:limit]]
+    
+    def list_tasks(self, status: str = None, priority: str = None, tag: str = None,
+                   sort: str = None, limit: int = None, offset: int = 0,
+                   include_archived: bool = False, where: str = None) -> List[Task]:
+        """List tasks with optional filters, sorted by priority then ID (or a SORT_KEYS order)
+        
+        With a limit only the first offset + limit matches are produced: in priority order the
+        walk stops early, other orders keep a bounded heap instead of sorting every match.
+        include_archived also reads the archive. where takes a query (see compile_query);
+        invalid queries raise ValueError.
+        """
+        with self._profiler.phase("list"):
+            query = self._where_query(where, status, priority, tag)
+            matches = self._query_tasks(query) if query else self._filter_tasks(status, priority, tag)
+            if include_archived:
+                archived = sorted(self._archived_matches(status, priority, tag, query), key=_sort_key)
+                matches = heapq.merge(matches, archived, key=_sort_key)
+            end = None if limit is None else offset + limit
+            if sort in (None, "priority"):
+                return list(islice(matches, offset, end))
+            reverse = sort.startswith("-")
+            key = SORT_KEYS[sort.lstrip("-")]
+            if end is None:
+                return sorted(matches, key=key, reverse=reverse)[offset:]
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            return select(end, matches, key=key)[offset:]
+    
+    def count_tasks(self, status: str = None, priority: str = None, tag: str = None,
+                    include_archived: bool = False, where: str = None) -> int:
+        """Number of tasks list_tasks() would return without a limit"""
+        query = self._where_query(where, status, priority, tag)
+        if include_archived:
+            archived = sum(1 for _ in self._archived_matches(status, priority, tag, query))
+            return archived + self.count_tasks(status, priority, tag, where=where)
+        if query:
+            return sum(1 for _ in self._query_tasks(query))
+        filters = [index.get(value, []) for index, value in
+                   ((self._by_status, status), (self._by_priority, priority), (self._by_tag, tag))
+                   if value]
+        if not filters:
+            return len(self._tasks)
+        if len(filters) == 1:
+            return len(filters[0])
+        return sum(1 for _ in self._filter_tasks(status, priority, tag))
+    
+    def _filter_tasks(self, status: str, priority: str, tag: str) -> Iterator[Task]:
+        """Matching tasks in priority order, produced lazily"""
+        if not (status or priority or tag):
+            keys = heapq.merge(*self._by_priority.values())
+            return (self._tasks[task_id] for _, task_id in keys)
+        return self._probe_tasks(status, priority, tag)
+    
+    @staticmethod
+    def _matches(task: Task, status: str, priority: str, tag: str) -> bool:
+        if status and task.status != status:
+            return False
+        if priority and task.priority != priority:
+            return False
+        return not tag or tag in (task.tags or [])
+    
+    def _archived_matches(self, status: str, priority: str, tag: str,
+                          query: 'Query' = None) -> Iterator[Task]:
+        for task in self.archive.tasks():
+            if task.id in self._tasks:
+                continue
+            if query.predicate(task) if query else self._matches(task, status, priority, tag):
+                yield task
+    
+    @staticmethod
+    def _where_query(where: str, status: str, priority: str, tag: str) -> Optional['Query']:
+        """The compiled where query with any plain filters folded in (so the planner sees them)"""
+        if not where:
+            return None
+        filters = [f"status={status}" if status else "", f"priority={priority}" if priority else "",
+                   f"tag={_quote_value(tag)}" if tag else ""]
+        return compile_query(" and ".join([f"({where})", *filter(None, filters)]))
+    
+    def _query_tasks(self, query: 'Query') -> Iterator[Task]:
+        """Tasks matching a query in priority order: candidates from the planned index
+        lookup (or every task), each checked against the full predicate"""
+        plan = query.plan(self)
+        if plan is None:
+            keys = heapq.merge(*self._by_priority.values())
+            candidates = (self._tasks[task_id] for _, task_id in keys)
+        elif plan.ordered:
+            candidates = (self._tasks[task_id] for task_id in plan.fetch())
+        else:
+            candidates = sorted((self._tasks[task_id] for task_id in plan.fetch()), key=_sort_key)
+        return (task for task in candidates if query.predicate(task))
+    
+    def explain(self, where: str, status: str = None, priority: str = None, tag: str = None) -> str:
+        """How list_tasks(where=...) would find its matches"""
+        return self._where_query(where, status, priority, tag).explain(self)
+    
+    def _probe_tasks(self, status: str, priority: str, tag: str) -> Iterator[Task]:
+        # Walk the smallest matching bucket and probe the other filters per task
+        buckets = []
+        if status:
+            buckets.append(self._by_status.get(status, []))
+        if priority:
+            buckets.append(self._by_priority.get(priority, []))
+        if tag:
+            buckets.append(self._by_tag.get(tag, []))
+        smallest = min(buckets, key=len)
+        
+        for _, task_id in smallest:
+            task = self._tasks[task_id]
+            if self._matches(task, status, priority, tag):
+                yield task
+    
+    def overdue_tasks(self, now: datetime = None) -> List[Task]:
+        """Open tasks past their due date, most overdue first"""
+        end = bisect_left(self._by_due, (now or datetime.now(),))
+        return [self._tasks[task_id] for _, task_id in self._by_due[:end]]
+    
+    def count_overdue(self, now: datetime = None) -> int:
+        """Number of open tasks past their due date (a binary search, not a scan)"""
+        return bisect_left(self._by_due, (now or datetime.now(),))
+    
+    def upcoming_tasks(self, within: timedelta, now: datetime = None) -> List[Task]:
+        """Open tasks due between now and now + within, soonest first"""
+        now = now or datetime.now()
+        start = bisect_left(self._by_due, (now,))
+        end = bisect_right(self._by_due, (now + within, sys.maxsize))
+        return [self._tasks[task_id] for _, task_id in self._by_due[start:end]]
+    
+    def mark_done(self, task_id: int) -> bool:
+        """Mark task as done"""
+        return self.update_task(task_id, status="done")
+    
+    def mark_in_progress(self, task_id: int) -> bool:
+        """Mark task as in progress"""
+        return self.update_task(task_id, status="in_progress")
+    
+    def import_tasks(self, records: Iterable[Dict], chunk_size: int = 1000,
+                     on_error=None) -> Tuple[int, int]:
+        """Add tasks from an iterable of records, committing every chunk_size tasks
+        
+        Records use the task file field names (``due`` is accepted for ``due_date``).
+        Invalid records are skipped and reported through on_error(record_number, message).
+        Returns (imported, skipped).
+        """
+        imported = skipped = 0
+        records = iter(records)
+        while True:
+            with self.batch():
+                in_chunk = 0
+                for number, record in enumerate(records, imported + skipped + 1):
+                    error = _validate_record(record)
+                    if error:
+                        skipped += 1
+                        if on_error:
+                            on_error(number, error)
+                        continue
+                    tags = record.get('tags') or []
+                    if isinstance(tags, str):
+                        tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+                    task = self.add_task(record['title'].strip(), record.get('priority') or "medium",
+                                         tags, record.get('due_date') or record.get('due') or None)
+                    status = record.get('status') or "todo"
+                    if status != "todo":
+                        self.update_task(task['id'], status=status)
+                    imported += 1
+                    in_chunk += 1
+                    if in_chunk >= chunk_size:
+                        break
+                else:
+                    return imported, skipped
+    
+    def is_overdue(self, task: Task) -> bool:
+        """Check if task is overdue (plain dicts in the JSON schema are accepted too)"""
+        if not isinstance(task, Task):
+            task = Task.from_dict(task)
+        return task.is_overdue()
+    
+    def export_markdown(self, output_file: str = "TASKS.md", incremental: bool = False):
+        """Export tasks to Markdown format"""
+        return self.export(output_file, "markdown", incremental)
+    
+    def export(self, output_file: str = "TASKS.md", fmt: str = None, incremental: bool = False) -> bool:
+        """Stream tasks to output_file, grouped by status, in one pass over the board
+        
+        fmt defaults to one picked from the file extension. With incremental=True only ID ranges
+        with changed tasks are re-rendered, and an unchanged board leaves the file alone (see
+        write_export_incremental).
+        """
+        renderer = EXPORT_FORMATS[fmt or detect_export_format(output_file)]()
+        with self._profiler.phase("export"):
+            if incremental:
+                board = self._loaded_fingerprint
+                if self._dirty or board != self.storage.fingerprint():
+                    board = None
+                written = write_export_incremental(list(self._tasks.values()), output_file, renderer, board)
+            else:
+                written = write_export(list(self._tasks.values()), output_file, renderer)
+            if not written:
+                return False
+        self._profiler.count("bytes_written", os.path.getsize(output_file))
+        return True
+
+
+def _validate_record(record: Dict) -> Optional[str]:
+    """Check an import record against the same choices the CLI accepts"""
+    if not isinstance(record, dict):
+        return "record is not an object"
+    if "__error__" in record:
+        return f"invalid JSON ({record['__error__']})"
+    title = record.get('title')
+    if title is not None and not isinstance(title, str):
+        return "title must be text"
+    if not (title or '').strip():
+        return "missing title"
+    tags = record.get('tags') or []
+    if not isinstance(tags, str) and not (isinstance(tags, list) and all(isinstance(tag, str) for tag in tags)):
+        return "tags must be text (a,b) or a list of text"
+    due = record.get('due_date') or record.get('due')
+    if due is not None and not isinstance(due, str):
+        return "due date must be text (YYYY-MM-DD)"
+    priority = record.get('priority') or "medium"
+    if not isinstance(priority, str) or priority not in PRIORITIES:
+        return f"invalid priority '{priority}' (choose from {', '.join(PRIORITIES)})"
+    status = record.get('status') or "todo"
+    if not isinstance(status, str) or status not in STATUSES:
+        return f"invalid status '{status}' (choose from {', '.join(STATUSES)})"
+    return None
+
+
+def read_records(stream, fmt: str) -> Iterator[Dict]:
+    """Stream import records from CSV (header row required) or JSON Lines, one at a time"""
+    import json
+    if fmt == "csv":
+        import csv
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            # Let the importer report it like any other bad record
+            yield {"__error__": str(e)}
+
+
+def format_task(task: Task, show_details: bool = False, now: datetime = None) -> str:
+    """A task as print_task() shows it, newline-terminated"""
+    if not isinstance(task, Task):
+        task = Task.from_dict(task)
+    status_icon = STATUS_ICONS[task['status']]
+    priority_icon = PRIORITY_COLORS[task['priority']]
+    
+    overdue_marker = " [!] OVERDUE" if task.is_overdue(now) else ""
+    
+    # Basic line
+    lines = [f"{status_icon} {priority_icon} [{task['id']}] {task['title']}{overdue_marker}"]
+    
+    if show_details:
+        lines.append(f"    Priority: {task['priority']} | Status: {task['status']}")
+        if task.get('tags'):
+            lines.append(f"    Tags: {', '.join(task['tags'])}")
+        if task.get('due_date'):
+            lines.append(f"    Due: {task['due_date']}")
+        if task.get('depends_on'):
+            lines.append(f"    Depends on: {', '.join(map(str, task['depends_on']))}")
+        lines.append(f"    Created: {task['created'][:10]}")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def print_task(task: Task, show_details: bool = False):
+    """Pretty print a task"""
+    sys.stdout.write(format_task(task, show_details))
+
+
+def print_missing(tf: 'TaskFlow', task_id: int):
+    """Explain why a task cannot be changed"""
+    if tf.is_archived(task_id):
+        print(f"[X] Task {task_id} is archived (archived tasks are read-only)")
+    else:
+        print(f"[X] Task {task_id} not found")
+
+
+OUTPUT_CHUNK_CHARS = 64 * 1024
+
+
+def write_output(chunks: Iterable[str], pager: bool = False):
+    """Write rendered text in a few large writes instead of one per line
+    
+    With pager=True and a terminal on stdout the text is streamed to $PAGER (default less -FRX)
+    as it is rendered.
+    """
+    stream, process = sys.stdout, None
+    if pager and sys.stdout.isatty():
+        import shlex
+        import subprocess
+        try:
+            process = subprocess.Popen(shlex.split(os.environ.get('PAGER') or 'less -FRX'),
+                                       stdin=subprocess.PIPE, encoding='utf-8', errors='replace')
+            stream = process.stdin
+        except OSError:
+            process = None
+    
+    buffer, size = [], 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= OUTPUT_CHUNK_CHARS:
+                stream.write(''.join(buffer))
+                buffer, size = [], 0
+        stream.write(''.join(buffer))
+        stream.flush()
+    except BrokenPipeError:
+        pass  # The pager was closed early
+    finally:
+        if process is not None:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.wait()
+
+
+# --- Asyncio ---
+
+class AsyncTaskFlow:
+    """TaskFlow for asyncio services: mutations are serialized by an asyncio.Lock, reads come
+    straight from memory, and writes are coalesced into at most one flush per flush_interval,
+    run on a dedicated I/O thread so the event loop never waits on the disk (and storages such
+    as SQLite only ever see that one thread)
+    
+        tf = await AsyncTaskFlow.open(".taskflow.json")
+        task = await tf.add_task("Handle webhook", "high")
+        tasks = tf.list_tasks(status="todo")
+        await tf.close()  # Flushes pending writes
+    """
+    
+    def __init__(self, taskflow: 'TaskFlow', flush_interval: float = 0.5, executor=None):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self.taskflow = taskflow
+        self.taskflow.autoflush = False
+        self.flush_interval = flush_interval
+        self._lock = asyncio.Lock()
+        self._pending_flush = None
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="taskflow-io")
+    
+    @classmethod
+    async def open(cls, task_file: str = TASKFILE, flush_interval: float = 0.5, **options) -> 'AsyncTaskFlow':
+        """Load the task file on the I/O thread; options are passed to TaskFlow"""
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        from functools import partial
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="taskflow-io")
+        loop = asyncio.get_running_loop()
+        try:
+            taskflow = await loop.run_in_executor(executor, partial(TaskFlow, task_file, **options))
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return cls(taskflow, flush_interval, executor)
+    
+    async def __aenter__(self) -> 'AsyncTaskFlow':
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.close()
+    
+    # Reads: in memory, no locking or I/O
+    
+    @property
+    def tasks(self) -> List[Task]:
+        return self.taskflow.tasks
+    
+    def get_task(self, task_id: int) -> Optional[Task]:
+        return self.taskflow.get_task(task_id, include_archived=False)
+    
+    def list_tasks(self, *args, **kwargs) -> List[Task]:
+        return self.taskflow.list_tasks(*args, **kwargs)
+    
+    def count_tasks(self, *args, **kwargs) -> int:
+        return self.taskflow.count_tasks(*args, **kwargs)
+    
+    def stats(self, now: datetime = None) -> Dict:
+        return self.taskflow.stats(now)
+    
+    def overdue_tasks(self, now: datetime = None) -> List[Task]:
+        return self.taskflow.overdue_tasks(now)
+    
+    def upcoming_tasks(self, within: timedelta, now: datetime = None) -> List[Task]:
+        return self.taskflow.upcoming_tasks(within, now)
+    
+    def ready_tasks(self, limit: int = None) -> List[Task]:
+        return self.taskflow.ready_tasks(limit)
+    
+    # Mutations: applied in memory under the lock, persisted by the next coalesced flush
+    
+    async def _mutate(self, method, *args, **kwargs):
+        async with self._lock:
+            result = method(*args, **kwargs)
+        self._schedule_flush()
+        return result
+    
+    async def add_task(self, title: str, priority: str = "medium", tags: List[str] = None,
+                       due_date: str = None) -> Task:
+        return await self._mutate(self.taskflow.add_task, title, priority, tags, due_date)
+    
+    async def update_task(self, task_id: int, **kwargs) -> bool:
+        return await self._mutate(self.taskflow.update_task, task_id, **kwargs)
+    
+    async def delete_task(self, task_id: int) -> bool:
+        return await self._mutate(self.taskflow.delete_task, task_id)
+    
+    async def mark_done(self, task_id: int) -> bool:
+        return await self._mutate(self.taskflow.mark_done, task_id)
+    
+    async def mark_in_progress(self, task_id: int) -> bool:
+        return await self._mutate(self.taskflow.mark_in_progress, task_id)
+    
+    def _schedule_flush(self):
+        """Start the flush timer unless one is already running - later writes join it"""
+        import asyncio
+        if self._pending_flush is None and self.taskflow._dirty:
+            self._pending_flush = asyncio.ensure_future(self._delayed_flush())
+    
+    async def _delayed_flush(self):
+        import asyncio
+        await asyncio.sleep(self.flush_interval)
+        self._pending_flush = None
+        await self.flush()
+    
+    async def flush(self):
+        """Write every pending change now (on the I/O thread)"""
+        import asyncio
+        pending, self._pending_flush = self._pending_flush, None
+        if pending is not None and pending is not asyncio.current_task():
+            pending.cancel()
+        async with self._lock:
+            if self.taskflow._dirty:
+                loop = asyncio.get_running_loop()
+                older_than = self.taskflow._archive_policy_due()
+                if older_than is not None:
+                    # The daily auto-archive writes on the I/O thread; the board itself only changes
+                    # here, on the loop, so reads never see it mid-update
+                    archived = await loop.run_in_executor(self._executor, self.taskflow._write_archive, older_than)
+                    self.taskflow._drop_archived(archived)
+                await loop.run_in_executor(self._executor, self.taskflow.flush)
+    
+    async def close(self):
+        """Flush pending writes and release the storage"""
+        import asyncio
+        await self.flush()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.taskflow.close)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+# --- Multi-project scan ---
+
+# Directories never searched for task files
+SCAN_SKIP_DIRS = {"node_modules", "__pycache__", "venv", "site-packages", "dist", "build"}
+
+
+def discover_task_files(root: str, name: str = TASKFILE) -> List[Path]:
+    """Every task file called `name` under root (hidden and vendored directories are skipped)"""
+    found = []
+    for directory, subdirs, files in os.walk(root):
+        subdirs[:] = sorted(d for d in subdirs if not d.startswith('.') and d not in SCAN_SKIP_DIRS)
+        if name in files:
+            found.append(Path(directory) / name)
+    return found
+
+
+def _summary_cache_key(path: Path) -> Optional[Tuple]:
+    """A task file is unchanged while its (and its journal's) mtime and size are"""
+    stamps = []
+    for file in (path, path.with_name(path.name + JOURNAL_SUFFIX)):
+        try:
+            stat = file.stat()
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    if stamps[0] is None:
+        return None
+    return (f"scan:{path.resolve()}", tuple(stamps))
+
+
+def load_project_summary(path: str) -> Dict:
+    """Parse one task file into a picklable summary (runs in a worker process)"""
+    return {"tasks": [task.to_dict() for task in TaskFlow(path).tasks]}
+
+
+class ProjectSet:
+    """Tasks of many task files, each tagged with the project (directory) it came from"""
+    
+    def __init__(self, root: str, projects: Dict[str, List[Task]]):
+        self.root = root
+        self.projects = projects
+    
+    def entries(self, status: str = None, priority: str = None, tag: str = None) -> List[Tuple[str, Task]]:
+        """(project, task) pairs across all projects, in listing order"""
+        entries = [(project, task) for project, tasks in self.projects.items() for task in tasks
+                   if TaskFlow._matches(task, status, priority, tag)]
+        entries.sort(key=lambda entry: (_sort_key(entry[1]), entry[0]))
+        return entries
+    
+    def stats(self, now: datetime = None) -> Dict:
+        """Combined stats, plus the totals of each project"""
+        now = now or datetime.now()
+        combined = {"total": 0, "by_status": {}, "by_priority": {}, "overdue": 0, "projects": {}}
+        for project, tasks in self.projects.items():
+            combined["projects"][project] = len(tasks)
+            combined["total"] += len(tasks)
+            for task in tasks:
+                for key, value in (("by_status", task.status), ("by_priority", task.priority)):
+                    combined[key][value] = combined[key].get(value, 0) + 1
+                if task.is_overdue(now):
+                    combined["overdue"] += 1
+        return combined
+    
+    def export(self, output_file: str, fmt: str = None) -> bool:
+        """Export every project's tasks; titles are prefixed with their project"""
+        renderer = EXPORT_FORMATS[fmt or detect_export_format(output_file)]()
+        labelled = []
+        for project, task in self.entries():
+            task = task.copy()
+            task.title = f"[{project}] {task.title}"
+            labelled.append(task)
+        return write_export(labelled, output_file, renderer)
+
+
+def scan_projects(root: str = ".", name: str = TASKFILE, workers: int = None,
+                  cache: bool = True, profiler: Profiler = None) -> ProjectSet:
+    """Load every task file under root; changed files are parsed concurrently in a process pool
+    
+    Parsed summaries are cached by file mtime/size, so unchanged projects are not re-read.
+    """
+    profiler = profiler or NULL_PROFILER
+    with profiler.phase("discover"):
+        paths = discover_task_files(root, name)
+    summaries: Dict[Path, Dict] = {}
+    missing, keys = [], {}
+    for path in paths:
+        # Keyed before parsing: a file changed mid-scan is simply re-read next time
+        keys[path] = _summary_cache_key(path) if cache else None
+        summary = load_cached(keys[path]) if keys[path] else None
+        if summary is None:
+            missing.append(path)
+        else:
+            summaries[path] = summary
+    profiler.count("projects", len(paths))
+    profiler.count("projects_cached", len(summaries))
+    
+    with profiler.phase("load"):
+        if len(missing) > 1 and workers != 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                loaded = list(pool.map(load_project_summary, map(str, missing)))
+        else:
+            loaded = [load_project_summary(str(path)) for path in missing]
+    for path, summary in zip(missing, loaded):
+        summaries[path] = summary
+        if keys[path]:
+            store_cached(keys[path], summary)
+    
+    projects = {}
+    for path in paths:
+        project = os.path.relpath(path.parent, root)
+        projects[project] = [Task.from_dict(task) for task in summaries[path]["tasks"]]
+    return ProjectSet(root, projects)
+
+
+# --- Daemon ---
+
+# Environment variables a forwarding client passes through to the daemon
+DAEMON_ENV = ("TASKFLOW_JOURNAL", "TASKFLOW_TRACE")
+# Global options that take a value, so the subcommand can be found without argparse
+GLOBAL_VALUE_OPTIONS = ("--file", "--backend", "--file-format", "--profile-output")
+
+
+def default_socket_path() -> str:
+    """Per-user daemon socket: $TASKFLOW_SOCKET, else taskflow-<uid>.sock in the runtime dir"""
+    if os.environ.get('TASKFLOW_SOCKET'):
+        return os.environ['TASKFLOW_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp'
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(runtime_dir, f"taskflow-{uid}.sock")
+
+
+def find_command(argv: List[str]) -> Optional[str]:
+    """The subcommand in a raw argument list (first positional after the global options)"""
+    args = iter(argv)
+    for arg in args:
+        if arg in GLOBAL_VALUE_OPTIONS:
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+
+def should_forward(argv: List[str]) -> bool:
+    """Forward to a daemon only when one may be listening and the command can run remotely"""
+    if os.environ.get('TASKFLOW_NO_DAEMON') == '1' or os.name != 'posix':
+        return False
+    # serve manages the daemon itself; import may read the client's stdin; scans fork workers
+    if find_command(argv) in ('serve', 'import', 'scan') or '--recursive' in argv:
+        return False
+    return os.path.exists(default_socket_path())
+
+
+def _connect(socket_path: str):
+    """Connect to a daemon socket (raises OSError if nothing is listening)"""
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _exchange(sock, request: Dict) -> Dict:
+    """Send one JSON request over a connected socket and read the JSON response"""
+    import json
+    import socket
+    with sock:
+        sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks).decode('utf-8'))
+
+
+def _daemon_request(socket_path: str, request: Dict) -> Dict:
+    return _exchange(_connect(socket_path), request)
+
+
+def _owned_by_user(socket_path: str) -> bool:
+    """Whether the socket belongs to this user - in a shared /tmp anyone can bind that path"""
+    try:
+        owner = os.stat(socket_path).st_uid
+    except OSError:
+        return False
+    if hasattr(os, 'getuid') and owner != os.getuid():
+        print(f"[!] Warning: Ignoring daemon socket owned by another user: {socket_path}", file=sys.stderr)
+        return False
+    return True
+
+
+def forward_to_daemon(argv: List[str], socket_path: str = None) -> Optional[int]:
+    """Run a command in the daemon; None means no daemon answered and nothing was run"""
+    socket_path = socket_path or default_socket_path()
+    request = {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": {name: os.environ[name] for name in DAEMON_ENV if name in os.environ},
+    }
+    if not _owned_by_user(socket_path):
+        return None
+    # Only fall back to in-process execution if the request never reached a daemon,
+    # otherwise a mutation could run twice
+    try:
+        sock = _connect(socket_path)
+    except OSError:
+        return None
+    try:
+        response = _exchange(sock, request)
+    except (OSError, ValueError) as e:
+        print(f"[X] Error: lost connection to daemon: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.write(response.get('stdout', ''))
+    sys.stderr.write(response.get('stderr', ''))
+    return response.get('code', 0)
+
+
+class TaskFlowDaemon:
+    """Keeps TaskFlow instances resident and runs CLI commands against them one at a time"""
+    
+    def __init__(self):
+        import threading
+        self.lock = threading.Lock()
+        self._instances: Dict[Tuple, TaskFlow] = {}
+        self._fingerprints: Dict[Tuple, Tuple] = {}
+        self._used: List[Tuple] = []
     
-    def load_tasks(self):
-        """Load tasks from JSON file"""
-        if self.task_file.exists():
-            try:
-                with open(self.task_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.tasks = data.get('tasks', [])
-            except Exception as e:
-                print(f"[!] Warning: Could not load tasks: {e}")
-                self.tasks = []
+    def open_taskflow(self, args, profiler: Profiler = None) -> TaskFlow:
+        """Cached open_taskflow(); reloads when another process changed the files"""
+        journal = args.journal or os.environ.get('TASKFLOW_JOURNAL') == '1'
+        key = (str(Path(args.file).resolve()), args.backend, journal, args.file_format)
+        tf = self._instances.get(key)
+        if tf is None:
+            # Cached instances serve every later command, so they hold the whole board
+            tf = open_taskflow(args, profiler, partial=False)
+            self._instances[key] = tf
         else:
-            self.tasks = []
-    
-    def save_tasks(self):
-        """Save tasks to JSON file"""
-        data = {
-            "tasks": self.tasks,
-            "last_updated": datetime.now().isoformat()
-        }
-        try:
-            with open(self.task_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"[X] Error saving tasks: {e}")
-    
-    def add_task(self, title: str, priority: str = "medium", tags: List[str] = None, due_date: str = None):
-        """Add new task"""
-        task = {
-            "id": self._generate_id(),
-            "title": title,
-            "priority": priority,
-            "status": "todo",
-            "tags": tags or [],
-            "due_date": due_date,
-            "created": datetime.now().isoformat(),
-            "updated": datetime.now().isoformat()
-        }
-        self.tasks.append(task)
-        self.save_tasks()
-        return task
+            tf.profiler = profiler
+            if tf.storage.fingerprint() != self._fingerprints.get(key):
+                tf.load_tasks()
+        self._used.append(key)
+        return tf
     
-    def _generate_id(self) -> int:
-        """Generate unique task ID"""
-        if not self.tasks:
-            return 1
-        return max(task['id'] for task in self.tasks) + 1
-    
-    def get_task(self, task_id: int) -> Optional[Dict]:
-        """Get task by ID"""
-        for task in self.tasks:
-            if task['id'] == task_id:
-                return task
-        return None
+    def execute(self, request: Dict) -> Dict:
+        """Run one forwarded command line; every command is serialized behind one lock"""
+        from contextlib import redirect_stdout, redirect_stderr
+        stdout, stderr = io.StringIO(), io.StringIO()
+        code = 0
+        with self.lock:
+            saved_cwd = os.getcwd()
+            saved_env = {name: os.environ.get(name) for name in DAEMON_ENV}
+            self._used = []
+            try:
+                os.chdir(request.get('cwd') or saved_cwd)
+                for name in DAEMON_ENV:
+                    os.environ.pop(name, None)
+                os.environ.update(request.get('env') or {})
+                with redirect_stdout(stdout), redirect_stderr(stderr):
+                    try:
+                        run_cli(list(request.get('argv') or []), self.open_taskflow)
+                    except SystemExit as e:
+                        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                    except Exception as e:
+                        print(f"\n[X] Error: {e}")
+                        code = 1
+                for key in self._used:
+                    if code:
+                        # Memory may not match disk after a failure - reload on next use
+                        self._instances.pop(key, None)
+                    else:
+                        self._fingerprints[key] = self._instances[key].storage.fingerprint()
+            finally:
+                os.chdir(saved_cwd)
+                for name, value in saved_env.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "code": code}
     
-    def update_task(self, task_id: int, **kwargs):
-        """Update task fields"""
-        task = self.get_task(task_id)
-        if not task:
-            return False
-        
-        for key, value in kwargs.items():
-            if key in task:
-                task[key] = value
-        
-        task['updated'] = datetime.now().isoformat()
-        self.save_tasks()
-        return True
+    def close(self):
+        for tf in self._instances.values():
+            try:
+                tf.close()
+            except Exception as e:
+                print(f"[!] Warning: Could not close {tf.storage.path}: {e}")
+        self._instances = {}
+
+
+def serve(socket_path: str):
+    """Run the daemon in the foreground until interrupted or stopped"""
+    import socketserver
+    import threading
     
-    def delete_task(self, task_id: int) -> bool:
-        """Delete task"""
-        task = self.get_task(task_id)
-        if not task:
-            return False
-        
-        self.tasks.remove(task)
-        self.save_tasks()
-        return True
+    if os.path.exists(socket_path):
+        try:
+            _daemon_request(socket_path, {"ping": True})
+            print(f"[OK] Daemon already running: {socket_path}")
+            return
+        except (OSError, ValueError):
+            os.unlink(socket_path)  # Left behind by a daemon that died
     
-    def list_tasks(self, status: str = None, priority: str = None, tag: str = None) -> List[Dict]:
-        """List tasks with optional filters"""
-        filtered = self.tasks
-        
-        if status:
-            filtered = [t for t in filtered if t['status'] == status]
-        
-        if priority:
-            filtered = [t for t in filtered if t['priority'] == priority]
-        
-        if tag:
-            filtered = [t for t in filtered if tag in t.get('tags', [])]
-        
-        # Sort by priority (high > medium > low) then by ID
-        priority_order = {"high": 0, "medium": 1, "low": 2}
-        filtered.sort(key=lambda t: (priority_order.get(t['priority'], 3), t['id']))
-        
-        return filtered
+    daemon = TaskFlowDaemon()
     
-    def mark_done(self, task_id: int) -> bool:
-        """Mark task as done"""
-        return self.update_task(task_id, status="done")
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            import json
+            try:
+                request = json.loads(self.rfile.readline().decode('utf-8'))
+            except ValueError:
+                return
+            if request.get('shutdown'):
+                response = {"stdout": "", "stderr": "", "code": 0}
+                threading.Thread(target=self.server.shutdown).start()
+            elif request.get('ping'):
+                response = {"stdout": "", "stderr": "", "code": 0}
+            else:
+                response = daemon.execute(request)
+            self.wfile.write(json.dumps(response).encode('utf-8'))
     
-    def mark_in_progress(self, task_id: int) -> bool:
-        """Mark task as in progress"""
-        return self.update_task(task_id, status="in_progress")
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
     
-    def is_overdue(self, task: Dict) -> bool:
-        """Check if task is overdue"""
-        if not task.get('due_date'):
-            return False
-        
+    old_umask = os.umask(0o077)  # Only this user may connect
+    try:
+        server = Server(socket_path, Handler)
+    finally:
+        os.umask(old_umask)
+    print(f"[OK] TaskFlow daemon listening on {socket_path}")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
         try:
-            due = datetime.fromisoformat(task['due_date'])
-            return datetime.now() > due and task['status'] != 'done'
-        except:
-            return False
-    
-    def export_markdown(self, output_file: str = "TASKS.md"):
-        """Export tasks to Markdown format"""
-        output = ["# 📋 TaskFlow - Project Tasks\n"]
-        output.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M')}\n")
-        output.append(f"**Total Tasks:** {len(self.tasks)}\n\n")
-        output.append("---\n\n")
-        
-        # Group by status
-        for status in ["in_progress", "todo", "blocked", "done"]:
-            status_tasks = [t for t in self.tasks if t['status'] == status]
-            if not status_tasks:
-                continue
-            
-            status_name = status.replace('_', ' ').title()
-            output.append(f"## {STATUS_ICONS[status]} {status_name} ({len(status_tasks)})\n\n")
-            
-            for task in status_tasks:
-                priority_icon = PRIORITY_COLORS[task['priority']]
-                output.append(f"### {priority_icon} [{task['id']}] {task['title']}\n\n")
-                output.append(f"- **Priority:** {task['priority']}\n")
-                output.append(f"- **Status:** {task['status']}\n")
-                
-                if task.get('tags'):
-                    output.append(f"- **Tags:** {', '.join(task['tags'])}\n")
-                
-                if task.get('due_date'):
-                    output.append(f"- **Due:** {task['due_date']}\n")
-                
-                output.append(f"- **Created:** {task['created'][:10]}\n")
-                output.append("\n")
-        
-        try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(''.join(output))
-            return True
-        except Exception as e:
-            print(f"[X] Error exporting: {e}")
-            return False
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+        except OSError as e:
+            print(f"[!] Warning: Could not remove {socket_path}: {e}")
+        daemon.close()
 
 
-def print_task(task: Dict, show_details: bool = False):
-    """Pretty print a task"""
-    status_icon = STATUS_ICONS[task['status']]
-    priority_icon = PRIORITY_COLORS[task['priority']]
-    
-    # Check if overdue
-    overdue_marker = ""
-    if task.get('due_date'):
-        try:
-            due = datetime.fromisoformat(task['due_date'])
-            if datetime.now() > due and task['status'] != 'done':
-                overdue_marker = " [!] OVERDUE"
-        except:
-            pass
-    
-    # Basic line
-    print(f"{status_icon} {priority_icon} [{task['id']}] {task['title']}{overdue_marker}")
-    
-    if show_details:
-        print(f"    Priority: {task['priority']} | Status: {task['status']}")
-        if task.get('tags'):
-            print(f"    Tags: {', '.join(task['tags'])}")
-        if task.get('due_date'):
-            print(f"    Due: {task['due_date']}")
-        print(f"    Created: {task['created'][:10]}")
-        print()
+def stop_daemon(socket_path: str) -> bool:
+    """Ask a running daemon to exit"""
+    try:
+        _daemon_request(socket_path, {"shutdown": True})
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def _duration_arg(text: str) -> timedelta:
+    import argparse
+    try:
+        return parse_duration(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _count_arg(text: str, minimum: int = 0) -> int:
+    import argparse
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number '{text}'")
+    if value < minimum:
+        raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {value}")
+    return value
+
+
+def _positive_arg(text: str) -> int:
+    return _count_arg(text, 1)
+
+
+def _task_ids_arg(text: str) -> List[Tuple[int, int]]:
+    import argparse
+    try:
+        return parse_id_ranges([text])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_selection_arguments(parser: 'argparse.ArgumentParser', by_priority: bool = True):
+    """Task IDs/ranges and filters choosing which tasks a command changes"""
+    parser.add_argument('task_ids', nargs='*', type=_task_ids_arg, metavar='ID',
+                        help='Task IDs and ranges, e.g. 3 5 10-250')
+    parser.add_argument('--status', dest='select_status', choices=STATUSES, help='Select tasks by status')
+    if by_priority:
+        parser.add_argument('--priority', dest='select_priority', choices=PRIORITIES,
+                            help='Select tasks by priority')
+    parser.add_argument('--tag', dest='select_tag', metavar='TAG', help='Select tasks by tag')
+    parser.add_argument('--where', metavar='EXPR', help='Select tasks matching a query (see list --where)')
+
+
+def _add_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('title', help='Task title')
+    parser.add_argument('--priority', choices=PRIORITIES, default='medium')
+    parser.add_argument('--tags', help='Comma-separated tags')
+    parser.add_argument('--due', help='Due date (YYYY-MM-DD)')
+
+
+def _list_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--status', choices=STATUSES)
+    parser.add_argument('--priority', choices=PRIORITIES)
+    parser.add_argument('--tag', help='Filter by tag')
+    parser.add_argument('--details', action='store_true', help='Show detailed info')
+    parser.add_argument('--sort', choices=list(SORT_KEYS), help='Sort order (default: priority)')
+    parser.add_argument('--reverse', action='store_true', help='Reverse the sort order')
+    parser.add_argument('--limit', type=_count_arg, help='Show at most N tasks')
+    parser.add_argument('--offset', type=_count_arg, default=0, help='Skip the first N tasks (with --limit: paging)')
+    parser.add_argument('--pager', action='store_true', help='Page the output through $PAGER')
+    parser.add_argument('--include-archived', action='store_true', help='Also list archived tasks')
+    parser.add_argument('--where', metavar='EXPR',
+                        help='Query, e.g. "priority=high and (tag:bug or tag:urgent) and due<2026-11-01"')
+    parser.add_argument('--explain', action='store_true', help='Show how --where finds its tasks')
+
+
+def _search_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('query', nargs='+', help='Words to match (prefixes match too)')
+    parser.add_argument('--limit', type=_count_arg, default=20, help='Show at most N results (default: 20)')
+    parser.add_argument('--details', action='store_true', help='Show detailed info')
+
+
+def _edit_arguments(parser: 'argparse.ArgumentParser'):
+    # --priority sets the new priority here; select by priority with --where
+    add_selection_arguments(parser, by_priority=False)
+    parser.add_argument('--title', help='New title')
+    parser.add_argument('--priority', choices=PRIORITIES)
+    parser.add_argument('--tags', help='Comma-separated tags')
+    parser.add_argument('--due', help='Due date (YYYY-MM-DD)')
+
+
+def _link_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('task_id', type=int, help='Task ID')
+    parser.add_argument('--blocks', nargs='+', type=_task_ids_arg, metavar='ID',
+                        help='Tasks that cannot start until this one is done')
+    parser.add_argument('--depends-on', nargs='+', type=_task_ids_arg, metavar='ID',
+                        help='Tasks that must be done before this one')
+    parser.add_argument('--remove', action='store_true', help='Remove these links instead')
+
+
+def _next_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--limit', type=_count_arg, default=10, help='Show at most N tasks (default: 10)')
+    parser.add_argument('--details', action='store_true', help='Show detailed info')
+
+
+def _export_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--output', default='TASKS.md', help='Output file')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS),
+                        help='Output format (default: from the file extension, else markdown)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Re-render only ID ranges changed since the last incremental export')
+
+
+def _overdue_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--details', action='store_true', help='Show detailed info')
+
+
+def _upcoming_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--within', type=_duration_arg, default='7d',
+                        help='Time window, e.g. 3d, 2w, 12h (default: 7d)')
+    parser.add_argument('--details', action='store_true', help='Show detailed info')
+
+
+def _stats_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--all', action='store_true', help='Include archived tasks')
+
+
+def _scan_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('root', nargs='?', default='.', help='Directory to search (default: .)')
+    parser.add_argument('--stats', action='store_true', help='Show combined statistics instead of tasks')
+    parser.add_argument('--export', metavar='FILE', help='Export all tasks to FILE instead of listing them')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), help='Export format (default: from FILE)')
+    parser.add_argument('--status', choices=STATUSES)
+    parser.add_argument('--priority', choices=PRIORITIES)
+    parser.add_argument('--tag', help='Filter by tag')
+    parser.add_argument('--details', action='store_true', help='Show detailed info')
+    parser.add_argument('--workers', type=_positive_arg, help='Worker processes (default: one per CPU)')
+
+
+def _archive_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--older-than', type=_duration_arg, metavar='DURATION',
+                        help='Only tasks done for longer than this, e.g. 30d (default: all done tasks)')
+    parser.add_argument('--auto', metavar='DURATION',
+                        help='Archive done tasks automatically after DURATION ("off" to disable)')
+
+
+def _import_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('source', nargs='?', default='-', help='File to import (default: stdin)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help='Input format (default: from the file extension, jsonl for stdin)')
+    parser.add_argument('--chunk-size', type=_positive_arg, default=1000,
+                        help='Tasks to commit per save (default: 1000)')
 
 
-def main():
-    """Main CLI interface"""
+def _migrate_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('destination', help='Destination task file')
+    parser.add_argument('--to', choices=sorted(STORAGE_BACKENDS),
+                        help='Destination backend (default: picked from the file extension)')
+    parser.add_argument('--force', action='store_true', help='Overwrite an existing destination')
+    parser.add_argument('--format', choices=FILE_FORMATS,
+                        help='File format of a JSON destination (default: pretty, jsonl for .jsonl)')
+
+
+def _report_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--burndown', action='store_true', help='Open tasks at the end of each day')
+    parser.add_argument('--velocity', action='store_true', help='Tasks completed per week')
+    parser.add_argument('--since', type=_duration_arg, default='30d', metavar='DURATION',
+                        help='How far back to report, e.g. 30d, 12w (default: 30d)')
+
+
+def _serve_arguments(parser: 'argparse.ArgumentParser'):
+    parser.add_argument('--socket', help=f'Socket path (default: $TASKFLOW_SOCKET or {default_socket_path()})')
+    parser.add_argument('--stop', action='store_true', help='Stop a running daemon')
+
+
+# Subcommand -> (help, function adding its arguments), in help order
+COMMAND_PARSERS = {
+    'add': ('Add new task', _add_arguments),
+    'list': ('List tasks', _list_arguments),
+    'search': ('Find tasks by words in their title or tags', _search_arguments),
+    'done': ('Mark tasks as done', add_selection_arguments),
+    'start': ('Mark tasks as in progress', add_selection_arguments),
+    'block': ('Mark tasks as blocked', add_selection_arguments),
+    'delete': ('Delete tasks', add_selection_arguments),
+    'edit': ('Edit tasks', _edit_arguments),
+    'link': ('Record that one task blocks another', _link_arguments),
+    'next': ('List todo tasks whose dependencies are done', _next_arguments),
+    'export': ('Export tasks to Markdown, CSV, JSON Lines or HTML', _export_arguments),
+    'overdue': ('List open tasks past their due date', _overdue_arguments),
+    'upcoming': ('List open tasks due soon', _upcoming_arguments),
+    'init': ('Initialize TaskFlow in current directory', None),
+    'stats': ('Show task statistics', _stats_arguments),
+    'report': ('Show burndown and velocity from the task history', _report_arguments),
+    'scan': ('List, count or export the tasks of every project under a directory', _scan_arguments),
+    'archive': ('Move done tasks to the archive', _archive_arguments),
+    'import': ('Import tasks from CSV or JSON Lines', _import_arguments),
+    'migrate': ('Copy all tasks into another task file/backend', _migrate_arguments),
+    'serve': ('Keep TaskFlow resident and answer CLI calls over a socket', _serve_arguments),
+}
+
+
+def build_parser(command: str = None) -> 'argparse.ArgumentParser':
+    """Build the CLI argument parser - with a command, only that command's subparser"""
+    import argparse
     parser = argparse.ArgumentParser(
         description="TaskFlow - Smart CLI Todo & Project Manager",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -237,79 +3801,201 @@ Examples:
   taskflow start 5                        # Mark task #5 in progress
   taskflow delete 7                       # Delete task #7
   taskflow export                         # Export to TASKS.md
+  taskflow upcoming --within 3d           # Tasks due in the next 3 days
+  taskflow --file tasks.db list           # Use a SQLite task file
+  taskflow migrate tasks.db               # Copy tasks to another backend
   
 Statuses: todo, in_progress, done, blocked
 Priorities: high, medium, low
         """
     )
     
-    subparsers = parser.add_subparsers(dest='command', help='Command to execute')
-    
-    # Add command
-    add_parser = subparsers.add_parser('add', help='Add new task')
-    add_parser.add_argument('title', help='Task title')
-    add_parser.add_argument('--priority', choices=['high', 'medium', 'low'], default='medium')
-    add_parser.add_argument('--tags', help='Comma-separated tags')
-    add_parser.add_argument('--due', help='Due date (YYYY-MM-DD)')
-    
-    # List command
-    list_parser = subparsers.add_parser('list', help='List tasks')
-    list_parser.add_argument('--status', choices=['todo', 'in_progress', 'done', 'blocked'])
-    list_parser.add_argument('--priority', choices=['high', 'medium', 'low'])
-    list_parser.add_argument('--tag', help='Filter by tag')
-    list_parser.add_argument('--details', action='store_true', help='Show detailed info')
-    
-    # Done command
-    done_parser = subparsers.add_parser('done', help='Mark task as done')
-    done_parser.add_argument('task_id', type=int, help='Task ID')
-    
-    # Start command
-    start_parser = subparsers.add_parser('start', help='Mark task as in progress')
-    start_parser.add_argument('task_id', type=int, help='Task ID')
-    
-    # Block command
-    block_parser = subparsers.add_parser('block', help='Mark task as blocked')
-    block_parser.add_argument('task_id', type=int, help='Task ID')
-    
-    # Delete command
-    delete_parser = subparsers.add_parser('delete', help='Delete task')
-    delete_parser.add_argument('task_id', type=int, help='Task ID')
+    parser.add_argument('--file', default=TASKFILE,
+                        help=f'Task file (default: {TASKFILE}; .db/.sqlite/.sqlite3 use SQLite)')
+    parser.add_argument('--backend', choices=sorted(STORAGE_BACKENDS),
+                        help='Storage backend (default: picked from the file extension)')
+    parser.add_argument('--recursive', action='store_true',
+                        help='list/stats/export every task file below the current directory (like scan)')
+    parser.add_argument('--file-format', choices=FILE_FORMATS,
+                        help='Write the task file in this format (default: keep its current format)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always decode the task file instead of using the load cache')
+    parser.add_argument('--journal', action='store_true',
+                        help='Append changes to a journal instead of rewriting the task file '
+                             '(also enabled by TASKFLOW_JOURNAL=1)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print per-phase timings, counts and peak memory as JSON to stderr '
+                             '(also enabled by TASKFLOW_TRACE=1, or TASKFLOW_TRACE=FILE)')
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help='Append the --profile report to FILE instead of stderr')
     
-    # Edit command
-    edit_parser = subparsers.add_parser('edit', help='Edit task')
-    edit_parser.add_argument('task_id', type=int, help='Task ID')
-    edit_parser.add_argument('--title', help='New title')
-    edit_parser.add_argument('--priority', choices=['high', 'medium', 'low'])
-    edit_parser.add_argument('--tags', help='Comma-separated tags')
-    edit_parser.add_argument('--due', help='Due date (YYYY-MM-DD)')
-    
-    # Export command
-    export_parser = subparsers.add_parser('export', help='Export tasks to Markdown')
-    export_parser.add_argument('--output', default='TASKS.md', help='Output file')
-    
-    # Init command
-    init_parser = subparsers.add_parser('init', help='Initialize TaskFlow in current directory')
+    subparsers = parser.add_subparsers(dest='command', help='Command to execute')
+    for name, (help_text, add_arguments) in COMMAND_PARSERS.items():
+        if command in (None, name):
+            subparser = subparsers.add_parser(name, help=help_text)
+            if add_arguments:
+                add_arguments(subparser)
+    return parser
+
+
+def read_only_view(args) -> Optional[Dict]:
+    """load_matching() filters for a read-only command, or None when it needs the whole board
     
-    # Stats command
-    stats_parser = subparsers.add_parser('stats', help='Show task statistics')
+    Filtered list only loads its matches and stats loads no tasks at all, on backends that
+    can query (SQLite); the others ignore the view and load everything.
+    """
+    if args.command == 'stats':
+        return {"limit": 0}
+    filtered = args.command == 'list' and (args.status or args.priority or args.tag)
+    if filtered and not (args.include_archived or args.explain):
+        return {"status": args.status, "priority": args.priority, "tag": args.tag}
+    return None
+
+
+def open_taskflow(args, profiler: Profiler = None, partial: bool = True) -> TaskFlow:
+    """Open the TaskFlow selected by the global CLI options
     
-    args = parser.parse_args()
+    With partial, read-only commands get a view holding just the tasks they show.
+    """
+    return TaskFlow(args.file, journal=args.journal or os.environ.get('TASKFLOW_JOURNAL') == '1',
+                    backend=args.backend, cache=not args.no_cache, profiler=profiler,
+                    file_format=args.file_format, view=read_only_view(args) if partial else None)
+
+
+# TASKFLOW_TRACE values that switch tracing off / send it to stderr; anything else is a file
+TRACE_OFF = ("", "0", "false", "no", "off")
+TRACE_ON = ("1", "true", "yes", "on", "-", "stderr")
+
+
+def trace_destination(args) -> Optional[str]:
+    """Where the profile report goes: --profile/--profile-output, else TASKFLOW_TRACE"""
+    if args.profile_output:
+        return args.profile_output
+    if args.profile:
+        return "-"
+    value = os.environ.get('TASKFLOW_TRACE', "").strip()
+    if value.lower() in TRACE_OFF:
+        return None
+    return "-" if value.lower() in TRACE_ON else value
+
+
+def run_cli(argv: List[str], open_tf=open_taskflow):
+    """Parse a command line and run it in this process"""
+    import time
+    started = time.perf_counter()
+    # Fast path: build only the subparser of the command being run (prompts call stats a lot)
+    command = find_command(argv)
+    help_first = any(arg in ('-h', '--help') for arg in argv[:argv.index(command)]) if command else True
+    parser = build_parser(None if help_first or command not in COMMAND_PARSERS else command)
+    args = parser.parse_args(argv)
+    parsed = time.perf_counter() - started
     
     if not args.command:
         parser.print_help()
         return
     
-    # Initialize TaskFlow
-    tf = TaskFlow()
+    if args.command == 'serve':
+        socket_path = args.socket or default_socket_path()
+        if args.stop:
+            if stop_daemon(socket_path):
+                print(f"[OK] Daemon stopped: {socket_path}")
+            else:
+                print(f"[INFO] No daemon running at {socket_path}")
+        else:
+            serve(socket_path)
+        return
+    
+    destination = trace_destination(args)
+    profiler = None
+    if destination:
+        profiler = Profiler(started=started)
+        profiler.record("parse_args", parsed)
+    try:
+        if args.command == 'scan' or (args.recursive and args.command in SCAN_VIEWS):
+            run_scan(args, profiler)
+            return
+        # Initialize TaskFlow
+        with (profiler or NULL_PROFILER).phase("open"):
+            tf = open_tf(args, profiler)
+        save_errors = tf.storage.save_errors
+        with tf.profiler.phase("command"):
+            run_command(args, tf)
+        if tf.storage.save_errors != save_errors:
+            sys.exit(1)  # Whatever the command printed, its changes never reached the disk
+    finally:
+        if profiler:
+            profiler.emit(destination, command=args.command)
+
+
+# Commands --recursive runs over every task file below the current directory
+SCAN_VIEWS = ("list", "stats", "export")
+
+
+def run_scan(args, profiler: Profiler = None):
+    """list / stats / export across every task file under a root directory"""
+    if args.command == 'scan':
+        root, view = args.root, 'export' if args.export else 'stats' if args.stats else 'list'
+        output = args.export
+    else:
+        root, view, output = ".", args.command, getattr(args, 'output', None)
+    projects = scan_projects(root, Path(args.file).name, getattr(args, 'workers', None),
+                             not args.no_cache, profiler)
+    if not projects.projects:
+        print(f"[INFO] No {Path(args.file).name} files found under {root}")
+        return
     
-    # Execute command
+    if view == 'stats':
+        stats = projects.stats()
+        print_stats(stats)
+        print("By Project:")
+        for project, count in sorted(stats["projects"].items()):
+            print(f"  {project}: {count}")
+        print()
+    elif view == 'export':
+        if projects.export(output, args.format):
+            print(f"[OK] Tasks from {len(projects.projects)} project(s) exported to: {output}")
+        else:
+            print("[X] Export failed")
+    else:
+        entries = projects.entries(args.status, args.priority, args.tag)
+        if not entries:
+            print("[INFO] No tasks found")
+            return
+        now = datetime.now()
+        
+        def render() -> Iterator[str]:
+            yield f"\n[TASKS] TaskFlow - {len(entries)} task(s) in {len(projects.projects)} project(s)\n\n"
+            for project, task in entries:
+                first, _, rest = format_task(task, args.details, now).partition("\n")
+                yield f"{first}  ({project})\n{rest}"
+        
+        write_output(render(), getattr(args, 'pager', False))
+
+
+def main(argv: List[str] = None):
+    """Main CLI interface - forwarded to a running daemon when there is one"""
+    argv = sys.argv[1:] if argv is None else argv
+    # Fix Unicode output on Windows
+    if sys.stdout.encoding != 'utf-8':
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    if should_forward(argv):
+        code = forward_to_daemon(argv)
+        if code is not None:
+            if code:
+                sys.exit(code)
+            return
+    run_cli(argv)
+
+
+def run_command(args, tf: TaskFlow):
+    """Execute a parsed command against a TaskFlow"""
     if args.command == 'init':
-        if Path(TASKFILE).exists():
+        if tf.storage.exists():
             print("[OK] TaskFlow already initialized in this directory")
         else:
             tf.save_tasks()
             print("[OK] TaskFlow initialized!")
-            print(f"   Task file: {TASKFILE}")
+            print(f"   Task file: {args.file}")
             print("\n[TIP] Quick start:")
             print('   taskflow add "My first task"')
             print('   taskflow list')
@@ -320,132 +4006,321 @@ Priorities: high, medium, low
         print(f"[OK] Task added: [{task['id']}] {task['title']}")
     
     elif args.command == 'list':
-        tasks = tf.list_tasks(args.status, args.priority, args.tag)
+        sort = f"-{args.sort or 'priority'}" if args.reverse else args.sort
+        try:
+            if args.explain:
+                if not args.where:
+                    print("[X] --explain needs --where")
+                    sys.exit(1)
+                print(tf.explain(args.where, args.status, args.priority, args.tag))
+                return
+            tasks = tf.list_tasks(args.status, args.priority, args.tag, sort, args.limit, args.offset,
+                                  args.include_archived, args.where)
+        except ValueError as e:
+            print(f"[X] Invalid query: {e}")
+            sys.exit(1)
         
         if not tasks:
             print("[INFO] No tasks found")
             return
         
-        # Print summary
-        print(f"\n[TASKS] TaskFlow - {len(tasks)} task(s)\n")
+        # Render everything first, then write it in a few large chunks
+        if args.limit is None and not args.offset:
+            header = f"{len(tasks)} task(s)"
+        else:
+            total = tf.count_tasks(args.status, args.priority, args.tag, args.include_archived, args.where)
+            header = f"showing {args.offset + 1}-{args.offset + len(tasks)} of {total} task(s)"
+        now = datetime.now()
+        
+        def render() -> Iterator[str]:
+            yield f"\n[TASKS] TaskFlow - {header}\n\n"
+            for task in tasks:
+                yield format_task(task, args.details, now)
+            
+            # Show counts by status
+            status_counts = tf.stats(include_archived=args.include_archived)['by_status']
+            yield "\n[STATS] Summary:\n"
+            for status in ["todo", "in_progress", "blocked", "done"]:
+                count = status_counts.get(status, 0)
+                if count > 0:
+                    icon = STATUS_ICONS[status]
+                    status_name = status.replace('_', ' ').title()
+                    yield f"   {icon} {status_name}: {count}\n"
         
+        with tf.profiler.phase("print"):
+            write_output(render(), args.pager)
+    
+    elif args.command in BULK_ACTIONS:
+        updates = {}
+        if args.command == 'edit':
+            if args.title:
+                updates['title'] = args.title
+            if args.priority:
+                updates['priority'] = args.priority
+            if args.tags:
+                updates['tags'] = args.tags.split(',')
+            if args.due:
+                updates['due_date'] = args.due
+            if not updates:
+                print("[!] No changes specified")
+                return
+        run_bulk(tf, args, updates)
+    
+    elif args.command == 'search':
+        query = " ".join(args.query)
+        tasks = tf.search(query, args.limit)
+        if not tasks:
+            print(f"[INFO] No tasks match: {query}")
+            return
+        print(f"\n[SEARCH] {len(tasks)} task(s) matching: {query}\n")
         for task in tasks:
             print_task(task, args.details)
-        
-        # Show counts by status
-        print()
-        status_counts = {}
-        for task in tf.tasks:
-            status = task['status']
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
-        print("[STATS] Summary:")
-        for status in ["todo", "in_progress", "blocked", "done"]:
-            count = status_counts.get(status, 0)
-            if count > 0:
-                icon = STATUS_ICONS[status]
-                status_name = status.replace('_', ' ').title()
-                print(f"   {icon} {status_name}: {count}")
-    
-    elif args.command == 'done':
-        if tf.mark_done(args.task_id):
-            task = tf.get_task(args.task_id)
-            print(f"[OK] Task completed: [{task['id']}] {task['title']}")
-        else:
-            print(f"[X] Task {args.task_id} not found")
     
-    elif args.command == 'start':
-        if tf.mark_in_progress(args.task_id):
-            task = tf.get_task(args.task_id)
-            print(f"[>] Task started: [{task['id']}] {task['title']}")
-        else:
-            print(f"[X] Task {args.task_id} not found")
+    elif args.command == 'overdue':
+        tasks = tf.overdue_tasks()
+        if not tasks:
+            print("[OK] Nothing overdue")
+            return
+        print(f"\n[!] {len(tasks)} overdue task(s)\n")
+        for task in tasks:
+            print_task(task, args.details)
     
-    elif args.command == 'block':
-        if tf.update_task(args.task_id, status="blocked"):
-            task = tf.get_task(args.task_id)
-            print(f"[#] Task blocked: [{task['id']}] {task['title']}")
-        else:
-            print(f"[X] Task {args.task_id} not found")
+    elif args.command == 'upcoming':
+        tasks = tf.upcoming_tasks(args.within)
+        if not tasks:
+            print("[INFO] Nothing due soon")
+            return
+        print(f"\n[DUE] {len(tasks)} task(s) due soon\n")
+        for task in tasks:
+            print_task(task, args.details)
+            if not args.details:
+                print(f"    Due: {task.due_date}")
     
-    elif args.command == 'delete':
-        task = tf.get_task(args.task_id)
-        if task:
-            if tf.delete_task(args.task_id):
-                print(f"[DEL] Task deleted: [{task['id']}] {task['title']}")
-        else:
-            print(f"[X] Task {args.task_id} not found")
+    elif args.command == 'link':
+        if not (args.blocks or args.depends_on):
+            print("[X] Give --blocks or --depends-on")
+            sys.exit(1)
+        blocks, missing = clip_id_ranges((r for group in args.blocks or [] for r in group), tf._tasks)
+        depends_on, missing_too = clip_id_ranges((r for group in args.depends_on or [] for r in group), tf._tasks)
+        if missing or missing_too:
+            print(f"[X] Task(s) not found: {format_id_ranges(sorted(missing + missing_too))}")
+            sys.exit(1)
+        # "A blocks B" is stored as "B depends on A"
+        edges = [(target, args.task_id) for target in blocks]
+        edges += [(args.task_id, target) for target in depends_on]
+        try:
+            with tf.batch():
+                for task_id, depends_on in edges:
+                    if args.remove:
+                        tf.remove_dependency(task_id, depends_on)
+                    else:
+                        tf.add_dependency(task_id, depends_on)
+        except ValueError as e:
+            print(f"[X] {e}")
+            sys.exit(1)
+        for task_id, depends_on in edges:
+            verb = "no longer blocks" if args.remove else "blocks"
+            print(f"[LINK] [{depends_on}] {tf.get_task(depends_on).title} {verb} "
+                  f"[{task_id}] {tf.get_task(task_id).title}")
     
-    elif args.command == 'edit':
-        task = tf.get_task(args.task_id)
-        if not task:
-            print(f"❌ Task {args.task_id} not found")
+    elif args.command == 'next':
+        tasks = tf.ready_tasks(args.limit)
+        waiting = tf.count_waiting()
+        if not tasks:
+            print("[INFO] Nothing ready" + (f" ({waiting} task(s) waiting on others)" if waiting else ""))
             return
-        
-        updates = {}
-        if args.title:
-            updates['title'] = args.title
-        if args.priority:
-            updates['priority'] = args.priority
-        if args.tags:
-            updates['tags'] = args.tags.split(',')
-        if args.due:
-            updates['due_date'] = args.due
-        
-        if updates:
-            tf.update_task(args.task_id, **updates)
-            print(f"[EDIT] Task updated: [{task['id']}] {task['title']}")
-        else:
-            print("[!] No changes specified")
+        print(f"\n[NEXT] {len(tasks)} ready task(s)\n")
+        for task in tasks:
+            print_task(task, args.details)
+        if waiting:
+            print(f"\n[INFO] {waiting} task(s) waiting on others")
     
     elif args.command == 'export':
-        if tf.export_markdown(args.output):
+        if tf.export(args.output, args.format, args.incremental):
             print(f"[OK] Tasks exported to: {args.output}")
         else:
             print("[X] Export failed")
     
-    elif args.command == 'stats':
-        total = len(tf.tasks)
-        if total == 0:
-            print("[INFO] No tasks yet")
+    elif args.command == 'import':
+        fmt = args.format or ("csv" if args.source.lower().endswith(".csv") else "jsonl")
+        if args.chunk_size < 1:
+            print("[X] --chunk-size must be at least 1")
             return
         
-        # Calculate stats
-        by_status = {}
-        by_priority = {}
-        overdue_count = 0
-        
-        for task in tf.tasks:
-            status = task['status']
-            priority = task['priority']
-            by_status[status] = by_status.get(status, 0) + 1
-            by_priority[priority] = by_priority.get(priority, 0) + 1
-            if tf.is_overdue(task):
-                overdue_count += 1
-        
-        print("\n[STATS] TaskFlow Statistics\n")
-        print(f"Total Tasks: {total}")
-        print()
-        
-        print("By Status:")
-        for status in ["todo", "in_progress", "blocked", "done"]:
-            count = by_status.get(status, 0)
-            icon = STATUS_ICONS[status]
-            pct = (count / total * 100) if total > 0 else 0
-            print(f"  {icon} {status.replace('_', ' ').title()}: {count} ({pct:.1f}%)")
+        def report(number, message):
+            print(f"[X] Record {number}: {message}")
         
+        if args.source == '-':
+            imported, skipped = tf.import_tasks(read_records(sys.stdin, fmt), args.chunk_size, report)
+        else:
+            with open(args.source, 'r', encoding='utf-8', newline='') as f:
+                imported, skipped = tf.import_tasks(read_records(f, fmt), args.chunk_size, report)
+        print(f"[OK] Imported {imported} task(s)" + (f", skipped {skipped}" if skipped else ""))
+    
+    elif args.command == 'migrate':
+        destination = open_storage(args.destination, args.to, file_format=args.format)
+        if destination.exists() and not args.force:
+            print(f"[X] {args.destination} already exists (use --force to overwrite)")
+            return
+        destination.save(tf._tasks, tf._meta())
+        destination.close()
+        print(f"[OK] Migrated {len(tf._tasks)} task(s) from {args.file} ({tf.storage.name}) "
+              f"to {args.destination} ({destination.name})")
+    
+    elif args.command == 'archive':
+        if args.auto:
+            after = None if args.auto.lower() == 'off' else args.auto
+            try:
+                tf.set_archive_policy(after)
+            except ValueError as e:
+                print(f"[X] {e}")
+                sys.exit(1)
+            if after:
+                print(f"[OK] Done tasks will be archived after {after}")
+            else:
+                print("[OK] Auto-archive disabled")
+            return
+        moved = tf.archive_tasks(args.older_than)
+        if moved:
+            print(f"[OK] Archived {moved} task(s) to: {tf.archive.directory}")
+        else:
+            print("[INFO] Nothing to archive")
+    
+    elif args.command == 'stats':
+        print_stats(tf.stats(include_archived=args.all))
+    
+    elif args.command == 'report':
+        show_all = not (args.burndown or args.velocity)
+        print_report(tf.report(args.since), args.burndown or show_all, args.velocity or show_all)
+
+
+# Command -> (change(tf, task_id, updates), per-task label, summary verb)
+BULK_ACTIONS = {
+    'done': (lambda tf, task_id, updates: tf.mark_done(task_id), "[OK] Task completed", "completed"),
+    'start': (lambda tf, task_id, updates: tf.mark_in_progress(task_id), "[>] Task started", "started"),
+    'block': (lambda tf, task_id, updates: tf.update_task(task_id, status="blocked"),
+              "[#] Task blocked", "blocked"),
+    'delete': (lambda tf, task_id, updates: tf.delete_task(task_id), "[DEL] Task deleted", "deleted"),
+    'edit': (lambda tf, task_id, updates: tf.update_task(task_id, **updates), "[EDIT] Task updated", "updated"),
+}
+
+
+def select_task_ids(tf: TaskFlow, args) -> Tuple[List[int], List[Tuple[int, int]]]:
+    """IDs picked by a command's ID/range arguments, narrowed (or chosen) by its filters
+    
+    Returns (live task IDs; ranges of the given IDs that are not live tasks). Ranges are
+    clipped to the board, so 1-20000000 costs no more than the tasks it matches.
+    """
+    ids, missing = clip_id_ranges((r for group in args.task_ids for r in group), tf._tasks)
+    filters = (args.select_status, getattr(args, 'select_priority', None), args.select_tag)
+    if not (any(filters) or args.where):
+        return ids, missing
+    matches = [task.id for task in tf.list_tasks(*filters, where=args.where)]
+    if not args.task_ids:
+        return matches, []
+    selected = set(matches)
+    return [task_id for task_id in ids if task_id in selected], missing
+
+
+def run_bulk(tf: TaskFlow, args, updates: Dict = None):
+    """Apply done/start/block/delete/edit to every selected task with a single save"""
+    if not args.task_ids and not (args.select_status or getattr(args, 'select_priority', None)
+                                  or args.select_tag or args.where):
+        print("[X] Give task IDs (e.g. 3 5 10-250) or a filter (--status, --tag, --where)")
+        sys.exit(1)
+    try:
+        task_ids, missing = select_task_ids(tf, args)
+    except ValueError as e:
+        print(f"[X] Invalid query: {e}")
+        sys.exit(1)
+    skipped = sum(last - first + 1 for first, last in missing)
+    if not task_ids and not skipped:
+        print("[INFO] No tasks selected")
+        return
+    
+    change, label, verb = BULK_ACTIONS[args.command]
+    changed = [tf.get_task(task_id, include_archived=False) for task_id in task_ids]
+    with tf.batch():
+        for task_id in task_ids:
+            change(tf, task_id, updates)
+    
+    # Report once the whole selection is saved
+    with tf.profiler.phase("print"):
+        write_output(f"{label}: [{task.id}] {task.title}\n" for task in changed)
+    if skipped == 1:
+        print_missing(tf, missing[0][0])
+    elif skipped:
+        print(f"[X] {skipped} task ID(s) not found or archived: {format_id_ranges(missing)}")
+    if len(task_ids) + skipped > 1:
+        skipped_note = f", {skipped} skipped" if skipped else ""
+        print(f"\n[STATS] {len(changed)} task(s) {verb}{skipped_note}")
+
+
+def print_stats(stats: Dict):
+    """Print the stats command's report"""
+    total = stats['total']
+    if total == 0:
+        print("[INFO] No tasks yet")
+        return
+    
+    by_status = stats['by_status']
+    by_priority = stats['by_priority']
+    overdue_count = stats['overdue']
+    
+    print("\n[STATS] TaskFlow Statistics\n")
+    print(f"Total Tasks: {total}")
+    print()
+    
+    print("By Status:")
+    for status in ["todo", "in_progress", "blocked", "done"]:
+        count = by_status.get(status, 0)
+        icon = STATUS_ICONS[status]
+        pct = (count / total * 100) if total > 0 else 0
+        print(f"  {icon} {status.replace('_', ' ').title()}: {count} ({pct:.1f}%)")
+    
+    print()
+    print("By Priority:")
+    for priority in ["high", "medium", "low"]:
+        count = by_priority.get(priority, 0)
+        icon = PRIORITY_COLORS[priority]
+        pct = (count / total * 100) if total > 0 else 0
+        print(f"  {icon} {priority.title()}: {count} ({pct:.1f}%)")
+    
+    if overdue_count > 0:
         print()
-        print("By Priority:")
-        for priority in ["high", "medium", "low"]:
-            count = by_priority.get(priority, 0)
-            icon = PRIORITY_COLORS[priority]
-            pct = (count / total * 100) if total > 0 else 0
-            print(f"  {icon} {priority.title()}: {count} ({pct:.1f}%)")
-        
-        if overdue_count > 0:
-            print()
-            print(f"[!] Overdue: {overdue_count}")
-        
+        print(f"[!] Overdue: {overdue_count}")
+    
+    print()
+
+
+BAR_WIDTH = 40
+
+
+def print_report(report: Dict, burndown: bool = True, velocity: bool = True):
+    """Print the report command's burndown chart and weekly velocity"""
+    days = report['days']
+    print(f"\n[REPORT] {days[0]} - {days[-1]}\n")
+    
+    if burndown:
+        # Long windows show one row per week (its last day) instead of one per day
+        step = 7 if len(days) > 60 else 1
+        rows = range(len(days) - 1, -1, -step)[::-1]
+        peak = max(report['open']) or 1
+        print("Burndown (open tasks at end of day):")
+        for i in rows:
+            count = report['open'][i]
+            print(f"  {days[i]}  {count:>6}  {'#' * round(count / peak * BAR_WIDTH)}")
+        print()
+    
+    if velocity:
+        print("Velocity (per week):")
+        for end in range(len(days), 0, -7)[::-1]:
+            start = max(end - 7, 0)
+            done = sum(report['completed'][start:end])
+            added = sum(report['created'][start:end])
+            print(f"  {days[start]} - {days[end - 1]}  {done:>5} done  {added:>5} added")
+        total = sum(report['completed']) - sum(report['reopened'])
+        print(f"  Average: {total / len(days):.1f} tasks/day completed")
         print()
 
 
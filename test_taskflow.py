@@ -7,6 +7,7 @@ import sys
 import io
 import os
 import json
+import shutil
 import tempfile
 from pathlib import Path
 
@@ -219,12 +220,1356 @@ except Exception as e:
     print(f"[X] FAIL: {e}")
     sys.exit(1)
 
+# TEST 13: Journal storage
+print("\n[TEST 13] Testing journal storage...")
+try:
+    journal_dir = Path(tempfile.mkdtemp())
+    journal_file = journal_dir / "journal_tasks.json"
+    jtf = TaskFlow(str(journal_file), journal=True)
+    jtf.add_task("Journaled task A", "high")
+    jtf.add_task("Journaled task B", "low")
+    jtf.mark_done(1)
+    jtf.delete_task(2)
+    if journal_file.exists() or not jtf.storage.journal_file.exists():
+        print("[X] FAIL: Mutations should append to the journal, not rewrite the snapshot")
+        sys.exit(1)
+    
+    jtf2 = TaskFlow(str(journal_file), journal=True, compact_threshold=0)
+    if len(jtf2.tasks) != 1 or jtf2.get_task(1)['status'] != 'done':
+        print("[X] FAIL: Journal not replayed on load")
+        sys.exit(1)
+    
+    # Threshold of 0 compacts on the next append
+    jtf2.add_task("Journaled task C")
+    if jtf2.storage.journal_file.exists() or not journal_file.exists():
+        print("[X] FAIL: Journal not compacted into the snapshot")
+        sys.exit(1)
+    if len(TaskFlow(str(journal_file)).tasks) != 2:
+        print("[X] FAIL: Compacted snapshot incomplete")
+        sys.exit(1)
+    
+    # An append cut short must not swallow the changes saved after it
+    with open(jtf2.storage.journal_file, 'ab') as f:
+        f.write(b'{"op":"put","task":{"id":9,"tit')
+    jtf3 = TaskFlow(str(journal_file), journal=True)
+    jtf3.add_task("Journaled task D")
+    jtf3.add_task("Journaled task E")
+    jtf3.mark_done(3)
+    reloaded = TaskFlow(str(journal_file), journal=True)
+    titles = sorted(task['title'] for task in reloaded.tasks)
+    if titles != ["Journaled task A", "Journaled task C", "Journaled task D", "Journaled task E"] \
+            or reloaded.get_task(3)['status'] != 'done':
+        print(f"[X] FAIL: Changes after a torn journal line were lost: {titles}")
+        sys.exit(1)
+    print("[OK] PASS: Journal append, replay and compaction working")
+    shutil.rmtree(journal_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 14: ID index and counter
+print("\n[TEST 14] Testing ID allocation...")
+try:
+    id_dir = Path(tempfile.mkdtemp())
+    id_file = id_dir / "id_tasks.json"
+    itf = TaskFlow(str(id_file))
+    for i in range(5):
+        itf.add_task(f"Task {i}")
+    itf.delete_task(5)
+    itf.delete_task(2)
+    if itf.get_task(2) is not None or [t['id'] for t in itf.list_tasks()] != [1, 3, 4]:
+        print("[X] FAIL: Delete did not update the ID index")
+        sys.exit(1)
+    # Deleted IDs are never reused, even after a reload
+    if TaskFlow(str(id_file)).add_task("Fresh task")['id'] != 6:
+        print("[X] FAIL: Next-ID counter not persisted")
+        sys.exit(1)
+    print("[OK] PASS: ID index and counter working")
+    shutil.rmtree(id_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 15: Secondary indexes follow updates
+print("\n[TEST 15] Testing filter indexes...")
+try:
+    idx_dir = Path(tempfile.mkdtemp())
+    xtf = TaskFlow(str(idx_dir / "idx_tasks.json"))
+    xtf.add_task("Crash on save", "low", ["bug"])
+    xtf.add_task("Slow startup", "high", ["bug", "perf"])
+    xtf.add_task("New theme", "medium", ["feature"])
+    xtf.update_task(1, priority="high", tags=["bug", "urgent"])
+    xtf.update_task(3, tags=["bug"])
+    xtf.mark_done(2)
+    ids = [t['id'] for t in xtf.list_tasks(tag="bug")]
+    if ids != [1, 2, 3]:
+        print(f"[X] FAIL: Tag index out of date, got {ids}")
+        sys.exit(1)
+    if [t['id'] for t in xtf.list_tasks(status="todo", tag="bug", priority="high")] != [1]:
+        print("[X] FAIL: Combined filters wrong")
+        sys.exit(1)
+    if xtf.list_tasks(tag="perf", status="todo") or xtf.list_tasks(tag="missing"):
+        print("[X] FAIL: Stale index entries returned")
+        sys.exit(1)
+    print("[OK] PASS: Filter indexes stay in sync")
+    shutil.rmtree(idx_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 16: SQLite backend
+print("\n[TEST 16] Testing SQLite backend...")
+try:
+    db_dir = Path(tempfile.mkdtemp())
+    db_file = db_dir / "tasks.db"
+    stf = TaskFlow(str(db_file))
+    if stf.storage.name != "sqlite":
+        print("[X] FAIL: .db extension did not select SQLite")
+        sys.exit(1)
+    stf.add_task("Stored in SQLite", "high", ["db", "sql"], "2026-03-01")
+    stf.add_task("Second row", "low")
+    stf.mark_done(2)
+    stf.delete_task(1)
+    stf.add_task("Third row", "medium", ["db"])
+    stf.close()
+    
+    stf2 = TaskFlow(str(db_file))
+    if [t['id'] for t in stf2.list_tasks()] != [3, 2] or stf2.get_task(2)['status'] != 'done':
+        print("[X] FAIL: SQLite rows not persisted correctly")
+        sys.exit(1)
+    if stf2.get_task(3)['tags'] != ["db"] or stf2.add_task("Fourth")['id'] != 4:
+        print("[X] FAIL: SQLite tags or next ID lost")
+        sys.exit(1)
+    stf2.add_task("Overdue row", "high", ["db"], "2020-01-01")
+    
+    # Read-only commands only load what they show, straight from the indexed columns
+    import taskflow
+    from contextlib import redirect_stdout
+    view = TaskFlow(str(db_file), view={"tag": "db", "priority": "high"})
+    if not view.partial or [t.id for t in view.tasks] != [5] or view.stats() != stf2.stats():
+        print("[X] FAIL: Filtered SQLite view loaded the wrong tasks or totals")
+        sys.exit(1)
+    if TaskFlow(str(db_file), view={"limit": 0}).tasks:
+        print("[X] FAIL: stats view should load no tasks")
+        sys.exit(1)
+    try:
+        view.mark_done(5)
+        print("[X] FAIL: Writing through a filtered view should fail")
+        sys.exit(1)
+    except RuntimeError:
+        pass
+    for argv in (["list", "--tag", "db"], ["list", "--status", "done"], ["stats"]):
+        outputs = []
+        for partial in (True, False):
+            out = io.StringIO()
+            with redirect_stdout(out):
+                taskflow.run_cli(["--file", str(db_file), *argv],
+                                 open_tf=lambda args, profiler: taskflow.open_taskflow(args, profiler, partial))
+            outputs.append(out.getvalue())
+        if outputs[0] != outputs[1]:
+            print(f"[X] FAIL: {' '.join(argv)} differs on a filtered view")
+            sys.exit(1)
+    stf2.close()
+    print("[OK] PASS: SQLite backend working")
+    shutil.rmtree(db_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 17: Batches and bulk import
+print("\n[TEST 17] Testing batch and import...")
+try:
+    batch_dir = Path(tempfile.mkdtemp())
+    btf = TaskFlow(str(batch_dir / "batch_tasks.json"))
+    writes = []
+    original_save_changes = btf.storage.save_changes
+    btf.storage.save_changes = lambda *a: (writes.append(a), original_save_changes(*a))
+    
+    with btf.batch():
+        for i in range(50):
+            btf.add_task(f"Bulk {i}")
+        btf.mark_done(1)
+        btf.delete_task(2)
+    if len(writes) != 1 or len(TaskFlow(str(batch_dir / "batch_tasks.json")).tasks) != 49:
+        print(f"[X] FAIL: Batch should save once, saved {len(writes)} times")
+        sys.exit(1)
+    
+    try:
+        with btf.batch():
+            btf.add_task("Rolled back")
+            btf.update_task(3, title="Changed", tags=["gone"])
+            btf.delete_task(4)
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    if (len(btf.tasks) != 49 or btf.get_task(3)['title'] != "Bulk 2" or btf.get_task(4) is None
+            or btf.list_tasks(tag="gone") or btf.add_task("Next")['id'] != 51 or len(writes) != 2):
+        print("[X] FAIL: Batch rollback incomplete")
+        sys.exit(1)
+    
+    # A rolled-back batch leaves the task order (and so the saved file) untouched
+    order = [t.id for t in btf.tasks]
+    try:
+        with btf.batch():
+            btf.update_task(order[1], title="Renamed")
+            btf.delete_task(order[0])
+            btf.mark_done(order[3])
+            btf.delete_task(order[2])
+            btf.add_task("Temporary")
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    if [t.id for t in btf.tasks] != order:
+        print("[X] FAIL: Rollback reordered the tasks")
+        sys.exit(1)
+    
+    errors = []
+    records = [{"title": "Imported", "priority": "high", "tags": "a,b"},
+               {"title": "Bad", "priority": "urgent"},
+               {"title": "Done already", "status": "done"},
+               {"title": 5}, {"title": "Odd tags", "tags": [1, 2]}, {"title": "Odd due", "due": 20300101},
+               {"title": "Odd priority", "priority": ["high"]}, {"title": "Last one"}]
+    imported, skipped = btf.import_tasks(records, chunk_size=1, on_error=lambda n, m: errors.append(n))
+    if (imported, skipped, errors) != (3, 5, [2, 4, 5, 6, 7]) or btf.list_tasks(tag="b")[0]['priority'] != "high":
+        print("[X] FAIL: Import validation wrong")
+        sys.exit(1)
+    print("[OK] PASS: Batch and import working")
+    shutil.rmtree(batch_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 18: Daemon mode
+print("\n[TEST 18] Testing daemon mode...")
+try:
+    import threading
+    import taskflow
+    daemon_dir = Path(tempfile.mkdtemp())
+    daemon_file = str(daemon_dir / "daemon_tasks.json")
+    daemon = taskflow.TaskFlowDaemon()
+    response = daemon.execute({"argv": ["--file", daemon_file, "add", "Resident task"], "cwd": str(daemon_dir)})
+    if response["code"] != 0 or "[1] Resident task" not in response["stdout"]:
+        print(f"[X] FAIL: Daemon command failed: {response}")
+        sys.exit(1)
+    # A write from another process must be picked up by the resident instance
+    TaskFlow(daemon_file).add_task("Written elsewhere")
+    response = daemon.execute({"argv": ["--file", daemon_file, "list"], "cwd": str(daemon_dir)})
+    if "Written elsewhere" not in response["stdout"]:
+        print("[X] FAIL: Daemon served a stale board")
+        sys.exit(1)
+    if daemon.execute({"argv": ["nonsense"], "cwd": str(daemon_dir)})["code"] != 2:
+        print("[X] FAIL: Usage errors should be returned, not raised")
+        sys.exit(1)
+    lost = {"argv": ["--file", str(daemon_dir / "missing" / "tasks.json"), "add", "Lost"], "cwd": str(daemon_dir)}
+    if daemon.execute(lost)["code"] != 1:
+        print("[X] FAIL: A failed save must not report success")
+        sys.exit(1)
+    daemon.close()
+    
+    if os.name == 'posix':
+        socket_path = str(daemon_dir / "d.sock")
+        server = threading.Thread(target=taskflow.serve, args=(socket_path,), daemon=True)
+        server.start()
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            threading.Event().wait(0.05)
+        if taskflow.forward_to_daemon(["--file", daemon_file, "done", "2"], socket_path) != 0:
+            print("[X] FAIL: Command not forwarded to daemon")
+            sys.exit(1)
+        taskflow.stop_daemon(socket_path)
+        server.join(5)
+        if TaskFlow(daemon_file).get_task(2)['status'] != 'done' or os.path.exists(socket_path):
+            print("[X] FAIL: Daemon write lost or socket left behind")
+            sys.exit(1)
+        
+        # SQLite boards from concurrent clients: every request runs on its own server thread
+        server = threading.Thread(target=taskflow.serve, args=(socket_path,), daemon=True)
+        server.start()
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            threading.Event().wait(0.05)
+        db_file = str(daemon_dir / "daemon_tasks.db")
+        codes = []
+        clients = [threading.Thread(target=lambda i=i: codes.append(taskflow.forward_to_daemon(
+            ["--file", db_file, "add", f"Concurrent {i}"], socket_path))) for i in range(6)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join(10)
+        taskflow.stop_daemon(socket_path)
+        server.join(5)
+        if codes != [0] * 6 or len(TaskFlow(db_file).tasks) != 6 or os.path.exists(socket_path):
+            print(f"[X] FAIL: Daemon with an SQLite board: codes {codes}")
+            sys.exit(1)
+        if taskflow.forward_to_daemon(["list"], socket_path) is not None:
+            print("[X] FAIL: Client should fall back when no daemon is running")
+            sys.exit(1)
+        if os.getuid() == 0:
+            # Someone else's socket at our path (e.g. the shared /tmp fallback) is never used
+            import socket
+            from contextlib import redirect_stderr
+            foreign = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            foreign.bind(socket_path)
+            foreign.listen(1)
+            os.chown(socket_path, 65534, 65534)
+            with redirect_stderr(io.StringIO()):
+                forwarded = taskflow.forward_to_daemon(["list"], socket_path)
+            foreign.close()
+            os.unlink(socket_path)
+            if forwarded is not None:
+                print("[X] FAIL: Forwarded to a socket owned by another user")
+                sys.exit(1)
+    print("[OK] PASS: Daemon mode working")
+    shutil.rmtree(daemon_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 19: Load cache
+print("\n[TEST 19] Testing load cache...")
+try:
+    import taskflow
+    cache_test_dir = Path(tempfile.mkdtemp())
+    os.environ['TASKFLOW_CACHE_DIR'] = str(cache_test_dir / "cache")
+    cached_file = cache_test_dir / "cached_tasks.json"
+    ctf = TaskFlow(str(cached_file), cache=True)
+    ctf.add_task("Cached task", "high", ["cache"])
+    if list((cache_test_dir / "cache").glob("*.cache")):
+        print("[X] FAIL: Saves should not write the load cache")
+        sys.exit(1)
+    # The first load only notes the version; the second caches it; the third is served from it
+    decoded = []
+    original_decode = taskflow.decode_snapshot
+    taskflow.decode_snapshot = lambda raw: (decoded.append(1), original_decode(raw))[1]
+    try:
+        for _ in range(3):
+            if TaskFlow(str(cached_file), cache=True).get_task(1)['title'] != "Cached task":
+                print("[X] FAIL: Cached load returned the wrong board")
+                sys.exit(1)
+    finally:
+        taskflow.decode_snapshot = original_decode
+    cache_files = sorted((cache_test_dir / "cache").glob("*.cache"), key=lambda path: path.stat().st_size)
+    if len(decoded) != 2 or len(cache_files) != 2:
+        print(f"[X] FAIL: Load cache not used from the second read ({len(decoded)} decodes)")
+        sys.exit(1)
+    cache_files = cache_files[1:]  # The full entry, not the small "seen" marker
+    
+    # Same size, different content: the hash must catch it
+    cached_file.write_text(cached_file.read_text(encoding='utf-8').replace("Cached task", "Edited task"),
+                           encoding='utf-8')
+    if TaskFlow(str(cached_file), cache=True).get_task(1)['title'] != "Edited task":
+        print("[X] FAIL: Stale cache entry was used")
+        sys.exit(1)
+    
+    cache_files[0].write_bytes(b"garbage")
+    if TaskFlow(str(cached_file), cache=True).get_task(1)['title'] != "Edited task":
+        print("[X] FAIL: Corrupt cache not ignored")
+        sys.exit(1)
+    print("[OK] PASS: Load cache working")
+    del os.environ['TASKFLOW_CACHE_DIR']
+    shutil.rmtree(cache_test_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 20: Task model
+print("\n[TEST 20] Testing Task model...")
+try:
+    from taskflow import Task
+    raw = {"id": 7, "title": "Model", "priority": "".join(["hi", "gh"]), "status": "todo",
+           "tags": ["a"], "due_date": "2020-05-01T09:00:00+00:00", "created": "2020-01-01T00:00:00",
+           "updated": "2020-01-01T00:00:00", "custom_field": {"kept": True}}
+    task = Task.from_dict(raw)
+    if task.to_dict() != raw or dict(task) != raw or task['custom_field'] != {"kept": True}:
+        print("[X] FAIL: Task does not round-trip losslessly")
+        sys.exit(1)
+    if task.priority is not sys.intern("high") or not task.is_overdue():
+        print("[X] FAIL: Priority not interned or due date not parsed")
+        sys.exit(1)
+    task['due_date'] = "not a date"
+    if task.is_overdue() or task.get('due_date') != "not a date" or hasattr(task, '__dict__'):
+        print("[X] FAIL: Due date not re-parsed on update")
+        sys.exit(1)
+    print("[OK] PASS: Task model working")
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 21: Due-date index
+print("\n[TEST 21] Testing due-date queries...")
+try:
+    from datetime import datetime, timedelta
+    due_dir = Path(tempfile.mkdtemp())
+    dtf = TaskFlow(str(due_dir / "due_tasks.json"))
+    now = datetime(2026, 6, 15, 12, 0)
+    dtf.add_task("Long overdue", "low", [], "2026-06-01")
+    dtf.add_task("Just overdue", "high", [], "2026-06-15T11:00:00")
+    dtf.add_task("Due tomorrow", "medium", [], "2026-06-16")
+    dtf.add_task("Due next month", "medium", [], "2026-07-15")
+    dtf.add_task("No due date")
+    if [t['id'] for t in dtf.overdue_tasks(now)] != [1, 2] or dtf.count_overdue(now) != 2:
+        print("[X] FAIL: Overdue query wrong")
+        sys.exit(1)
+    if [t['id'] for t in dtf.upcoming_tasks(timedelta(days=7), now)] != [3]:
+        print("[X] FAIL: Upcoming query wrong")
+        sys.exit(1)
+    dtf.mark_done(1)
+    dtf.update_task(4, due_date="2026-06-10")
+    dtf.delete_task(2)
+    if [t['id'] for t in dtf.overdue_tasks(now)] != [4] or dtf.count_overdue(now) != 1:
+        print("[X] FAIL: Due-date index not maintained on update")
+        sys.exit(1)
+    print("[OK] PASS: Due-date queries working")
+    shutil.rmtree(due_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 22: Aggregate counters
+print("\n[TEST 22] Testing aggregate counters...")
+try:
+    count_dir = Path(tempfile.mkdtemp())
+    count_file = count_dir / "count_tasks.json"
+    ktf = TaskFlow(str(count_file))
+    ktf.add_task("One", "high")
+    ktf.add_task("Two", "low")
+    ktf.add_task("Three", "low")
+    ktf.mark_done(2)
+    ktf.update_task(3, priority="medium")
+    ktf.delete_task(1)
+    stats = ktf.stats()
+    if stats['by_status'] != {"todo": 1, "done": 1} or stats['by_priority'] != {"low": 1, "medium": 1}:
+        print(f"[X] FAIL: Counters wrong: {stats}")
+        sys.exit(1)
+    header = json.loads(count_file.read_text(encoding='utf-8'))
+    if header.get('counts') != {"status": stats['by_status'], "priority": stats['by_priority']}:
+        print("[X] FAIL: Counters not persisted in the file header")
+        sys.exit(1)
+    
+    # A hand edit makes the header disagree with the tasks
+    header['tasks'][1]['status'] = "blocked"
+    count_file.write_text(json.dumps(header), encoding='utf-8')
+    ktf2 = TaskFlow(str(count_file))
+    if not ktf2.counters_drifted or ktf2.stats()['by_status'] != {"done": 1, "blocked": 1}:
+        print("[X] FAIL: Drifted header counters not rebuilt")
+        sys.exit(1)
+    ktf2.get_task(3)['status'] = "todo"  # Bypasses the API
+    if ktf2.verify_counters() or ktf2.stats()['by_status'] != {"done": 1, "todo": 1}:
+        print("[X] FAIL: verify_counters did not repair drift")
+        sys.exit(1)
+    # The next change also repairs the drifted header on disk, even when journaling
+    header['tasks'][1]['status'] = "in_progress"
+    count_file.write_text(json.dumps(header), encoding='utf-8')
+    ktf3 = TaskFlow(str(count_file), journal=True)
+    ktf3.add_task("Four", "high")
+    repaired = json.loads(count_file.read_text(encoding='utf-8'))['counts']
+    if repaired != ktf3._counts() or repaired['status'] != {"done": 1, "in_progress": 1, "todo": 1}:
+        print(f"[X] FAIL: Drifted header not rewritten: {repaired}")
+        sys.exit(1)
+    print("[OK] PASS: Aggregate counters working")
+    shutil.rmtree(count_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 23: Streaming and incremental export
+print("\n[TEST 23] Testing incremental export...")
+try:
+    import taskflow
+    export_dir = Path(tempfile.mkdtemp())
+    os.environ['TASKFLOW_CACHE_DIR'] = str(export_dir / "cache")
+    etf = TaskFlow(str(export_dir / "export_tasks.json"))
+    for i in range(10):
+        etf.add_task(f"Export task {i}", "medium", ["docs"])
+    etf.mark_in_progress(3)
+    md_file = str(export_dir / "TASKS.md")
+    
+    rendered = []
+    original_render = taskflow.MarkdownRenderer.task
+    taskflow.MarkdownRenderer.task = lambda self, task: (rendered.append(task.id), original_render(self, task))[1]
+    saved_chunk = taskflow.EXPORT_CHUNK
+    taskflow.EXPORT_CHUNK = 4
+    try:
+        etf.export_markdown(md_file, incremental=True)
+        first = Path(md_file).read_text(encoding='utf-8')
+        # An unchanged board leaves the file alone
+        before = os.stat(md_file).st_mtime_ns
+        rendered.clear()
+        etf.export_markdown(md_file, incremental=True)
+        if rendered or os.stat(md_file).st_mtime_ns != before:
+            print("[X] FAIL: Incremental export rewrote an unchanged board")
+            sys.exit(1)
+        # A change re-renders only the run of IDs 4-7 it falls in
+        etf.update_task(7, title="Export task seven")
+        etf.export_markdown(md_file, incremental=True)
+    finally:
+        taskflow.MarkdownRenderer.task = original_render
+        taskflow.EXPORT_CHUNK = saved_chunk
+    second = Path(md_file).read_text(encoding='utf-8')
+    etf.export_markdown(str(export_dir / "FULL.md"))
+    full = (export_dir / "FULL.md").read_text(encoding='utf-8')
+    
+    if rendered != [4, 5, 6, 7] or "Export task seven" not in second or second.count("### ") != 10:
+        print(f"[X] FAIL: Incremental export re-rendered {rendered}")
+        sys.exit(1)
+    if second.split("**Total Tasks:**")[1] != full.split("**Total Tasks:**")[1]:
+        print("[X] FAIL: Incremental export differs from a full export")
+        sys.exit(1)
+    if first.index("In Progress (1)") > first.index("Todo (9)"):
+        print("[X] FAIL: Sections out of order")
+        sys.exit(1)
+    for output in ("tasks.csv", "tasks.jsonl", "tasks.html"):
+        if not etf.export(str(export_dir / output)):
+            print(f"[X] FAIL: Could not export {output}")
+            sys.exit(1)
+    csv_lines = (export_dir / "tasks.csv").read_text(encoding='utf-8').splitlines()
+    if len(csv_lines) != 11 or json.loads((export_dir / "tasks.jsonl").read_text(encoding='utf-8').splitlines()[0])['id'] != 3:
+        print("[X] FAIL: CSV/JSON Lines export wrong")
+        sys.exit(1)
+    # Tasks moving between sections or leaving the board
+    etf.mark_done(2)
+    etf.delete_task(9)
+    etf.export_markdown(md_file, incremental=True)
+    etf.export_markdown(str(export_dir / "FULL.md"))
+    third = Path(md_file).read_text(encoding='utf-8')
+    full = (export_dir / "FULL.md").read_text(encoding='utf-8')
+    if "Done (1)" not in third or third.split("**Total Tasks:**")[1] != full.split("**Total Tasks:**")[1]:
+        print("[X] FAIL: Incremental export differs from a full export after moves")
+        sys.exit(1)
+    print("[OK] PASS: Incremental export working")
+    del os.environ['TASKFLOW_CACHE_DIR']
+    shutil.rmtree(export_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 24: Benchmark helpers
+print("\n[TEST 24] Testing benchmark board generator and regression gate...")
+try:
+    import benchmark_taskflow
+    bench_dir = Path(tempfile.mkdtemp())
+    benchmark_taskflow.generate_board(bench_dir / "board.json", 500)
+    board = TaskFlow(str(bench_dir / "board.json"))
+    if len(board.tasks) != 500 or not board.list_tasks(tag="bug") or not board.list_tasks(status="done"):
+        print("[X] FAIL: Generated board is not realistic")
+        sys.exit(1)
+    baseline = {"results": {"500": {"load_tasks": {"median": 0.100}, "stats": {"median": 0.0001}}}}
+    current = {"results": {"500": {"load_tasks": {"median": 0.150}, "stats": {"median": 0.0005}}}}
+    regressions = benchmark_taskflow.compare(current, baseline, threshold=10)
+    if len(regressions) != 1 or "load_tasks" not in regressions[0]:
+        print(f"[X] FAIL: Regression gate wrong: {regressions}")
+        sys.exit(1)
+    if benchmark_taskflow.compare(current, baseline, threshold=60):
+        print("[X] FAIL: Threshold not respected")
+        sys.exit(1)
+    print("[OK] PASS: Benchmark helpers working")
+    shutil.rmtree(bench_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 25: Profiling hooks
+print("\n[TEST 25] Testing profiler hooks and --profile output...")
+try:
+    import taskflow
+    from contextlib import redirect_stdout, redirect_stderr
+    prof_dir = Path(tempfile.mkdtemp())
+    prof_file = prof_dir / "tasks.json"
+    seen = []
+    profiler = taskflow.Profiler(on_phase=lambda name, seconds: seen.append(name))
+    ptf = TaskFlow(str(prof_file), profiler=profiler)
+    ptf.add_task("Profiled", "high")
+    ptf.list_tasks(priority="high")
+    ptf.export(str(prof_dir / "TASKS.md"))
+    ptf = TaskFlow(str(prof_file), profiler=profiler)
+    report = profiler.report()
+    for phase in ("load", "index", "save", "list", "export"):
+        if phase not in report["phases"] or phase not in seen:
+            print(f"[X] FAIL: Phase {phase} not recorded: {report['phases']}")
+            sys.exit(1)
+    if report["counters"].get("tasks_loaded") != 1 or not report["counters"].get("bytes_read") \
+            or not report["counters"].get("bytes_written"):
+        print(f"[X] FAIL: Counters wrong: {report['counters']}")
+        sys.exit(1)
+    
+    trace_file = prof_dir / "trace.json"
+    with redirect_stdout(io.StringIO()):
+        taskflow.run_cli(["--file", str(prof_file), "--profile-output", str(trace_file), "list"])
+    stderr = io.StringIO()
+    with redirect_stdout(io.StringIO()), redirect_stderr(stderr):
+        taskflow.run_cli(["--file", str(prof_file), "--profile", "stats"])
+    line = json.loads(trace_file.read_text().strip())
+    if line["command"] != "list" or "print" not in line["phases"] or "parse_args" not in line["phases"]:
+        print(f"[X] FAIL: Profile file wrong: {line}")
+        sys.exit(1)
+    if json.loads(stderr.getvalue())["counters"]["tasks_loaded"] != 1:
+        print("[X] FAIL: --profile did not report to stderr")
+        sys.exit(1)
+    if taskflow.TaskFlow(str(prof_file)).profiler.enabled:
+        print("[X] FAIL: Profiling should be off by default")
+        sys.exit(1)
+    plain = taskflow.build_parser("stats").parse_args(["stats"])
+    saved_trace = os.environ.get('TASKFLOW_TRACE')
+    try:
+        for value, expected in (("0", None), ("False", None), (" no ", None), ("", None), ("1", "-"),
+                                ("yes", "-"), ("trace.jsonl", "trace.jsonl")):
+            os.environ['TASKFLOW_TRACE'] = value
+            if taskflow.trace_destination(plain) != expected:
+                print(f"[X] FAIL: TASKFLOW_TRACE={value!r} should mean {expected!r}")
+                sys.exit(1)
+    finally:
+        if saved_trace is None:
+            os.environ.pop('TASKFLOW_TRACE', None)
+        else:
+            os.environ['TASKFLOW_TRACE'] = saved_trace
+    print("[OK] PASS: Profiling hooks working")
+    shutil.rmtree(prof_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 26: Full-text search
+print("\n[TEST 26] Testing search index...")
+try:
+    search_dir = Path(tempfile.mkdtemp())
+    search_file = search_dir / "tasks.json"
+    stf = TaskFlow(str(search_file))
+    stf.add_task("Fix login crash", "high", ["bug", "auth"])
+    stf.add_task("Login page layout", "low", ["ui"])
+    stf.add_task("Deploy release", "medium")
+    if [t.id for t in stf.search("log")] != [1, 2] or [t.id for t in stf.search("login crash")] != [1]:
+        print("[X] FAIL: Prefix/AND matching wrong")
+        sys.exit(1)
+    if [t.id for t in stf.search("auth")] != [1] or stf.search("nothing"):
+        print("[X] FAIL: Tag matching wrong")
+        sys.exit(1)
+    # Exact matches rank above prefix matches
+    stf.add_task("Loginflow cleanup", "high")
+    if [t.id for t in stf.search("login")] != [1, 2, 4] or len(stf.search("login", limit=2)) != 2:
+        print("[X] FAIL: Ranking wrong")
+        sys.exit(1)
+    stf.update_task(3, title="Deploy login service")
+    stf.delete_task(2)
+    if [t.id for t in stf.search("login")] != [1, 3, 4]:
+        print("[X] FAIL: Incremental updates not indexed")
+        sys.exit(1)
+    if not stf.search_file.exists():
+        print("[X] FAIL: Search index not persisted")
+        sys.exit(1)
+    # Changes made while the index was not loaded are appended to its log, not rewritten
+    import taskflow
+    search_log = taskflow.SearchIndex.log_file(stf.search_file)
+    snapshot = stf.search_file.read_bytes()
+    other = TaskFlow(str(search_file))
+    other.update_task(1, title="Fix signup crash")
+    other.add_task("Login audit")
+    if stf.search_file.read_bytes() != snapshot or not search_log.exists():
+        print("[X] FAIL: Changes not logged next to the search index")
+        sys.exit(1)
+    replayed = taskflow.SearchIndex()
+    if not replayed.load(stf.search_file) or replayed.sync(other._tasks):
+        print("[X] FAIL: Log replay missed changes")
+        sys.exit(1)
+    stf = TaskFlow(str(search_file))
+    if [t.id for t in stf.search("login")] != [3, 5, 4] or [t.id for t in stf.search("signup")] != [1]:
+        print("[X] FAIL: Logged changes not searchable")
+        sys.exit(1)
+    if stf.search_file.read_bytes() != snapshot:
+        print("[X] FAIL: Search rewrote an up-to-date index")
+        sys.exit(1)
+    # A lost log is made up for from the 'updated' stamps; a long one is folded in
+    other.update_task(3, title="Deploy signup service")
+    search_log.unlink()
+    saved_limit = taskflow.SEARCH_LOG_COMPACT_BYTES
+    taskflow.SEARCH_LOG_COMPACT_BYTES = 0
+    try:
+        other.update_task(4, title="Flow cleanup")
+        stf = TaskFlow(str(search_file))
+        if [t.id for t in stf.search("signup")] != [1, 3] or [t.id for t in stf.search("login")] != [5]:
+            print("[X] FAIL: Stale index not synced")
+            sys.exit(1)
+    finally:
+        taskflow.SEARCH_LOG_COMPACT_BYTES = saved_limit
+    if search_log.exists() or stf.search_file.read_bytes() == snapshot:
+        print("[X] FAIL: Long search log not folded into the index")
+        sys.exit(1)
+    print("[OK] PASS: Search index working")
+    shutil.rmtree(search_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 27: Top-k and paginated listing
+print("\n[TEST 27] Testing limit/offset/sort and buffered output...")
+try:
+    import taskflow
+    from contextlib import redirect_stdout, redirect_stderr
+    page_dir = Path(tempfile.mkdtemp())
+    ptf = TaskFlow(str(page_dir / "tasks.json"))
+    with ptf.batch():
+        for i in range(30):
+            ptf.add_task(f"Task {i:02d}", ["low", "high", "medium"][i % 3], ["even"] if i % 2 == 0 else [],
+                         f"2030-01-{30 - i:02d}" if i % 5 == 0 else None)
+    everything = ptf.list_tasks()
+    if ptf.list_tasks(limit=5) != everything[:5] or ptf.list_tasks(limit=5, offset=10) != everything[10:15]:
+        print("[X] FAIL: Priority-order paging wrong")
+        sys.exit(1)
+    if ptf.list_tasks(tag="even", priority="high", limit=3) != ptf.list_tasks(tag="even", priority="high")[:3]:
+        print("[X] FAIL: Filtered paging wrong")
+        sys.exit(1)
+    by_due = ptf.list_tasks(sort="due", limit=3)
+    if [t.id for t in by_due] != [26, 21, 16]:
+        print(f"[X] FAIL: Due-date top-k wrong: {[t.id for t in by_due]}")
+        sys.exit(1)
+    if [t.id for t in ptf.list_tasks(sort="-id", limit=2, offset=1)] != [29, 28]:
+        print("[X] FAIL: Reverse sort wrong")
+        sys.exit(1)
+    if ptf.list_tasks(sort="title") != sorted(everything, key=lambda t: t.title):
+        print("[X] FAIL: Full sort wrong")
+        sys.exit(1)
+    if ptf.count_tasks() != 30 or ptf.count_tasks(tag="even") != 15 or ptf.count_tasks("todo", "high", "even") != 5:
+        print("[X] FAIL: count_tasks wrong")
+        sys.exit(1)
+    
+    out = io.StringIO()
+    with redirect_stdout(out):
+        taskflow.run_cli(["--file", str(page_dir / "tasks.json"), "list", "--limit", "2", "--offset", "2"])
+    lines = [line for line in out.getvalue().splitlines() if line.startswith("[ ]")]
+    if "showing 3-4 of 30" not in out.getvalue() or len(lines) != 2:
+        print(f"[X] FAIL: CLI paging wrong: {out.getvalue()}")
+        sys.exit(1)
+    if taskflow.format_task(everything[0], True).count("\n") < 4:
+        print("[X] FAIL: format_task details missing")
+        sys.exit(1)
+    for bad in (["--limit", "-1"], ["--offset", "-5"]):
+        try:
+            with redirect_stderr(io.StringIO()):
+                taskflow.build_parser("list").parse_args(["list", *bad])
+            print(f"[X] FAIL: {' '.join(bad)} accepted")
+            sys.exit(1)
+        except SystemExit as e:
+            if e.code != 2:
+                print(f"[X] FAIL: {' '.join(bad)} should be a usage error")
+                sys.exit(1)
+    print("[OK] PASS: Paginated listing working")
+    shutil.rmtree(page_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 28: Archive
+print("\n[TEST 28] Testing archive of done tasks...")
+try:
+    from datetime import datetime, timedelta
+    arch_dir = Path(tempfile.mkdtemp())
+    arch_file = arch_dir / "tasks.json"
+    atf = TaskFlow(str(arch_file))
+    for i in range(6):
+        atf.add_task(f"Task {i + 1}", "high" if i % 2 else "low", ["old"] if i < 3 else [])
+    for task_id in (1, 2, 3):
+        atf.mark_done(task_id)
+    atf.get_task(3).updated = (datetime.now() - timedelta(days=60)).isoformat()
+    if atf.archive_tasks(older_than=timedelta(days=30)) != 1 or atf.archive_tasks() != 2:
+        print("[X] FAIL: archive_tasks moved the wrong tasks")
+        sys.exit(1)
+    
+    atf = TaskFlow(str(arch_file))
+    if [t.id for t in atf.tasks] != [4, 5, 6] or atf.stats()["total"] != 3:
+        print("[X] FAIL: Archived tasks still live")
+        sys.exit(1)
+    if atf.get_task(2).title != "Task 2" or not atf.is_archived(2) or atf.get_task(2, include_archived=False):
+        print("[X] FAIL: Archived task not resolved")
+        sys.exit(1)
+    if atf.mark_done(2) or atf.add_task("New").id != 7:
+        print("[X] FAIL: Archived IDs must stay read-only and unique")
+        sys.exit(1)
+    with_archived = atf.list_tasks(include_archived=True)
+    if [t.id for t in with_archived] != [2, 4, 6, 7, 1, 3, 5]:
+        print(f"[X] FAIL: include_archived order wrong: {[t.id for t in with_archived]}")
+        sys.exit(1)
+    if [t.id for t in atf.list_tasks(tag="old", include_archived=True)] != [2, 1, 3]:
+        print("[X] FAIL: include_archived filter wrong")
+        sys.exit(1)
+    all_stats = atf.stats(include_archived=True)
+    if all_stats["total"] != 7 or all_stats["by_status"]["done"] != 3 or all_stats["by_priority"]["low"] != 3:
+        print(f"[X] FAIL: stats(include_archived) wrong: {all_stats}")
+        sys.exit(1)
+    
+    # Auto-archive policy runs as part of the next save
+    atf.set_archive_policy("30d")
+    atf.mark_done(4)
+    atf.get_task(4).updated = (datetime.now() - timedelta(days=31)).isoformat()
+    atf._archived_on = None
+    atf.add_task("Trigger a save")
+    atf = TaskFlow(str(arch_file))
+    if atf.archive_after != "30d" or not atf.is_archived(4) or len(atf.archive) != 4:
+        print("[X] FAIL: Auto-archive policy not applied")
+        sys.exit(1)
+    
+    # A long-lived instance (daemon, service) must not write back a stale archive index
+    resident = TaskFlow(str(arch_file))
+    len(resident.archive)
+    other = TaskFlow(str(arch_file))
+    other.mark_done(5)
+    other.archive_tasks()
+    resident.load_tasks()
+    resident.mark_done(6)
+    resident.archive_tasks()
+    after = TaskFlow(str(arch_file))
+    if not (after.is_archived(5) and after.is_archived(6) and resident.is_archived(5)) or len(after.archive) != 6:
+        print("[X] FAIL: Archive index written from stale memory")
+        sys.exit(1)
+    print("[OK] PASS: Archive working")
+    shutil.rmtree(arch_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 29: File formats
+print("\n[TEST 29] Testing compact file formats and detection...")
+try:
+    import taskflow
+    fmt_dir = Path(tempfile.mkdtemp())
+    fmt_file = fmt_dir / "tasks.json"
+    ftf = TaskFlow(str(fmt_file))
+    ftf.add_task("Ünïcode title", "high", ["a", "b"], "2030-01-01")
+    ftf.add_task("Second", "low")
+    expected = [t.to_dict() for t in ftf.tasks]
+    magic = {"pretty": b"{\n", "compact": b'{"tasks"', "jsonl": b'{"format":"jsonl"', "binary": b"TFLOWB1"}
+    saved_orjson = taskflow.orjson
+    try:
+        for json_library in {saved_orjson, None}:
+            taskflow.orjson = json_library
+            for fmt in taskflow.FILE_FORMATS:
+                TaskFlow(str(fmt_file), file_format=fmt).save_tasks()
+                if not fmt_file.read_bytes().startswith(magic[fmt]):
+                    print(f"[X] FAIL: {fmt} file has the wrong header")
+                    sys.exit(1)
+                # Loading detects the format; saving without one keeps it
+                detected = TaskFlow(str(fmt_file))
+                if [t.to_dict() for t in detected.tasks] != expected or detected._next_id < 3:
+                    print(f"[X] FAIL: {fmt} round trip lost data")
+                    sys.exit(1)
+                detected.delete_task(detected.add_task("Third").id)
+                if not fmt_file.read_bytes().startswith(magic[fmt]):
+                    print(f"[X] FAIL: {fmt} format not kept on save")
+                    sys.exit(1)
+    finally:
+        taskflow.orjson = saved_orjson
+    # Pretty files checked out with CRLF (Windows, git autocrlf) must stay multi-line
+    TaskFlow(str(fmt_file), file_format="pretty").save_tasks()
+    for variant in (fmt_file.read_bytes().replace(b"\n", b"\r\n"), b"\xef\xbb\xbf" + fmt_file.read_bytes()):
+        fmt_file.write_bytes(variant)
+        edited = TaskFlow(str(fmt_file))
+        edited.add_task("Edited on Windows")
+        if not fmt_file.read_bytes().startswith(b"{\n") or taskflow.detect_file_format(variant) != "pretty" \
+                or len(edited.tasks) < 3:
+            print("[X] FAIL: CRLF / BOM pretty file rewritten as compact")
+            sys.exit(1)
+    jsonl_file = fmt_dir / "tasks.jsonl"
+    TaskFlow(str(jsonl_file)).add_task("New board")
+    lines = jsonl_file.read_text(encoding="utf-8").splitlines()
+    if len(lines) != 2 or json.loads(lines[1])["title"] != "New board":
+        print("[X] FAIL: .jsonl files should default to JSON Lines")
+        sys.exit(1)
+    print("[OK] PASS: File formats working")
+    shutil.rmtree(fmt_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 30: Multi-project scan
+print("\n[TEST 30] Testing multi-project scan...")
+try:
+    import taskflow
+    from contextlib import redirect_stdout
+    scan_dir = Path(tempfile.mkdtemp())
+    os.environ['TASKFLOW_CACHE_DIR'] = str(scan_dir / "cache")
+    for project in ("svc/api", "svc/web", "node_modules/pkg", ".git/x"):
+        (scan_dir / project).mkdir(parents=True)
+        ptf = TaskFlow(str(scan_dir / project / ".taskflow.json"))
+        ptf.add_task(f"Task in {project}", "high", ["x"])
+        ptf.add_task("Second", "low")
+    if [p.parent.name for p in taskflow.discover_task_files(str(scan_dir))] != ["api", "web"]:
+        print("[X] FAIL: Discovery should skip hidden and vendored directories")
+        sys.exit(1)
+    
+    profiler = taskflow.Profiler()
+    projects = taskflow.scan_projects(str(scan_dir), workers=2, profiler=profiler)
+    entries = projects.entries()
+    if [(p, t.id) for p, t in entries] != [("svc/api", 1), ("svc/web", 1), ("svc/api", 2), ("svc/web", 2)]:
+        print(f"[X] FAIL: Merged listing wrong: {[(p, t.id) for p, t in entries]}")
+        sys.exit(1)
+    stats = projects.stats()
+    if stats["total"] != 4 or stats["by_priority"]["high"] != 2 or stats["projects"] != {"svc/api": 2, "svc/web": 2}:
+        print(f"[X] FAIL: Combined stats wrong: {stats}")
+        sys.exit(1)
+    
+    # Unchanged projects come from the summary cache; changed ones are re-read
+    TaskFlow(str(scan_dir / "svc/web/.taskflow.json")).mark_done(1)
+    profiler = taskflow.Profiler()
+    projects = taskflow.scan_projects(str(scan_dir), profiler=profiler)
+    if profiler.counters != {"projects": 2, "projects_cached": 1} or projects.stats()["by_status"].get("done") != 1:
+        print(f"[X] FAIL: Summary cache wrong: {profiler.counters}")
+        sys.exit(1)
+    
+    out = io.StringIO()
+    with redirect_stdout(out):
+        taskflow.run_cli(["scan", str(scan_dir), "--tag", "x"])
+        taskflow.run_cli(["scan", str(scan_dir), "--export", str(scan_dir / "ALL.md")])
+    if "Task in svc/api  (svc/api)" not in out.getvalue() or "Second" in out.getvalue():
+        print(f"[X] FAIL: scan output wrong: {out.getvalue()}")
+        sys.exit(1)
+    if "[svc/web] Task in svc/web" not in (scan_dir / "ALL.md").read_text(encoding="utf-8"):
+        print("[X] FAIL: Combined export missing project names")
+        sys.exit(1)
+    del os.environ['TASKFLOW_CACHE_DIR']
+    print("[OK] PASS: Multi-project scan working")
+    shutil.rmtree(scan_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 31: AsyncTaskFlow
+print("\n[TEST 31] Testing AsyncTaskFlow write coalescing...")
+try:
+    import asyncio
+    import taskflow
+    async_dir = Path(tempfile.mkdtemp())
+    async_file = async_dir / "tasks.json"
+    saves = []
+    
+    async def exercise():
+        atf = await taskflow.AsyncTaskFlow.open(str(async_file), flush_interval=0.05, journal=True)
+        original = atf.taskflow.storage.save_changes
+        atf.taskflow.storage.save_changes = lambda *a: (saves.append(len(a[1]) + len(a[2])), original(*a))
+        created = await asyncio.gather(*(atf.add_task(f"Burst {i}") for i in range(20)))
+        await atf.mark_done(created[0].id)
+        if len(atf.list_tasks()) != 20 or atf.get_task(1).status != "done" or saves:
+            return "mutations should apply in memory before any write"
+        await asyncio.sleep(0.2)
+        if saves != [20]:
+            return f"burst should coalesce into one flush, got {saves}"
+        await atf.delete_task(2)
+        await atf.flush()
+        if saves != [20, 1] or TaskFlow(str(async_file), journal=True).get_task(2):
+            return f"explicit flush failed: {saves}"
+        await atf.update_task(3, title="Closed out")
+        await atf.close()
+        return None
+    
+    problem = asyncio.run(exercise())
+    if problem:
+        print(f"[X] FAIL: {problem}")
+        sys.exit(1)
+    reloaded = TaskFlow(str(async_file), journal=True)
+    if len(reloaded.tasks) != 19 or reloaded.get_task(3).title != "Closed out":
+        print("[X] FAIL: close() did not flush")
+        sys.exit(1)
+    
+    # SQLite connections are tied to one thread: open, flushes and close must share it
+    async def sqlite_board():
+        async with await taskflow.AsyncTaskFlow.open(str(async_dir / "tasks.db"), flush_interval=0.01) as atf:
+            for i in range(3):
+                await atf.add_task(f"Queued {i}")
+                await asyncio.sleep(0.05)
+            await atf.mark_done(1)
+    
+    asyncio.run(sqlite_board())
+    
+    # The daily auto-archive writes (and fsyncs) on the I/O thread, never on the event loop
+    import threading
+    policy_file = async_dir / "policy.json"
+    seeded = TaskFlow(str(policy_file))
+    seeded.add_task("Finished long ago")
+    seeded.mark_done(1)
+    seeded.get_task(1).updated = "2020-01-01T00:00:00"
+    seeded.set_archive_policy("30d")
+    archive_threads = []
+    
+    async def archive_policy():
+        atf = await taskflow.AsyncTaskFlow.open(str(policy_file))
+        atf.taskflow._archived_on = None
+        original = atf.taskflow.archive.append
+        atf.taskflow.archive.append = lambda tasks: (archive_threads.append(threading.current_thread()),
+                                                     original(tasks))[1]
+        await atf.add_task("Trigger")
+        await atf.close()
+    
+    asyncio.run(archive_policy())
+    if len(archive_threads) != 1 or archive_threads[0] is threading.main_thread() \
+            or not TaskFlow(str(policy_file)).is_archived(1):
+        print("[X] FAIL: Auto-archive ran on the event loop or not at all")
+        sys.exit(1)
+    on_disk = TaskFlow(str(async_dir / "tasks.db"))
+    if len(on_disk.tasks) != 3 or on_disk.get_task(1).status != "done":
+        print("[X] FAIL: AsyncTaskFlow lost writes to an SQLite board")
+        sys.exit(1)
+    print("[OK] PASS: AsyncTaskFlow working")
+    shutil.rmtree(async_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 32: Sharded storage
+print("\n[TEST 32] Testing sharded storage...")
+try:
+    import taskflow
+    from contextlib import redirect_stdout
+    shard_root = Path(tempfile.mkdtemp())
+    shard_dir = shard_root / "tasks.d"
+    if taskflow.detect_backend(str(shard_dir)) != "sharded" or taskflow.detect_backend(str(shard_root)) != "sharded":
+        print("[X] FAIL: Sharded layout not detected")
+        sys.exit(1)
+    stf = TaskFlow(storage=taskflow.ShardedStorage(shard_dir, shard_size=10))
+    with stf.batch():
+        for i in range(35):
+            stf.add_task(f"Task {i + 1}", tags=["x"] if i % 2 else [])
+    shard_files = sorted(p.name for p in shard_dir.glob("tasks-*.jsonl"))
+    if shard_files != ["tasks-000000.jsonl", "tasks-000001.jsonl", "tasks-000002.jsonl", "tasks-000003.jsonl"]:
+        print(f"[X] FAIL: Unexpected shards: {shard_files}")
+        sys.exit(1)
+    if len((shard_dir / "tasks-000001.jsonl").read_text(encoding="utf-8").splitlines()) != 10:
+        print("[X] FAIL: Shards should hold one task per line")
+        sys.exit(1)
+    
+    # A change rewrites only its own shard
+    before = {p.name: p.read_bytes() for p in shard_dir.iterdir()}
+    stf.mark_done(15)
+    after = {p.name: p.read_bytes() for p in shard_dir.iterdir()}
+    changed = sorted(name for name in after if after[name] != before.get(name))
+    if changed != ["tasks-000001.jsonl"]:
+        print(f"[X] FAIL: One change rewrote {changed}")
+        sys.exit(1)
+    
+    # Adding a task leaves the manifest alone; deleting the newest one records next_id
+    manifest = (shard_dir / "manifest.json").read_bytes()
+    stf.add_task("Parallel")
+    if (shard_dir / "manifest.json").read_bytes() != manifest or b"next_id" in manifest:
+        print("[X] FAIL: Adding a task rewrote the manifest")
+        sys.exit(1)
+    stf.delete_task(36)
+    if json.loads((shard_dir / "manifest.json").read_text(encoding="utf-8")).get("next_id") != 37:
+        print("[X] FAIL: Deleting the newest task should keep its ID reserved")
+        sys.exit(1)
+    for task_id in range(1, 10):
+        stf.delete_task(task_id)
+    if (shard_dir / "tasks-000000.jsonl").exists():
+        print("[X] FAIL: Empty shard not removed")
+        sys.exit(1)
+    
+    reloaded = TaskFlow(str(shard_dir))
+    if reloaded.storage.name != "sharded" or [t.id for t in reloaded.tasks] != list(range(10, 36)):
+        print("[X] FAIL: Sharded reload wrong")
+        sys.exit(1)
+    if reloaded.get_task(15).status != "done" or reloaded.add_task("Next").id != 37:
+        print("[X] FAIL: Sharded data or ID counter wrong")
+        sys.exit(1)
+    
+    with redirect_stdout(io.StringIO()):
+        taskflow.run_cli(["--file", str(shard_dir), "migrate", str(shard_root / "flat.json")])
+        taskflow.run_cli(["--file", str(shard_root / "flat.json"), "migrate", str(shard_root / "again.d")])
+    if len(TaskFlow(str(shard_root / "again.d")).tasks) != 27:
+        print("[X] FAIL: Migration to/from sharded layout failed")
+        sys.exit(1)
+    print("[OK] PASS: Sharded storage working")
+    shutil.rmtree(shard_root, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 33: Query language
+print("\n[TEST 33] Testing --where queries...")
+try:
+    import taskflow
+    query_dir = Path(tempfile.mkdtemp())
+    qf = TaskFlow(str(query_dir / "tasks.json"))
+    qf.add_task("Fix login", "high", ["bug"])
+    qf.add_task("Urgent deploy", "high", ["urgent"], "2026-10-20")
+    qf.add_task("Write docs", "low", ["docs"], "2026-10-25")
+    qf.add_task("Old bug", "high", ["bug"], "2026-10-01")
+    qf.add_task("Late bug", "medium", ["bug"], "2026-12-01")
+    qf.mark_done(4)
+    
+    where = "priority=high and (tag:bug or tag:urgent) and due<2026-11-01 and status!=done"
+    if [t.id for t in qf.list_tasks(where=where)] != [2]:
+        print("[X] FAIL: Compound query wrong")
+        sys.exit(1)
+    if [t.id for t in qf.list_tasks(where="tag:bug or tag:urgent")] != [1, 2, 4, 5]:
+        print("[X] FAIL: OR query wrong or out of priority order")
+        sys.exit(1)
+    if [t.id for t in qf.list_tasks(where="not tag:bug and due=none")] != [] or \
+            [t.id for t in qf.list_tasks(where='title~DOC or title="fix login"')] != [1, 3]:
+        print("[X] FAIL: NOT / due=none / title query wrong")
+        sys.exit(1)
+    if [t.id for t in qf.list_tasks("todo", tag="bug", where="id>=2")] != [5] or \
+            qf.count_tasks(where="due>=2026-10-20 and status=todo") != 3:
+        print("[X] FAIL: Query combined with filters or count wrong")
+        sys.exit(1)
+    
+    plan = qf.explain(where)
+    if "index due<2026-11-01 -> 2 candidate(s)" not in plan:
+        print(f"[X] FAIL: Planner did not pick the due index: {plan}")
+        sys.exit(1)
+    if "index tag=bug + index tag=urgent" not in qf.explain("tag:bug or tag:urgent") or \
+            "full scan" not in qf.explain("not status=done") or "full scan" not in qf.explain("due<2026-11-01"):
+        print("[X] FAIL: Wrong plan chosen")
+        sys.exit(1)
+    
+    for bad in ("priority=urgent", "(tag:bug", "colour=red", "due<soon", "tag:bug and"):
+        try:
+            qf.list_tasks(where=bad)
+            print(f"[X] FAIL: Invalid query accepted: {bad}")
+            sys.exit(1)
+        except ValueError:
+            pass
+    # --explain shows the canonical text; it must parse back to the same query
+    for text in (where, "not (status=todo and priority=high)", "not (tag:a or tag:b) and not not id>3",
+                 "(tag:a or tag:b) and (tag:c or not (id<5 and due=none))", 'title~"two words" or created>=2026-01-02'):
+        ast = taskflow.Query(text).ast
+        if taskflow.Query(taskflow._format_node(ast)).ast != ast:
+            print(f"[X] FAIL: Formatted query changes meaning: {taskflow._format_node(ast)}")
+            sys.exit(1)
+    if taskflow.compile_query(where) is not taskflow.compile_query(where):
+        print("[X] FAIL: Compiled query not reused")
+        sys.exit(1)
+    print("[OK] PASS: Query language working")
+    shutil.rmtree(query_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 34: Bulk and range commands
+print("\n[TEST 34] Testing bulk commands...")
+try:
+    import time
+    import taskflow
+    from contextlib import redirect_stdout
+    bulk_dir = Path(tempfile.mkdtemp())
+    btf = TaskFlow(str(bulk_dir / "tasks.json"))
+    with btf.batch():
+        for i in range(1, 301):
+            btf.add_task(f"Sprint task {i}", "medium", ["sprint-42"] if i <= 250 else [])
+    ranges = taskflow.parse_id_ranges(["3", "5", "10-12", "4,3"])
+    if taskflow.clip_id_ranges(ranges, btf._tasks) != ([3, 5, 10, 11, 12, 4], []):
+        print("[X] FAIL: ID/range parsing wrong")
+        sys.exit(1)
+    try:
+        taskflow.parse_id_ranges(["9-2"])
+        print("[X] FAIL: Backwards range accepted")
+        sys.exit(1)
+    except ValueError:
+        pass
+    
+    saves = []
+    original_save = btf.storage.save_changes
+    btf.storage.save_changes = lambda *a: (saves.append(len(a[1]) + len(a[2])), original_save(*a))[1]
+    
+    def bulk(*argv):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            taskflow.run_cli(["--file", str(bulk_dir / "tasks.json"), *argv], open_tf=lambda args, profiler=None: btf)
+        return out.getvalue()
+    
+    output = bulk("start", "1-100", "150")
+    if len(saves) != 1 or btf.count_tasks("in_progress") != 101 or "101 task(s) started" not in output:
+        print(f"[X] FAIL: Range start not applied in one save ({len(saves)} saves)")
+        sys.exit(1)
+    output = bulk("done", "--tag", "sprint-42", "--status", "in_progress")
+    if len(saves) != 2 or btf.count_tasks("done") != 101 or output.count("Task completed") != 101:
+        print("[X] FAIL: Filter-based done failed")
+        sys.exit(1)
+    output = bulk("delete", "299-300", "999")
+    if len(btf.tasks) != 298 or "Task 999 not found" not in output or "2 task(s) deleted, 1 skipped" not in output:
+        print("[X] FAIL: Delete with a missing ID wrong")
+        sys.exit(1)
+    # Huge ranges are clipped to the board and missing IDs summarized in one line
+    started = time.perf_counter()
+    output = bulk("block", "296-20000000")
+    if time.perf_counter() - started > 2 or btf.count_tasks("blocked") != 3 or output.count("[X]") != 1 \
+            or "19999702 task ID(s) not found or archived: 299-20000000" not in output:
+        print(f"[X] FAIL: Huge range not clipped: {output[-200:]}")
+        sys.exit(1)
+    if taskflow.clip_id_ranges([(1, 9), (3, 4), (12, 12)], {2: 0, 4: 0, 7: 0}) != ([2, 4, 7], [(1, 1), (3, 3), (5, 6), (8, 9), (12, 12)]):
+        print("[X] FAIL: clip_id_ranges wrong")
+        sys.exit(1)
+    bulk("edit", "1-5", "--where", "status=done and id>=3", "--priority", "high")
+    if [t.id for t in btf.list_tasks(priority="high")] != [3, 4, 5] or len(saves) != 5:
+        print("[X] FAIL: Edit with IDs and a query failed")
+        sys.exit(1)
+    if TaskFlow(str(bulk_dir / "tasks.json")).count_tasks("done") != 101:
+        print("[X] FAIL: Bulk changes not saved")
+        sys.exit(1)
+    print("[OK] PASS: Bulk commands working")
+    shutil.rmtree(bulk_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 35: Fast CLI startup
+print("\n[TEST 35] Testing lazy imports and fast command dispatch...")
+try:
+    import subprocess
+    import taskflow
+    probe = ("import sys, taskflow; "
+             "print(','.join(m for m in ('argparse', 'json', 'orjson', 'asyncio', 'sqlite3') if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", probe], cwd=str(Path(taskflow.__file__).parent),
+                            capture_output=True, text=True, check=True)
+    if result.stdout.strip():
+        print(f"[X] FAIL: Importing taskflow loads {result.stdout.strip()}")
+        sys.exit(1)
+    
+    full, fast = taskflow.build_parser(), taskflow.build_parser("done")
+    argv = ["--file", "x.json", "done", "3", "5-7", "--tag", "sprint"]
+    if vars(full.parse_args(argv)) != vars(fast.parse_args(argv)):
+        print("[X] FAIL: Single-command parser parses differently")
+        sys.exit(1)
+    if list(fast._subparsers._group_actions[0].choices) != ["done"]:
+        print("[X] FAIL: Fast path built other subparsers")
+        sys.exit(1)
+    if taskflow.find_command(["--file", "stats", "list"]) != "list":
+        print("[X] FAIL: Command not found after a global option value")
+        sys.exit(1)
+    print("[OK] PASS: Fast startup working")
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 36: Dependencies and the ready queue
+print("\n[TEST 36] Testing dependencies and next...")
+try:
+    import random
+    dep_dir = Path(tempfile.mkdtemp())
+    dtf = TaskFlow(str(dep_dir / "tasks.json"))
+    design = dtf.add_task("Design", "high")
+    build = dtf.add_task("Build", "high")
+    ship = dtf.add_task("Ship", "high", due_date="2026-11-01")
+    docs = dtf.add_task("Docs", "low")
+    dtf.add_dependency(build.id, design.id)
+    dtf.add_dependency(ship.id, build.id)
+    try:
+        dtf.add_dependency(design.id, ship.id)
+        print("[X] FAIL: Dependency cycle accepted")
+        sys.exit(1)
+    except ValueError:
+        pass
+    if [t.id for t in dtf.ready_tasks()] != [design.id, docs.id] or dtf.waiting_on(ship.id) != [build.id]:
+        print("[X] FAIL: Ready queue wrong before completion")
+        sys.exit(1)
+    dtf.mark_done(design.id)
+    if [t.id for t in dtf.ready_tasks()] != [build.id, docs.id] or dtf.dependents(build.id) != [ship.id]:
+        print("[X] FAIL: Finishing a task did not unblock its dependent")
+        sys.exit(1)
+    dtf.delete_task(build.id)
+    reloaded = TaskFlow(str(dep_dir / "tasks.json"))
+    if [t.id for t in reloaded.ready_tasks()] != [ship.id, docs.id] or reloaded.get_task(ship.id).get("depends_on"):
+        print("[X] FAIL: Deleting a prerequisite did not release its dependents")
+        sys.exit(1)
+    
+    # Incremental queue must match a from-scratch rebuild after random changes
+    rng = random.Random(7)
+    graph = TaskFlow(str(dep_dir / "graph.json"))
+    with graph.batch():
+        for i in range(200):
+            graph.add_task(f"Task {i}", rng.choice(["high", "medium", "low"]),
+                           due_date=rng.choice([None, "2026-11-01", "2026-12-01"]))
+        for _ in range(300):
+            a, b = rng.sample(range(1, 201), 2)
+            try:
+                graph.add_dependency(a, b)
+            except ValueError:
+                pass
+    graph.ready_tasks()
+    for _ in range(150):
+        task_id = rng.choice([task.id for task in graph.tasks])
+        action = rng.random()
+        if action < 0.5:
+            graph.mark_done(task_id)
+        elif action < 0.7:
+            graph.update_task(task_id, status="todo", priority=rng.choice(["high", "low"]))
+        elif action < 0.85:
+            graph.delete_task(task_id)
+        else:
+            graph.remove_dependency(task_id, rng.randint(1, 200))
+    incremental = [t.id for t in graph.ready_tasks()]
+    graph.load_tasks()
+    if incremental != [t.id for t in graph.ready_tasks()]:
+        print("[X] FAIL: Incremental ready queue drifted from a rebuild")
+        sys.exit(1)
+    print("[OK] PASS: Dependencies working")
+    shutil.rmtree(dep_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
+# TEST 37: Status history and burndown/velocity reports
+print("\n[TEST 37] Testing history and reports...")
+try:
+    from datetime import datetime, timedelta
+    hist_dir = Path(tempfile.mkdtemp())
+    htf = TaskFlow(str(hist_dir / "tasks.json"))
+    first = htf.add_task("First", "high")
+    second = htf.add_task("Second", "medium")
+    htf.add_task("Third", "low")
+    htf.mark_done(first.id)
+    htf.update_task(first.id, status="todo")
+    htf.mark_done(first.id)
+    htf.delete_task(second.id)
+    try:
+        with htf.batch():
+            htf.add_task("Rolled back", "low")
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+    log = htf.history.path.read_text(encoding='utf-8').splitlines()
+    if not log[0].startswith("seed\t") or len(log) != 7:
+        print(f"[X] FAIL: Unexpected history log: {log}")
+        sys.exit(1)
+    report = htf.report(timedelta(days=7))
+    today = {name: values[-1] for name, values in report.items()}
+    expected = {"created": 3, "completed": 2, "reopened": 1, "deleted": 1, "open": 1}
+    if any(today[name] != count for name, count in expected.items()) or len(report["days"]) != 7:
+        print(f"[X] FAIL: Wrong report for today: {today}")
+        sys.exit(1)
+    if report["open"][:-1] != [0] * 6 or report["days"][-1] != datetime.now().date().isoformat():
+        print(f"[X] FAIL: Wrong burndown window: {report['open']}")
+        sys.exit(1)
+    # A fresh process reuses the rollup and only replays what was appended since
+    htf.add_task("Fourth", "high")
+    reopened = TaskFlow(str(hist_dir / "tasks.json"))
+    saved = reopened.history._load_rollup()
+    if saved is None or saved["offset"] >= reopened.history.path.stat().st_size:
+        print("[X] FAIL: Rollup should lag behind the newest event")
+        sys.exit(1)
+    again = reopened.report(timedelta(days=7))
+    if again["created"][-1] != 4 or again["open"][-1] != 2:
+        print(f"[X] FAIL: Rollup did not catch up: {again}")
+        sys.exit(1)
+    if reopened.history._load_rollup()["offset"] != reopened.history.path.stat().st_size:
+        print("[X] FAIL: Caught-up rollup was not saved")
+        sys.exit(1)
+    empty = TaskFlow(str(hist_dir / "empty.json"))
+    if any(empty.report(timedelta(days=3))["open"]) or empty.history.path.exists() \
+            or empty.history.rollup_file.exists():
+        print("[X] FAIL: A report without a task file must not create history files")
+        sys.exit(1)
+    print("[OK] PASS: History and reports working")
+    shutil.rmtree(hist_dir, ignore_errors=True)
+except Exception as e:
+    print(f"[X] FAIL: {e}")
+    sys.exit(1)
+
 # Clean up
 if test_file.exists():
     test_file.unlink()
+for sidecar in (".history", ".history.rollup"):
+    if Path(str(test_file) + sidecar).exists():
+        Path(str(test_file) + sidecar).unlink()
 
 print("\n" + "="*60)
-print("[SUCCESS] ALL 12 TESTS PASSED!")
+print("[SUCCESS] ALL 37 TESTS PASSED!")
 print("="*60)
 print("\n[OK] TaskFlow core functionality verified!")
 print("   - Task creation working")
@@ -233,4 +1578,5 @@ print("   - Status updates working")
 print("   - Task editing working")
 print("   - Persistence (save/load) working")
 print("   - Markdown export working")
-print("   - Overdue detection working\n")
+print("   - Overdue detection working")
+print("   - Journal storage working\n")